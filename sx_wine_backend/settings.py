@@ -85,6 +85,62 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Кеш ответов API: file (по умолчанию, общий для всех воркеров на сервере),
+# redis (общий для нескольких серверов) или locmem (только для одного процесса:
+# сброс по тегам в одном воркере не виден другим, и они отдают устаревшие ответы)
+
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION') or os.path.join(BASE_DIR, 'cache', 'responses'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION') or 'redis://redis:6379/0',
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        **RESPONSE_CACHE_BACKENDS[os.getenv('RESPONSE_CACHE_BACKEND', 'file')],
+        'KEY_PREFIX': 'wine_api',
+    },
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Снимок индекса похожих вин, который строит команда build_similarity_index
+SIMILARITY_INDEX_PATH = os.getenv('SIMILARITY_INDEX_PATH') or os.path.join(BASE_DIR, 'cache', 'similarity.npz')
+
+# Срок кеширования /api/dictionaries/ в браузерах и CDN (секунды)
+DICTIONARIES_MAX_AGE = int(os.getenv('DICTIONARIES_MAX_AGE', 24 * 60 * 60))
+
+# Срок кеширования календаря событий /api/events/calendar.ics (секунды)
+ICAL_MAX_AGE = int(os.getenv('ICAL_MAX_AGE', 60 * 60))
+
+# Потоки процесса, которые строят производные загруженных изображений;
+# 0 — только командой build_image_variants
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', 2))
+
+# Потоки процесса, которые переводят пользователей из листа ожидания в
+# участники при освобождении мест; 0 — только командой promote_waitlist
+WAITLIST_WORKERS = int(os.getenv('WAITLIST_WORKERS', 1))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -126,6 +182,17 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загруженные файлы хранятся под именами по содержимому (см. wine_api.storage):
+# одинаковые файлы не дублируются, а адреса можно кешировать навсегда
+STORAGES = {
+    'default': {
+        'BACKEND': 'wine_api.storage.HashedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class WineApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'wine_api'
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals  # noqa: F401
@@ -0,0 +1,84 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+
+from .models import Event, Person
+
+# Результаты бронирования и отмены
+BOOKED = 'booked'
+ALREADY_BOOKED = 'already_booked'
+CANCELLED = 'cancelled'
+NOT_BOOKED = 'not_booked'
+
+
+class SoldOut(Exception):
+    """Свободных мест на событии нет"""
+
+
+def _available(event_id):
+    return Event.objects.filter(pk=event_id).values_list('available', flat=True).get()
+
+
+def _participants_changed(event_id, person_id, action):
+    """
+    Отправляет m2m_changed, как Event.participants.add/remove: сигналы
+    обновляют версии каталога и кеш ответов события и персоны.
+    """
+    through = Event.participants.through
+    m2m_changed.send(
+        sender=through,
+        instance=Event(pk=event_id),
+        action=action,
+        reverse=False,
+        model=Person,
+        pk_set={person_id},
+        using=through.objects.db,
+    )
+
+
+def book(event_id, person_id):
+    """
+    Бронирует персоне место на событии: строка участника и списание места
+    в одной транзакции. Место списывается условным
+    UPDATE ... SET available = available - 1 WHERE available >= 1, поэтому
+    параллельные брони не продают больше мест, чем было; available = NULL —
+    количество мест не ограничено.
+
+    Повторная бронь той же персоны ничего не меняет: пара (событие,
+    участник) уникальна, и параллельный дубль ждёт первую транзакцию.
+
+    Возвращает (BOOKED или ALREADY_BOOKED, оставшиеся места). Если мест
+    нет — SoldOut, если события нет — Event.DoesNotExist.
+    """
+    through = Event.participants.through
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                through.objects.create(event_id=event_id, person_id=person_id)
+        except IntegrityError:
+            return ALREADY_BOOKED, _available(event_id)
+
+        updated = Event.objects.filter(pk=event_id, available__gte=1).update(available=F('available') - 1)
+        available = _available(event_id)
+        if not updated and available is not None:
+            # Откат транзакции удаляет и строку участника
+            raise SoldOut
+        transaction.on_commit(lambda: _participants_changed(event_id, person_id, 'post_add'))
+    return BOOKED, available
+
+
+def cancel(event_id, person_id):
+    """
+    Отменяет бронь: строка участника удаляется, место возвращается в
+    той же транзакции. Повторная отмена ничего не меняет.
+
+    Возвращает (CANCELLED или NOT_BOOKED, оставшиеся места).
+    """
+    through = Event.participants.through
+    with transaction.atomic():
+        deleted, _ = through.objects.filter(event_id=event_id, person_id=person_id).delete()
+        if deleted:
+            Event.objects.filter(pk=event_id, available__isnull=False).update(available=F('available') + 1)
+            transaction.on_commit(lambda: _participants_changed(event_id, person_id, 'post_remove'))
+        available = _available(event_id)
+    return (CANCELLED if deleted else NOT_BOOKED), available
@@ -0,0 +1,103 @@
+from django.db.models import F
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .models import Wine, WineCard
+from .optimization import optimize_queryset
+from .serializers import WineSerializer
+
+# Версия формата карточки: увеличивается при изменении WineSerializer,
+# карточки старой версии пересобираются при чтении или командой rebuild_wine_cards
+CARD_VERSION = 3
+
+# Запросов на пересборку карточек при чтении (вина, сорта и сохранение; без
+# BEGIN/COMMIT транзакции), сколько бы карточек ни устарело; добавляются
+# к бюджету запросов ответа
+CARD_REBUILD_QUERIES = 3
+
+# Подстановки в отрендеренном JSON. NUL не может встретиться в тексте из
+# PostgreSQL, а JSONRenderer всегда экранирует его как \u0000
+ORIGIN_PLACEHOLDER = '\x00origin\x00'
+RESULTS_PLACEHOLDER = '\x00results\x00'
+_ORIGIN_BYTES = b'\\u0000origin\\u0000'
+_RESULTS_BYTES = b'"\\u0000results\\u0000"'
+
+_renderer = JSONRenderer()
+
+
+class _CardRequest:
+    """
+    Заглушка запроса для рендеринга карточек: абсолютные URL (изображения)
+    строятся от подстановки, которая заменяется на адрес сервера при ответе.
+    """
+
+    def build_absolute_uri(self, location):
+        return ORIGIN_PLACEHOLDER + location
+
+
+def render_card(wine):
+    """Рендерит карточку вина в JSON-строку"""
+    serializer = WineSerializer(wine, context={'request': _CardRequest()})
+    return _renderer.render(serializer.data).decode('utf-8')
+
+
+def rebuild_cards(queryset):
+    """
+    Пересобирает и сохраняет карточки для вин из queryset.
+    Возвращает {wine_id: JSON карточки}.
+    """
+    wines = optimize_queryset(queryset.order_by(), WineSerializer)
+    cards = [WineCard(wine_id=wine.pk, data=render_card(wine), version=CARD_VERSION) for wine in wines]
+    WineCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=['wine'],
+        update_fields=['data', 'version', 'updated_at'],
+    )
+    return {card.wine_id: card.data for card in cards}
+
+
+def with_cards(queryset):
+    """
+    Добавляет к queryset вин данные карточек одним JOIN; тяжёлые колонки,
+    которые уже есть в карточке, не загружаются.
+    """
+    return queryset.defer('description', 'search_vector').annotate(
+        card_data=F('card__data'),
+        card_version=F('card__version'),
+    )
+
+
+def load_cards(wines):
+    """
+    Возвращает JSON карточек для вин из with_cards в том же порядке.
+    Отсутствующие и устаревшие карточки пересобираются.
+    """
+    stale = [wine.pk for wine in wines if wine.card_version != CARD_VERSION]
+    rebuilt = rebuild_cards(Wine.objects.filter(pk__in=stale)) if stale else {}
+    return [rebuilt[wine.pk] if wine.pk in rebuilt else wine.card_data for wine in wines]
+
+
+def can_serve_cards(request):
+    """Готовые карточки отдаются только в компактном JSON"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return (
+        isinstance(renderer, JSONRenderer)
+        and renderer.format == 'json'
+        and 'indent' not in (request.accepted_media_type or '')
+    )
+
+
+def card_response(request, data, cards):
+    """
+    Отдаёт ответ с готовыми карточками: data — структура ответа, в которой
+    RESULTS_PLACEHOLDER заменяется на cards (JSON карточки или массива,
+    строкой или байтами).
+    """
+    if isinstance(cards, str):
+        cards = cards.encode('utf-8')
+    content = _renderer.render(data)
+    content = content.replace(_RESULTS_BYTES, cards, 1)
+    origin = request.build_absolute_uri('/')[:-1].encode('utf-8')
+    content = content.replace(_ORIGIN_BYTES, origin)
+    return HttpResponse(content, content_type='application/json')
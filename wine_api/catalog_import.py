@@ -0,0 +1,454 @@
+import csv
+from collections import Counter
+from pathlib import Path
+
+from django.db import transaction
+
+from .models import (
+    Country,
+    GrapeVariety,
+    Producer,
+    Region,
+    Wine,
+    WineCategory,
+    WineColor,
+    WineGrapeComposition,
+    WineSugar,
+)
+from .signals import wines_bulk_changed
+
+# Столбец файла -> справочник, значение которого ищется по названию
+DICTIONARY_COLUMNS = {
+    'producer': Producer,
+    'country': Country,
+    'region': Region,
+    'category': WineCategory,
+    'color': WineColor,
+    'sugar': WineSugar,
+}
+
+REQUIRED_COLUMNS = ('name', 'volume', *DICTIONARY_COLUMNS)
+
+# Необязательные столбцы: обновляются, только если есть в файле
+OPTIONAL_COLUMNS = (
+    'price', 'aging', 'aging_caption', 'description',
+    'sur_lie_years', 'sur_lie_months', 'is_prime', 'grapes',
+)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да', 'д', '+'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'нет', 'н', '-'}
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+def normalize_name(value):
+    """Ключ поиска по названию: без учёта регистра и лишних пробелов"""
+    return ' '.join(str(value).split()).casefold()
+
+
+def _text(value):
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _float(value, column):
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else float(value)
+    value = str(value).replace('\xa0', '').replace(' ', '').replace(',', '.')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise CatalogImportError(f'{column}: «{value}» не является числом')
+
+
+def _int(value, column):
+    number = _float(value, column)
+    if number is None:
+        return None
+    if not number.is_integer():
+        raise CatalogImportError(f'{column}: «{value}» не является целым числом')
+    return int(number)
+
+
+def _bool(value, column):
+    if isinstance(value, bool):
+        return value
+    text = '' if value is None else str(value).strip().casefold()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise CatalogImportError(f'{column}: «{value}» — ожидается да/нет')
+
+
+def _grapes(value, column):
+    """
+    Состав вида «Мерло:60; Каберне Совиньон:40» (процент необязателен).
+    Возвращает [(название, процент или None)].
+    """
+    grapes = []
+    text = _text(value) or ''
+    for item in text.replace(',', ';').split(';'):
+        name, _, percentage = item.partition(':')
+        name = _text(name)
+        if not name:
+            continue
+        percentage = _int(percentage.strip().rstrip('%'), column)
+        if percentage is not None and not 0 <= percentage <= 100:
+            raise CatalogImportError(f'{column}: процент «{percentage}» вне диапазона 0–100')
+        grapes.append((name, percentage))
+    return grapes
+
+
+# Столбец -> функция разбора значения
+VALUE_PARSERS = {
+    'volume': _float,
+    'price': _int,
+    'aging': _int,
+    'aging_caption': lambda value, column: _text(value),
+    'description': lambda value, column: _text(value),
+    'sur_lie_years': _int,
+    'sur_lie_months': _int,
+    'is_prime': _bool,
+}
+
+
+def read_table(path, delimiter=None, sheet=None):
+    """
+    Читает CSV или XLSX. Возвращает (заголовки, итератор (номер строки,
+    список значений)). Заголовки приводятся к нижнему регистру.
+    """
+    path = Path(path)
+    if path.suffix.lower() in ('.xlsx', '.xlsm'):
+        return _read_xlsx(path, sheet)
+    return _read_csv(path, delimiter)
+
+
+def _read_csv(path, delimiter):
+    handle = open(path, newline='', encoding='utf-8-sig')
+    if delimiter is None:
+        sample = handle.readline()
+        handle.seek(0)
+        # Прайс-листы из Excel часто сохраняются с разделителем «;»
+        delimiter = max(',;\t', key=sample.count)
+    reader = csv.reader(handle, delimiter=delimiter)
+    header = [column.strip().lower() for column in next(reader, [])]
+
+    def rows():
+        with handle:
+            for line, values in enumerate(reader, start=2):
+                if any(value.strip() for value in values):
+                    yield line, values
+    return header, rows()
+
+
+def _read_xlsx(path, sheet):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError('Для чтения XLSX требуется пакет openpyxl')
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+    values = worksheet.iter_rows(values_only=True)
+    header = [str(column or '').strip().lower() for column in next(values, ())]
+
+    def rows():
+        try:
+            for line, row in enumerate(values, start=2):
+                if any(value not in (None, '') for value in row):
+                    yield line, list(row)
+        finally:
+            workbook.close()
+    return header, rows()
+
+
+class ImportRow:
+    """Разобранная строка файла"""
+
+    def __init__(self, line, name, values, dictionaries, grapes):
+        self.line = line
+        self.name = name
+        self.values = values
+        self.dictionaries = dictionaries
+        self.grapes = grapes
+
+
+def parse_row(line, header, values):
+    data = dict(zip(header, values))
+    name = _text(data.get('name'))
+    if not name:
+        raise CatalogImportError('name: не заполнено')
+    dictionaries = {}
+    for column in DICTIONARY_COLUMNS:
+        dictionaries[column] = _text(data.get(column))
+        if not dictionaries[column]:
+            raise CatalogImportError(f'{column}: не заполнено')
+    parsed = {
+        column: parser(data.get(column), column)
+        for column, parser in VALUE_PARSERS.items()
+        if column in header
+    }
+    if parsed['volume'] is None:
+        raise CatalogImportError('volume: не заполнено')
+    grapes = _grapes(data.get('grapes'), 'grapes') if 'grapes' in header else None
+    return ImportRow(line, name, parsed, dictionaries, grapes)
+
+
+class DictionaryCache:
+    """Справочник в памяти: нормализованное название -> id"""
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+        self.names = {}
+        for pk, name in model.objects.order_by('pk').values_list('pk', 'name'):
+            self.ids.setdefault(normalize_name(name), pk)
+            self.names[pk] = name
+        self.missing = {}
+
+    def get(self, name):
+        key = normalize_name(name)
+        if key not in self.ids:
+            self.missing.setdefault(key, name)
+        return self.ids.get(key)
+
+    def create_missing(self, dry_run):
+        """
+        Создаёт отсутствующие записи одним bulk_create. В пробном режиме
+        записи получают временные отрицательные id.
+        """
+        names = list(self.missing.values())
+        if dry_run:
+            created = [(-index, name) for index, name in enumerate(names, start=1)]
+        else:
+            objects = self.model.objects.bulk_create([self.model(name=name) for name in names])
+            created = [(obj.pk, obj.name) for obj in objects]
+        for pk, name in created:
+            self.ids[normalize_name(name)] = pk
+            self.names[pk] = name
+        self.missing = {}
+        return [name for _, name in created]
+
+
+class ImportReport:
+    def __init__(self):
+        self.counts = Counter()
+        self.errors = []
+        self.created_dictionaries = {}
+
+
+class WineImporter:
+    """
+    Загрузка вин из таблицы: справочники ищутся по названию через кеши в
+    памяти, отсутствующие создаются пачкой; вина сопоставляются по ключу
+    (производитель, название, год, объём) и создаются или обновляются
+    пачками в отдельных транзакциях.
+
+    log — функция для строк отчёта об изменениях (diff) или None.
+    """
+    # Поля вина, которые обновляются у существующих вин
+    DICTIONARY_FIELDS = ('country_id', 'region_id', 'category_id', 'color_id', 'sugar_id')
+
+    def __init__(self, batch_size=2000, dry_run=False, log=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.log = log
+        self.report = ImportReport()
+
+    def run(self, header, rows):
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise CatalogImportError(f'В файле нет столбцов: {", ".join(missing)}')
+        columns = [column for column in OPTIONAL_COLUMNS if column in header]
+        # Год и объём входят в ключ сопоставления и не обновляются
+        self.update_fields = [
+            'name',
+            *self.DICTIONARY_FIELDS,
+            *(column for column in columns if column in VALUE_PARSERS and column != 'aging'),
+        ]
+
+        parsed = []
+        for line, values in rows:
+            try:
+                parsed.append(parse_row(line, header, values))
+            except CatalogImportError as error:
+                self.report.errors.append((line, str(error)))
+        self.report.counts['rows'] = len(parsed) + len(self.report.errors)
+
+        self.resolve_dictionaries(parsed)
+        unique = self.deduplicate(parsed)
+        for start in range(0, len(unique), self.batch_size):
+            self.import_batch(unique[start:start + self.batch_size])
+        return self.report
+
+    def resolve_dictionaries(self, rows):
+        self.caches = {column: DictionaryCache(model) for column, model in DICTIONARY_COLUMNS.items()}
+        self.grape_cache = DictionaryCache(GrapeVariety)
+        for row in rows:
+            for column, name in row.dictionaries.items():
+                self.caches[column].get(name)
+            for name, _ in row.grapes or ():
+                self.grape_cache.get(name)
+
+        created_models = []
+        with transaction.atomic():
+            for cache in [*self.caches.values(), self.grape_cache]:
+                names = cache.create_missing(self.dry_run)
+                if names:
+                    created_models.append(cache.model)
+                    self.report.created_dictionaries[cache.model] = names
+                    for name in names if self.log else ():
+                        self.log(f'+ {cache.model._meta.verbose_name}: {name}')
+            if created_models and not self.dry_run:
+                transaction.on_commit(lambda: wines_bulk_changed((), created_models))
+
+        for row in rows:
+            row.ids = {
+                f'{column}_id': self.caches[column].get(name)
+                for column, name in row.dictionaries.items()
+            }
+
+    def deduplicate(self, rows):
+        """Строки с одинаковым ключом: побеждает последняя"""
+        self.wine_ids = {
+            (producer_id, normalize_name(name), aging, round(volume, 3)): pk
+            for pk, producer_id, name, aging, volume in Wine.objects.order_by('-pk').values_list(
+                'pk', 'producer_id', 'name', 'aging', 'volume',
+            )
+        }
+        unique = {}
+        for row in rows:
+            row.key = (
+                row.ids['producer_id'],
+                normalize_name(row.name),
+                row.values.get('aging'),
+                round(row.values['volume'], 3),
+            )
+            if row.key in unique:
+                self.report.counts['duplicates'] += 1
+            unique[row.key] = row
+        return list(unique.values())
+
+    def _label(self, row):
+        producer = self.caches['producer'].names[row.ids['producer_id']]
+        year = row.values.get('aging')
+        return f'{row.name} ({producer}{f", {year}" if year else ""}, {row.values["volume"]} л)'
+
+    def _display(self, field, value):
+        if field.endswith('_id') and value is not None:
+            return self.caches[field[:-3]].names.get(value, value)
+        return value
+
+    def import_batch(self, rows):
+        existing_ids = [self.wine_ids[row.key] for row in rows if row.key in self.wine_ids]
+        existing = {
+            values.pop('id'): values
+            for values in Wine.objects.filter(pk__in=existing_ids).values('id', *self.update_fields)
+        }
+        compositions = {}
+        for pk, wine_id, grape_id, percentage in WineGrapeComposition.objects.filter(
+            wine_id__in=existing_ids,
+        ).values_list('pk', 'wine_id', 'grape_variety_id', 'percentage'):
+            compositions.setdefault(wine_id, {})[grape_id] = (pk, percentage)
+
+        new_wines = []
+        new_rows = []
+        updated_wines = []
+        changed_ids = set()
+        composition_rows = []
+
+        for row in rows:
+            values = {'name': row.name, **row.ids, **row.values}
+            pk = self.wine_ids.get(row.key)
+            if pk is None:
+                new_wines.append(Wine(**values))
+                new_rows.append(row)
+                self.report.counts['created'] += 1
+                if self.log:
+                    self.log(f'+ {self._label(row)}')
+                continue
+
+            old = existing[pk]
+            changes = [field for field in self.update_fields if old[field] != values[field]]
+            if changes:
+                updated_wines.append(Wine(pk=pk, **values))
+                changed_ids.add(pk)
+                self.report.counts['updated'] += 1
+                if self.log:
+                    self.log(f'~ {self._label(row)}: ' + ', '.join(
+                        f'{field.removesuffix("_id")}: {self._display(field, old[field])} → '
+                        f'{self._display(field, values[field])}'
+                        for field in changes
+                    ))
+            if row.grapes is not None:
+                composition_rows.append((pk, row))
+            if not changes:
+                self.report.counts['unchanged'] += 1
+
+        with transaction.atomic():
+            if not self.dry_run:
+                Wine.objects.bulk_create(new_wines)
+                if updated_wines:
+                    Wine.objects.bulk_create(
+                        updated_wines,
+                        update_conflicts=True,
+                        unique_fields=['id'],
+                        update_fields=self.update_fields,
+                    )
+            composition_rows += [
+                (wine.pk, row) for wine, row in zip(new_wines, new_rows) if row.grapes
+            ]
+            changed_ids |= self.import_compositions(composition_rows, compositions)
+            if not self.dry_run:
+                changed_ids.update(wine.pk for wine in new_wines)
+                for wine, row in zip(new_wines, new_rows):
+                    self.wine_ids[row.key] = wine.pk
+            if changed_ids and not self.dry_run:
+                transaction.on_commit(lambda: wines_bulk_changed(changed_ids))
+
+    def import_compositions(self, rows, compositions):
+        """
+        Приводит состав вин к указанному в файле: upsert по (вино, сорт) и
+        удаление сортов, которых нет в файле. Возвращает id изменённых вин.
+        """
+        upsert = []
+        stale = []
+        changed = set()
+        for wine_id, row in rows:
+            current = compositions.get(wine_id, {})
+            wanted = {}
+            for name, percentage in row.grapes:
+                wanted[self.grape_cache.get(name)] = percentage
+            for grape_id, percentage in wanted.items():
+                if grape_id not in current or current[grape_id][1] != percentage:
+                    upsert.append(WineGrapeComposition(
+                        wine_id=wine_id, grape_variety_id=grape_id, percentage=percentage,
+                    ))
+                    changed.add(wine_id)
+            for grape_id, (pk, _) in current.items():
+                if grape_id not in wanted:
+                    stale.append(pk)
+                    changed.add(wine_id)
+            # Состав новых вин уже виден в строке «+»
+            if self.log and wine_id in changed and wine_id in compositions:
+                self.log(f'~ {self._label(row)}: состав: ' + '; '.join(
+                    f'{self.grape_cache.names[grape_id]}:{percentage}' for grape_id, percentage in wanted.items()
+                ))
+
+        self.report.counts['compositions_upserted'] += len(upsert)
+        self.report.counts['compositions_deleted'] += len(stale)
+        if not self.dry_run:
+            WineGrapeComposition.objects.bulk_create(
+                upsert,
+                update_conflicts=True,
+                unique_fields=['wine', 'grape_variety'],
+                update_fields=['percentage'],
+            )
+            WineGrapeComposition.objects.filter(pk__in=stale).delete()
+        changed.discard(None)  # новые вина в пробном режиме
+        return changed
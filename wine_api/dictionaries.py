@@ -0,0 +1,63 @@
+import hashlib
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from .models import City, Country, GrapeVariety, Region, WineCategory, WineColor, WineSugar
+from .response_cache import get_response_cache
+from .serializers import (
+    CitySerializer,
+    CountrySerializer,
+    GrapeVarietySerializer,
+    RegionSerializer,
+    WineCategorySerializer,
+    WineColorSerializer,
+    WineSugarSerializer,
+)
+from .versioning import CatalogState
+
+# Ключ ответа -> (модель, сериализатор)
+DICTIONARIES = {
+    'categories': (WineCategory, WineCategorySerializer),
+    'colors': (WineColor, WineColorSerializer),
+    'sugars': (WineSugar, WineSugarSerializer),
+    'countries': (Country, CountrySerializer),
+    'regions': (Region, RegionSerializer),
+    'grape_varieties': (GrapeVariety, GrapeVarietySerializer),
+    'cities': (City, CitySerializer),
+}
+
+# Ресурсы каталога, версии которых меняются вместе со справочниками
+DICTIONARY_RESOURCES = ('events', 'wines')
+
+# Срок кеширования ответа, запрошенного с актуальным хешем (?v=...)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_renderer = JSONRenderer()
+
+
+def render_dictionaries():
+    """Все справочники одним JSON: {"categories": [{"id": ..., "name": ...}], ...}"""
+    data = {
+        key: serializer(model.objects.all(), many=True).data
+        for key, (model, serializer) in DICTIONARIES.items()
+    }
+    return _renderer.render(data)
+
+
+def dictionaries_content():
+    """
+    JSON справочников и хеш его содержимого. Пересчитывается только при
+    изменении версий каталога; хеш не меняется, пока не изменились сами
+    справочники.
+    """
+    state = CatalogState(DICTIONARY_RESOURCES)
+    versions = ','.join(f'{resource}:{version}' for resource, version in sorted(state.versions.items()))
+    key = f'dictionaries:{versions}'
+    cache = get_response_cache()
+    entry = cache.get(key)
+    if entry is None:
+        content = render_dictionaries()
+        entry = (content, hashlib.sha1(content).hexdigest())
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,150 @@
+import csv
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from .fast_serialization import RowContext, get_row_plan, render_json
+from .optimization import optimize_queryset
+
+# Количество объектов в одном чанке курсора (и в одной пачке prefetch)
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def export_items(queryset, serializer, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Генератор пачек (представления объектов, RowContext) для выгрузки.
+
+    Строки читаются серверным курсором по chunk_size; вложенные коллекции
+    загружаются для каждого чанка отдельно, поэтому память не растёт с
+    размером каталога. Сериализаторы, которые быстрый путь не поддерживает,
+    выводятся через DRF с prefetch по чанкам iterator().
+    """
+    request = serializer.context.get('request')
+    queryset = queryset.order_by('pk')
+    plan = get_row_plan(serializer)
+    if plan is not None:
+        rows = plan.values(queryset).iterator(chunk_size=chunk_size)
+        for chunk in _chunks(rows, chunk_size):
+            context = RowContext(request)
+            yield plan.build(chunk, context), context
+        return
+
+    # Для Python-представлений DRF используется стандартный json
+    context = RowContext(request)
+    context.unsafe_floats = True
+    instances = optimize_queryset(queryset, serializer).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(instances, chunk_size):
+        yield [serializer.to_representation(instance) for instance in chunk], context
+
+
+def jsonl_lines(queryset, serializer):
+    """Строки JSON Lines: один объект на строку"""
+    for items, context in export_items(queryset, serializer):
+        yield b''.join(render_json(item, context) + b'\n' for item in items)
+
+
+def csv_columns(serializer, prefix=''):
+    """
+    Столбцы CSV: поля сериализатора, вложенные объекты разворачиваются в
+    столбцы через точку (producer.name)
+    """
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.Serializer):
+            columns.extend(csv_columns(field, f'{prefix}{name}.'))
+        else:
+            columns.append(prefix + name)
+    return columns
+
+
+def _csv_value(item, path):
+    value = item
+    for name in path:
+        if not isinstance(value, dict):
+            return ''
+        value = value.get(name)
+    if value is None:
+        return ''
+    if isinstance(value, (bool, list, dict)):
+        # Списки и словари (сорта винограда, вина события) — JSON в ячейке
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset, serializer):
+    """Строки CSV с заголовком"""
+    columns = csv_columns(serializer)
+    paths = [column.split('.') for column in columns]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns).encode('utf-8')
+    for items, _ in export_items(queryset, serializer):
+        yield ''.join(
+            writer.writerow([_csv_value(item, path) for path in paths])
+            for item in items
+        ).encode('utf-8')
+
+
+EXPORT_WRITERS = {
+    'jsonl': jsonl_lines,
+    'csv': csv_lines,
+}
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    Выгрузка отдаёт собственный формат, поэтому заголовок Accept клиента
+    (например, text/csv) не должен приводить к 406
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportMixin:
+    """
+    Миксин для ViewSet: выгрузка всего списка (с фильтрами списка и выбором
+    полей fields/expand) потоком в JSON Lines или CSV:
+    /<ресурс>/export/jsonl/ и /<ресурс>/export/csv/.
+    """
+    export_filename = None
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'export/(?P<export_format>jsonl|csv)',
+        content_negotiation_class=ExportContentNegotiation,
+    )
+    def export(self, request, export_format=None):
+        queryset = self.get_queryset()
+        serializer = self.get_serializer()
+        response = StreamingHttpResponse(
+            EXPORT_WRITERS[export_format](queryset, serializer),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        filename = self.export_filename or self.basename
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+        return response
@@ -0,0 +1,408 @@
+import json
+
+from django.db.models import F, FileField
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.utils import encoders
+from rest_framework.settings import api_settings
+
+from .cards import RESULTS_PLACEHOLDER, can_serve_cards, card_response
+from .optimization import PLAN_CACHE_SIZE, _get_field, _plan_key, _resolve_relation
+
+try:
+    import orjson
+except ImportError:  # без orjson рендеринг идёт через стандартный json
+    orjson = None
+
+# Кодировщик JSON быстрого пути (выводится benchmark_serialization)
+JSON_ENCODER = 'json' if orjson is None else 'orjson'
+
+# Размер пачки id владельцев в запросе вложенной коллекции
+COLLECTION_CHUNK_SIZE = 900
+
+_SKIP = object()
+_row_plan_cache = {}
+
+# Поля DRF, представление которых совпадает со встроенным преобразованием
+_BUILTIN_CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.CharField: str,
+    serializers.BooleanField: bool,
+}
+
+
+class UnsupportedField(Exception):
+    """Поле сериализатора не может быть выведено быстрым путём"""
+
+
+class RowContext:
+    """Состояние одного ответа: запрос, загруженные коллекции, зависимости"""
+
+    def __init__(self, request, collect_tags=False):
+        self.request = request
+        self.groups = {}
+        self.functions = {}
+        # Есть числа с плавающей точкой, которые orjson пишет иначе, чем json
+        self.unsafe_floats = False
+        # (модель, pk, связь или None) для тегов кеша ответов
+        self.tags = set() if collect_tags else None
+
+
+def _float(value, context):
+    value = float(value)
+    if not (value == 0 or 1e-4 <= abs(value) < 1e16):
+        context.unsafe_floats = True
+    return value
+
+
+def _column_accessor(column, field):
+    """Значение столбца с тем же преобразованием, что to_representation поля"""
+    converter = _BUILTIN_CONVERTERS.get(type(field))
+    if type(field) is serializers.FloatField:
+        def accessor(row, context):
+            value = row[column]
+            return None if value is None else _float(value, context)
+    elif converter is not None:
+        def accessor(row, context):
+            value = row[column]
+            return None if value is None else converter(value)
+    else:
+        to_representation = field.to_representation
+
+        def accessor(row, context):
+            value = row[column]
+            return None if value is None else to_representation(value)
+    return accessor
+
+
+def _file_accessor(column, field, model_field):
+    """Значение FileField/ImageField: абсолютный URL файла, как в DRF"""
+    storage = model_field.storage
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def accessor(row, context):
+        name = row[column]
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        if context.request is not None:
+            return context.request.build_absolute_uri(url)
+        return url
+    return accessor
+
+
+def _nullable_path_accessor(column, guard, field):
+    """
+    Поле с источником через связь (grape_variety.name). Если связанного
+    объекта нет, поведение как у Field.get_attribute в DRF.
+    """
+    value_accessor = _column_accessor(column, field)
+
+    def accessor(row, context):
+        if row[guard] is None:
+            if field.default is not empty:
+                return field.get_default()
+            if field.allow_null:
+                return None
+            return _SKIP
+        return value_accessor(row, context)
+    return accessor
+
+
+class Collection:
+    """Вложенная to-many коллекция, загружаемая отдельным запросом values()"""
+
+    def __init__(self, owner_model, attr, relation, owner_column, plan):
+        self.owner_model = owner_model
+        self.attr = attr
+        self.model = relation.related_model
+        self.owner_column = owner_column
+        # plan — RowPlan вложенных объектов или None для списка первичных ключей
+        self.plan = plan
+        if relation.many_to_many and not relation.auto_created:
+            self.lookup = relation.related_query_name()
+        else:
+            self.lookup = relation.field.name
+
+    def load(self, owner_ids, context):
+        """Возвращает {id владельца: [представления объектов]}"""
+        groups = {}
+        owner_ids = sorted(owner_ids)
+        for start in range(0, len(owner_ids), COLLECTION_CHUNK_SIZE):
+            queryset = self.model._default_manager.filter(**{
+                f'{self.lookup}__in': owner_ids[start:start + COLLECTION_CHUNK_SIZE],
+            }).annotate(_owner=F(self.lookup))
+            if self.plan is None:
+                for owner, pk in queryset.values_list('_owner', 'pk'):
+                    groups.setdefault(owner, []).append(pk)
+                    if context.tags is not None:
+                        context.tags.add((self.model, pk, None))
+                continue
+            rows = list(self.plan.values(queryset, extra=('_owner',)))
+            for row, data in zip(rows, self.plan.build(rows, context)):
+                groups.setdefault(row['_owner'], []).append(data)
+        if context.tags is not None:
+            context.tags.update((self.owner_model, pk, self.attr) for pk in owner_ids)
+        return groups
+
+
+class RowPlan:
+    """
+    Скомпилированное дерево сериализатора: столбцы values() и функции,
+    строящие представление объекта из строки.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {model._meta.pk.name: None}
+        self.annotations = {}
+        self.fields = []
+        self.collections = []
+        self.sources = []
+        # (модель, столбец первичного ключа) объектов в строке
+        self.tag_columns = [(model, model._meta.pk.name)]
+        self.may_skip = False
+
+    def add_column(self, column):
+        self.columns[column] = None
+        return column
+
+    def values(self, queryset, extra=()):
+        """queryset строк для этого плана; extra — дополнительные столбцы"""
+        if self.annotations:
+            # В запросах с GROUP BY Django не применяет Meta.ordering —
+            # задаём сортировку по умолчанию явно
+            if not queryset.query.order_by:
+                queryset = queryset.order_by(*self.model._meta.ordering or ['pk'])
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*dict.fromkeys([*self.columns, *extra]))
+
+    def build(self, rows, context):
+        """Представления объектов для строк values() (порядок сохраняется)"""
+        for source, setup in self.sources:
+            if source not in context.functions:
+                context.functions[source] = setup({'request': context.request})
+        for collection in self.collections:
+            owner_ids = {row[collection.owner_column] for row in rows}
+            owner_ids.discard(None)
+            context.groups[collection] = collection.load(owner_ids, context) if owner_ids else {}
+        if context.tags is not None:
+            for model, column in self.tag_columns:
+                context.tags.update((model, row[column], None) for row in rows if row[column] is not None)
+
+        fields = self.fields
+        if self.may_skip:
+            return [
+                {key: value for key, accessor in fields if (value := accessor(row, context)) is not _SKIP}
+                for row in rows
+            ]
+        return [{key: accessor(row, context) for key, accessor in fields} for row in rows]
+
+
+def _compile(serializer, model, plan, prefix=''):
+    """
+    Список (ключ, функция от строки) для полей сериализатора. prefix — путь
+    values() от модели плана до модели сериализатора.
+    """
+    accessors = []
+    field_sources = getattr(serializer, 'field_sources', {})
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        name = field.field_name
+
+        if name in field_sources:
+            accessors.append((name, _compile_source(field_sources[name], plan, prefix)))
+            continue
+        if field.source == '*':
+            raise UnsupportedField(name)
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        source_attrs = field.source_attrs
+        path, to_many, related_model = _resolve_relation(model, source_attrs)
+
+        if to_many is not None:
+            if path or len(source_attrs) != 1:
+                raise UnsupportedField(name)
+            if isinstance(nested, serializers.ModelSerializer):
+                child_plan = RowPlan(related_model)
+                child_plan.fields = _compile(nested, related_model, child_plan)
+            elif isinstance(getattr(field, 'child_relation', None), serializers.PrimaryKeyRelatedField):
+                child_plan = None
+            else:
+                raise UnsupportedField(name)
+            owner_column = plan.add_column(prefix + model._meta.pk.name)
+            collection = Collection(model, to_many, _get_field(model, to_many), owner_column, child_plan)
+            plan.collections.append(collection)
+            accessors.append((name, _collection_accessor(collection)))
+            continue
+
+        if path and len(path) == len(source_attrs):
+            if isinstance(nested, serializers.ModelSerializer):
+                nested_prefix = f'{prefix}{"__".join(path)}__'
+                pk_column = plan.add_column(nested_prefix + related_model._meta.pk.name)
+                plan.tag_columns.append((related_model, pk_column))
+                nested_accessors = _compile(nested, related_model, plan, nested_prefix)
+                accessors.append((name, _nested_accessor(pk_column, nested_accessors, plan)))
+            elif (
+                isinstance(nested, serializers.PrimaryKeyRelatedField)
+                and len(source_attrs) == 1
+                and nested.pk_field is None
+            ):
+                column = plan.add_column(prefix + model._meta.get_field(source_attrs[0]).attname)
+                accessors.append((name, _raw_accessor(column)))
+            else:
+                raise UnsupportedField(name)
+            continue
+
+        target_model = related_model if path else model
+        model_field = _get_field(target_model, source_attrs[-1])
+        if model_field is None or model_field.is_relation or not model_field.concrete:
+            raise UnsupportedField(name)
+        if isinstance(nested, serializers.Serializer) or isinstance(nested, serializers.RelatedField):
+            raise UnsupportedField(name)
+        column = plan.add_column(prefix + '__'.join(source_attrs))
+
+        if path:
+            guard = plan.add_column(f'{prefix}{"__".join(path)}__{related_model._meta.pk.name}')
+            accessors.append((name, _nullable_path_accessor(column, guard, field)))
+            plan.may_skip = True
+        elif isinstance(model_field, FileField):
+            accessors.append((name, _file_accessor(column, field, model_field)))
+        else:
+            accessors.append((name, _column_accessor(column, field)))
+
+    return accessors
+
+
+def _compile_source(source, plan, prefix):
+    if source.annotations and prefix:
+        raise UnsupportedField('аннотации во вложенном объекте')
+    plan.annotations.update(source.annotations)
+    columns = [column if column in source.annotations else prefix + column for column in source.columns]
+    for column in columns:
+        plan.add_column(column)
+
+    if source.func is not None:
+        func = source.func
+        return lambda row, context: func(*[row[column] for column in columns])
+
+    plan.sources.append((source, source.setup))
+    return lambda row, context: context.functions[source](*[row[column] for column in columns])
+
+
+def _raw_accessor(column):
+    return lambda row, context: row[column]
+
+
+def _nested_accessor(pk_column, accessors, plan):
+    def accessor(row, context):
+        if row[pk_column] is None:
+            return None
+        return {key: value for key, nested in accessors if (value := nested(row, context)) is not _SKIP}
+    return accessor
+
+
+def _collection_accessor(collection):
+    owner_column = collection.owner_column
+    return lambda row, context: context.groups[collection].get(row[owner_column], [])
+
+
+def get_row_plan(serializer):
+    """
+    Скомпилированный план для экземпляра сериализатора (с учётом выбора
+    полей fields/expand) или None, если быстрый путь для него недоступен.
+    """
+    key = _plan_key(serializer)
+    if key in _row_plan_cache:
+        return _row_plan_cache[key]
+
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = serializer.Meta.model
+    plan = RowPlan(model)
+    try:
+        plan.fields = _compile(serializer, model, plan)
+    except UnsupportedField:
+        plan = None
+    if len(_row_plan_cache) < PLAN_CACHE_SIZE:
+        _row_plan_cache[key] = plan
+    return plan
+
+
+def render_json(data, context):
+    """
+    Рендерит данные так же, как JSONRenderer DRF (компактный JSON без
+    экранирования Unicode), через orjson (без него — через json).
+    """
+    compact = api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON
+    content = None
+    if orjson is not None and compact and not context.unsafe_floats:
+        try:
+            content = orjson.dumps(data)
+        except TypeError:
+            content = None
+    if content is None:
+        content = json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=not api_settings.UNICODE_JSON,
+            allow_nan=not api_settings.STRICT_JSON,
+            separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '),
+        ).encode('utf-8')
+    # JSONRenderer экранирует разделители строк, недопустимые в JavaScript
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastSerializationMixin:
+    """
+    Миксин для ViewSet: списки строятся из строк values() по
+    скомпилированному дереву сериализатора, минуя поля DRF, и рендерятся
+    через orjson. Результат побайтово совпадает с обычным путём.
+
+    fast_serialization — включает быстрый путь для ViewSet. Сериализаторы
+    с полями, которые быстрый путь не поддерживает, выводятся как обычно.
+    """
+    fast_serialization = False
+
+    def use_fast_serialization(self):
+        return (
+            self.fast_serialization
+            and can_serve_cards(self.request)
+            and get_row_plan(self.get_serializer()) is not None
+        )
+
+    def fast_list_response(self, queryset, extra=None):
+        """
+        Ответ со списком по быстрому пути; extra — функция, возвращающая
+        дополнительные ключи постраничного ответа (например, фасеты).
+        """
+        plan = get_row_plan(self.get_serializer())
+        context = RowContext(self.request, collect_tags=hasattr(self, 'cache_depends_on'))
+        ordering_columns = [
+            field.lstrip('-')
+            for fields in getattr(self, 'cursor_orderings', {}).values()
+            for field in fields
+        ]
+        rows = plan.values(queryset, extra=ordering_columns)
+        page = self.paginate_queryset(rows)
+        content = render_json(plan.build(list(rows if page is None else page), context), context)
+
+        if context.tags is not None:
+            from .response_cache import cache_tag
+            self.cache_depends_on(*(cache_tag(model, pk, relation) for model, pk, relation in context.tags))
+
+        if page is None:
+            return card_response(self.request, RESULTS_PLACEHOLDER, content)
+        data = self.get_paginated_response(RESULTS_PLACEHOLDER).data
+        if extra is not None:
+            data.update(extra())
+        return card_response(self.request, data, content)
+
+    def list(self, request, *args, **kwargs):
+        if self.use_fast_serialization():
+            return self.fast_list_response(self.get_queryset())
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,188 @@
+from django.db.models import CharField, Count, F, IntegerField, Q, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Person, WineGrapeComposition
+
+
+# Параметр запроса -> поле Wine для фильтров по справочникам (список id через запятую)
+WINE_ID_FILTERS = {
+    'producer_id': 'producer_id',
+    'category_id': 'category_id',
+    'color_id': 'color_id',
+    'sugar_id': 'sugar_id',
+    'country_id': 'country_id',
+    'region_id': 'region_id',
+}
+
+# Параметр запроса -> lookup для диапазонных фильтров
+WINE_RANGE_FILTERS = {
+    'price_min': 'price__gte',
+    'price_max': 'price__lte',
+    'aging_min': 'aging__gte',
+    'aging_max': 'aging__lte',
+}
+
+# Измерения, по которым считаются фасеты: имя -> поле Wine
+WINE_FACETS = {
+    'category': 'category',
+    'color': 'color',
+    'sugar': 'sugar',
+    'country': 'country',
+    'region': 'region',
+    'producer': 'producer',
+}
+
+
+def parse_id_list(value):
+    """Разбирает список id вида "1,2,3"; некорректные значения пропускаются"""
+    ids = []
+    for item in value.split(','):
+        try:
+            ids.append(int(item))
+        except ValueError:
+            continue
+    return ids
+
+
+def parse_bool(value):
+    """Разбирает булев параметр; для некорректного значения возвращает None"""
+    value = value.lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    return None
+
+
+def filter_wines(qs, params):
+    """
+    Применяет к queryset вин фильтры из query-параметров.
+    Некорректные значения игнорируются, как и раньше во WineViewSet.
+
+    Параметры:
+    - interested_telegram_id: telegram_id персоны
+    - producer_id, category_id, color_id, sugar_id, country_id, region_id:
+      ID справочника (можно несколько через запятую)
+    - grape_variety_id: ID сорта винограда (можно несколько через запятую)
+    - price_min, price_max, aging_min, aging_max: границы диапазонов
+    - volume: объём (л)
+    - is_prime: true/false
+    """
+    interested_telegram_id = params.get('interested_telegram_id')
+    if interested_telegram_id:
+        try:
+            person = Person.objects.get(telegram_id=interested_telegram_id)
+        except (Person.DoesNotExist, ValueError):
+            return qs.none()
+        qs = qs.filter(interested_persons=person)
+
+    for param, field in WINE_ID_FILTERS.items():
+        value = params.get(param)
+        if value:
+            ids = parse_id_list(value)
+            if ids:
+                qs = qs.filter(**{f'{field}__in': ids})
+
+    grape_variety_id = params.get('grape_variety_id')
+    if grape_variety_id:
+        ids = parse_id_list(grape_variety_id)
+        if ids:
+            # Подзапрос по индексу (grape_variety, wine) вместо JOIN с DISTINCT
+            qs = qs.filter(id__in=WineGrapeComposition.objects.filter(
+                grape_variety_id__in=ids,
+            ).values('wine_id'))
+
+    for param, lookup in WINE_RANGE_FILTERS.items():
+        value = params.get(param)
+        if value:
+            try:
+                qs = qs.filter(**{lookup: int(value)})
+            except ValueError:
+                pass  # некорректный формат — игнорируем фильтр
+
+    volume = params.get('volume')
+    if volume:
+        try:
+            qs = qs.filter(volume=float(volume))
+        except ValueError:
+            pass
+
+    is_prime = params.get('is_prime')
+    if is_prime:
+        is_prime = parse_bool(is_prime)
+        if is_prime is not None:
+            qs = qs.filter(is_prime=is_prime)
+
+    return qs
+
+
+def filter_upcoming_events(qs, params, now=None):
+    """
+    Оставляет события, которые ещё не начались: дата и время начала
+    сравниваются вместе, (date > сегодня) или (date = сегодня и
+    time >= сейчас), в часовом поясе TIME_ZONE. Сортировка — по началу.
+
+    Параметры:
+    - city: ID города (можно несколько через запятую)
+    """
+    now = timezone.localtime(now)
+    qs = qs.filter(Q(date__gt=now.date()) | Q(date=now.date(), time__gte=now.time().replace(microsecond=0)))
+    city = params.get('city')
+    if city:
+        ids = parse_id_list(city)
+        if ids:
+            qs = qs.filter(city_id__in=ids)
+    return qs.order_by('date', 'time', 'id')
+
+
+def _facet_rows(qs, name, key, label):
+    """Количество вин по значениям одного измерения: facet, key, label, count"""
+    return qs.order_by().values(facet=Value(name), key=key, label=label).annotate(count=Count('id'))
+
+
+def wine_facets(qs):
+    """
+    Считает фасеты (количество вин по каждому значению справочников) для
+    отфильтрованного queryset.
+
+    Каждое измерение группируется отдельно, а группировки объединяются
+    через UNION ALL в один запрос: строк в ответе столько, сколько значений
+    у справочников, а не комбинаций значений. Сорта винограда считаются
+    отдельным запросом через таблицу состава.
+    """
+    parts = [
+        _facet_rows(qs, name, F(f'{field}_id'), F(f'{field}__name'))
+        for name, field in WINE_FACETS.items()
+    ]
+    # UNION требует одинаковых типов столбцов: is_prime приводится к числу
+    parts.append(_facet_rows(qs, 'is_prime', Cast('is_prime', IntegerField()), Value(None, CharField())))
+
+    facets = {name: {} for name in WINE_FACETS}
+    facets['is_prime'] = {}
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['facet'] == 'is_prime':
+            value = bool(row['key'])
+            facets['is_prime'][value] = {'value': value, 'count': row['count']}
+        else:
+            facets[row['facet']][row['key']] = {'id': row['key'], 'name': row['label'], 'count': row['count']}
+
+    grape_rows = (
+        WineGrapeComposition.objects
+        .filter(wine__in=qs.order_by().values('id'))
+        .values('grape_variety_id', 'grape_variety__name')
+        .annotate(count=Count('wine_id'))
+    )
+    facets['grape_variety'] = {
+        row['grape_variety_id']: {
+            'id': row['grape_variety_id'],
+            'name': row['grape_variety__name'],
+            'count': row['count'],
+        }
+        for row in grape_rows
+    }
+
+    return {
+        name: sorted(values.values(), key=lambda item: (-item['count'], str(item.get('name', item.get('value')))))
+        for name, values in facets.items()
+    }
@@ -0,0 +1,130 @@
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import City, Event
+from .response_cache import get_response_cache
+from .versioning import CatalogState
+
+# Ресурсы каталога, из которых строится календарь (города и производители
+# меняют версию events)
+ICAL_RESOURCES = ('events',)
+
+PRODID = '-//sx_wine_backend//Events//RU'
+
+# Максимальная длина строки iCalendar в байтах (RFC 5545, 3.1)
+LINE_LIMIT = 75
+
+
+def escape_text(value):
+    """Экранирование значения типа TEXT (RFC 5545, 3.3.11)"""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+        .replace('\r', '')
+    )
+
+
+def fold_line(line):
+    """Переносит строку длиннее 75 байт; продолжение начинается с пробела"""
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > LINE_LIMIT:
+            parts.append(''.join(current))
+            current, size = [' '], 1
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n'.join(parts)
+
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(event, stamp):
+    """VEVENT события; дата и время начала — в часовом поясе TIME_ZONE"""
+    start = timezone.make_aware(datetime.combine(event.date, event.time))
+    location = [event.place]
+    if event.address:
+        location.append(event.address)
+    if event.city is not None:
+        location.append(event.city.name)
+    description = [f'Производитель: {event.producer.name}']
+    if event.price is not None:
+        description.append(f'Цена билета: {event.price}')
+    location = escape_text(', '.join(location))
+    description = escape_text('\n'.join(description))
+
+    return [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@sx-wine',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{format_utc(start)}',
+        f'SUMMARY:{escape_text(event.name)}',
+        f'LOCATION:{location}',
+        f'DESCRIPTION:{description}',
+        'END:VEVENT',
+    ]
+
+
+def render_calendar(city_ids, today, last_modified=None):
+    """
+    iCalendar (RFC 5545) с событиями начиная с today, по возрастанию
+    начала; city_ids — города (пустой список — все). DTSTAMP — время
+    последнего изменения каталога, поэтому при тех же данных байты
+    ответа не меняются.
+    """
+    events = (
+        Event.objects
+        .filter(date__gte=today)
+        .select_related('city', 'producer')
+        .only('name', 'date', 'time', 'place', 'address', 'price', 'city__name', 'producer__name')
+        .order_by('date', 'time', 'id')
+    )
+    name = 'События'
+    if city_ids:
+        events = events.filter(city_id__in=city_ids)
+        cities = City.objects.filter(pk__in=city_ids).order_by('name').values_list('name', flat=True)
+        name = f'{name}: {", ".join(cities)}'
+
+    stamp = format_utc(last_modified or timezone.make_aware(datetime.combine(today, datetime.min.time())))
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    ]
+    for event in events:
+        lines += event_lines(event, stamp)
+    lines.append('END:VCALENDAR')
+    return ''.join(f'{fold_line(line)}\r\n' for line in lines).encode('utf-8')
+
+
+def calendar_content(city_ids):
+    """
+    Календарь событий и хеш его содержимого. Строится один раз на версию
+    каталога событий (и на день — прошедшие дни выпадают из календаря)
+    для каждого набора городов, дальше отдаётся из кеша ответов.
+    """
+    city_ids = sorted(set(city_ids))
+    state = CatalogState(ICAL_RESOURCES)
+    versions = ','.join(f'{resource}:{version}' for resource, version in sorted(state.versions.items()))
+    today = timezone.localdate()
+    key = f'ical:{",".join(map(str, city_ids)) or "all"}:{versions}:{today.isoformat()}'
+    cache = get_response_cache()
+    entry = cache.get(key)
+    if entry is None:
+        content = render_calendar(city_ids, today, state.last_modified)
+        entry = (content, hashlib.sha1(content).hexdigest())
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,291 @@
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection
+from PIL import Image, ImageOps, features
+
+from .models import Event, Wine
+
+logger = logging.getLogger(__name__)
+
+# Ширины производных изображений (px); изображение не увеличивается, поэтому
+# для узких оригиналов самая большая производная — в ширину оригинала
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+
+# Формат -> параметры кодирования Pillow; AVIF — если Pillow собран с libavif
+IMAGE_VARIANT_FORMATS = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60, 'speed': 8},
+}
+
+# Каталог производных в обычном хранилище: variants/wines/photo/640.webp;
+# HashedFileSystemStorage сохраняет их под именами по содержимому
+IMAGE_VARIANTS_DIR = 'variants'
+
+EXIF_ORIENTATION = 0x0112
+
+# Версия описания производных: увеличивается при изменении того, что в нём
+# хранится; устаревшие описания пересобирает команда build_image_variants
+IMAGE_VARIANTS_VERSION = 2
+
+# Заглушка: BlurHash из 4x3 (для вертикальных — 3x4) компонент, считается
+# по уменьшенной до 32 px копии; основной цвет — по копии 64 px
+PLACEHOLDER_COMPONENTS = (4, 3)
+PLACEHOLDER_SIZE = 32
+DOMINANT_COLOR_SIZE = 64
+DOMINANT_COLOR_PALETTE = 5
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_formats():
+    return [name for name in IMAGE_VARIANT_FORMATS if features.check(name)]
+
+
+def variant_name(source, width, image_format):
+    root, _ = posixpath.splitext(source)
+    return posixpath.join(IMAGE_VARIANTS_DIR, root, f'{width}.{image_format}')
+
+
+def _variant_widths(width):
+    return sorted({min(target, width) for target in IMAGE_VARIANT_WIDTHS}, reverse=True)
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), **IMAGE_VARIANT_FORMATS[image_format])
+    return buffer.getvalue()
+
+
+def variant_names(variants):
+    return {name for image_format in IMAGE_VARIANT_FORMATS for name in variants.get(image_format, {}).values()}
+
+
+def _base83(value, length):
+    return ''.join(_BASE83[value // 83 ** (length - index) % 83] for index in range(1, length + 1))
+
+
+def _srgb_to_linear(values):
+    values = values / 255
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, components_x, components_y):
+    """BlurHash (https://blurha.sh) RGB-изображения: косинусное разложение по компонентам"""
+    pixels = _srgb_to_linear(np.asarray(image, dtype=np.float64))
+    height, width = pixels.shape[:2]
+    basis_x = np.cos(np.pi * np.outer(np.arange(components_x), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(components_y), np.arange(height)) / height)
+    # factors[j, i] = сумма по пикселям basis_y[j, y] * basis_x[i, x] * цвет
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, pixels) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _base83(components_x - 1 + (components_y - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1
+    result += _base83(quantised_max, 1)
+    red, green, blue = (_linear_to_srgb(value) for value in dc)
+    result += _base83((red << 16) + (green << 8) + blue, 4)
+    quantised = np.clip(np.floor(np.sign(ac) * np.sqrt(np.abs(ac / maximum)) * 9 + 9.5), 0, 18).astype(int)
+    for red, green, blue in quantised.tolist():
+        result += _base83(red * 19 * 19 + green * 19 + blue, 2)
+    return result
+
+
+def dominant_color(image):
+    """Самый частый цвет палитры уменьшенной копии в виде #rrggbb"""
+    image = image.copy()
+    image.thumbnail((DOMINANT_COLOR_SIZE, DOMINANT_COLOR_SIZE))
+    palette_image = image.quantize(DOMINANT_COLOR_PALETTE)
+    palette = palette_image.getpalette()
+    _, index = max(palette_image.getcolors())
+    return '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+
+def placeholder(image):
+    """BlurHash и основной цвет изображения (прозрачность — на белом фоне)"""
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    components_x, components_y = PLACEHOLDER_COMPONENTS
+    if image.height > image.width:
+        components_x, components_y = components_y, components_x
+    return {
+        'blurhash': blurhash(small, components_x, components_y),
+        'color': dominant_color(image),
+    }
+
+
+def build_variants(field_file):
+    """
+    Строит производные изображения field_file (ImageField) и сохраняет их
+    в его хранилище. Возвращает описание для поля image_variants: размеры
+    оригинала (с учётом поворота), заглушку и файлы производных:
+
+        {"source": "wines/photo.jpg", "width": 3000, "height": 4000,
+         "blurhash": "LEHV6n...", "color": "#6b2a30",
+         "webp": {"320": "variants/...", ...}, ...}
+    """
+    storage = field_file.storage
+    source = field_file.name
+    variants = {'source': source, 'version': IMAGE_VARIANTS_VERSION}
+    with storage.open(source, 'rb') as file:
+        image = Image.open(file)
+        # Ширина и высота с учётом поворота из EXIF
+        width, height = image.size
+        rotated = image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8)
+        if rotated:
+            width, height = height, width
+        variants.update(width=width, height=height)
+        widths = _variant_widths(width)
+        # JPEG декодируется сразу в уменьшенном масштабе, не меньше самой большой производной
+        draft_size = (widths[0], max(1, round(height * widths[0] / width)))
+        image.draft('RGB', draft_size[::-1] if rotated else draft_size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+        # Каждая следующая производная уменьшается из предыдущей
+        for target in widths:
+            if target < image.width:
+                image = image.resize((target, max(1, round(image.height * target / image.width))), Image.LANCZOS)
+            for image_format in variant_formats():
+                name = variant_name(source, target, image_format)
+                name = storage.save(name, ContentFile(_encode(image, image_format)))
+                variants.setdefault(image_format, {})[str(target)] = name
+        # Заглушка — по самой маленькой производной
+        variants.update(placeholder(image))
+    return variants
+
+
+def variant_urls(storage, source, variants, request=None):
+    """
+    Адреса производных {формат: {ширина: URL}} для изображения source из
+    хранилища storage; производные другого (прежнего) изображения не
+    выводятся.
+    """
+    if not source or not variants or variants.get('source') != source:
+        return {}
+    result = {}
+    # jsonb в PostgreSQL не сохраняет порядок ключей
+    for image_format in IMAGE_VARIANT_FORMATS:
+        sizes = variants.get(image_format)
+        if not sizes:
+            continue
+        result[image_format] = {}
+        for width in sorted(sizes, key=int):
+            url = storage.url(sizes[width])
+            result[image_format][width] = request.build_absolute_uri(url) if request is not None else url
+    return result
+
+
+def placeholder_data(source, variants):
+    """
+    Заглушка для вывода до загрузки изображения source: размеры оригинала,
+    BlurHash и основной цвет или None, если они ещё не посчитаны.
+    """
+    if not source or not variants or variants.get('source') != source or 'blurhash' not in variants:
+        return None
+    return {key: variants[key] for key in ('width', 'height', 'blurhash', 'color')}
+
+
+def needs_variants(instance):
+    """Производные не соответствуют текущему изображению объекта или устарели"""
+    variants = instance.image_variants
+    if instance.image:
+        return variants.get('source') != instance.image.name or variants.get('version') != IMAGE_VARIANTS_VERSION
+    return bool(variants)
+
+
+def _objects_with_image(source, exclude=None):
+    """Объекты Wine и Event с изображением source, кроме exclude"""
+    for model in (Wine, Event):
+        queryset = model.objects.filter(image=source)
+        if isinstance(exclude, model):
+            queryset = queryset.exclude(pk=exclude.pk)
+        yield from queryset.only('pk', 'image', 'image_variants')
+
+
+def compute_variants(instance):
+    """
+    Строит производные изображения объекта (Wine или Event) и возвращает
+    новое описание. Одинаковые загрузки хранятся одним файлом (см.
+    storage), поэтому готовые производные того же файла у другого объекта
+    используются повторно. Прежние производные удаляются, если на то же
+    изображение не ссылаются другие объекты.
+    """
+    previous = instance.image_variants or {}
+    source = instance.image.name if instance.image else None
+    variants = {}
+    if source:
+        variants = next(
+            (other.image_variants for other in _objects_with_image(source, instance) if not needs_variants(other)),
+            None,
+        ) or build_variants(instance.image)
+
+    stale = variant_names(previous) - variant_names(variants)
+    if stale and next(_objects_with_image(previous.get('source'), instance), None) is None:
+        storage = type(instance)._meta.get_field('image').storage
+        for name in stale:
+            storage.delete(name)
+    return variants
+
+
+def update_variants(instance):
+    """Пересобирает производные изображения объекта и сохраняет их описание"""
+    instance.image_variants = compute_variants(instance)
+    # Сигналы post_save обновляют карточки, версии каталога и кеш ответов
+    instance.save(update_fields=['image_variants'])
+
+
+def _update_variants_task(model, pk):
+    close_old_connections()
+    try:
+        instance = model._default_manager.filter(pk=pk).first()
+        if instance is not None and needs_variants(instance):
+            update_variants(instance)
+    except Exception:
+        logger.exception('Не удалось построить производные изображения %s %s', model.__name__, pk)
+    finally:
+        connection.close()
+
+
+def schedule_variants(model, pk):
+    """
+    Ставит построение производных в фоновый поток процесса, чтобы загрузка
+    изображения не ждала кодирования. При IMAGE_VARIANTS_WORKERS = 0
+    производные строит только команда build_image_variants.
+    """
+    global _executor
+    workers = getattr(settings, 'IMAGE_VARIANTS_WORKERS', 2)
+    if not workers:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+    _executor.submit(_update_variants_task, model, pk)
@@ -0,0 +1,130 @@
+import csv
+import os
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wine_api.catalog_import import WineImporter, read_table
+from wine_api.models import Wine
+from wine_api.signals import wines_bulk_changed
+
+COLUMNS = (
+    'name', 'producer', 'country', 'region', 'category', 'color', 'sugar',
+    'volume', 'price', 'aging', 'description', 'grapes',
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет импорт вин (import_wines) на синтетическом CSV: пробный "
+        "запуск, создание вин и повторный импорт с изменёнными ценами и "
+        "составом. Данные импортируются в транзакции, которая откатывается"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Строк в файле (по умолчанию 100000)")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help="Количество вин в одной транзакции импорта (по умолчанию 2000)",
+        )
+        parser.add_argument(
+            '--limit',
+            type=float,
+            default=60,
+            help="Допустимое время создания и обновления, с (по умолчанию 60)",
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows должно быть больше 0")
+        marker = uuid.uuid4().hex[:8]
+        with tempfile.TemporaryDirectory() as directory:
+            created_path = os.path.join(directory, 'created.csv')
+            updated_path = os.path.join(directory, 'updated.csv')
+            self.write_csv(created_path, marker, options['rows'], revision=0)
+            self.write_csv(updated_path, marker, options['rows'], revision=1)
+
+            timings = {}
+            try:
+                with transaction.atomic():
+                    for name, path, dry_run in (
+                        ('пробный запуск', created_path, True),
+                        ('создание', created_path, False),
+                        ('обновление', updated_path, False),
+                    ):
+                        timings[name] = self.run_import(name, path, marker, options, dry_run)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        slow = [name for name in ('создание', 'обновление') if timings[name] > options['limit']]
+        if slow:
+            raise CommandError(f"Дольше {options['limit']:.0f} с: {', '.join(slow)}")
+        self.stdout.write(self.style.SUCCESS(f"Готово, каждый проход быстрее {options['limit']:.0f} с"))
+
+    def run_import(self, name, path, marker, options, dry_run):
+        """
+        Импорт файла; время включает обновление производных данных
+        (wines_bulk_changed), которое при обычном импорте выполняется после
+        коммита каждой пачки, а здесь — явно, потому что коммита нет.
+        """
+        rows = options['rows']
+        importer = WineImporter(batch_size=options['batch_size'], dry_run=dry_run)
+        started = time.perf_counter()
+        header, table = read_table(path)
+        report = importer.run(header, table)
+        if report.errors:
+            raise CommandError(f"Ошибки в строках: {report.errors[:5]}")
+        imported = time.perf_counter()
+        if not dry_run:
+            wine_ids = list(
+                Wine.objects.filter(producer__name__startswith=f"Benchmark {marker} ").values_list('pk', flat=True)
+            )
+            for start in range(0, len(wine_ids), options['batch_size']):
+                wines_bulk_changed(wine_ids[start:start + options['batch_size']])
+        elapsed = time.perf_counter() - started
+
+        counts = report.counts
+        self.stdout.write(
+            f"{name:>15}: {rows} строк за {elapsed:.1f} с ({rows / elapsed:.0f} строк/с), "
+            f"из них производные данные {started + elapsed - imported:.1f} с; "
+            f"создано {counts['created']}, обновлено {counts['updated']}, "
+            f"состав: записано {counts['compositions_upserted']}"
+        )
+        return elapsed
+
+    @staticmethod
+    def write_csv(path, marker, rows, revision):
+        """
+        Прайс-лист поставщика: 1000 производителей, справочники и сорта по
+        названиям с маркером запуска (импорт создаёт их сам). В ревизии 1
+        меняются цены и доли сортов.
+        """
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle, delimiter=';')
+            writer.writerow(COLUMNS)
+            for i in range(rows):
+                share = 60 + revision * 5
+                writer.writerow((
+                    f"Вино {i:06d}",
+                    f"Benchmark {marker} {i % 1000}",
+                    f"Страна {marker} {i % 20}",
+                    f"Регион {marker} {i % 200}",
+                    f"Категория {marker} {i % 5}",
+                    f"Цвет {marker} {i % 3}",
+                    f"Сахар {marker} {i % 4}",
+                    0.75,
+                    500 + i % 5000 + revision * 100,
+                    2000 + i % 24,
+                    "Синтетическое описание с нотами вишни и дуба",
+                    f"Сорт {marker} {i % 50}:{share}; Сорт {marker} {(i + 1) % 50}:{100 - share}",
+                ))
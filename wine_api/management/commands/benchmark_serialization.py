@@ -0,0 +1,138 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from wine_api.fast_serialization import JSON_ENCODER
+from wine_api.models import (
+    Country,
+    GrapeVariety,
+    Producer,
+    Region,
+    Wine,
+    WineCategory,
+    WineColor,
+    WineGrapeComposition,
+    WineSugar,
+)
+from wine_api.views import WineViewSet
+
+
+class BenchmarkWineViewSet(WineViewSet):
+    """Список вин без готовых карточек и кеша ответов"""
+    serve_cards = False
+
+    def use_response_cache(self, request):
+        return False
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость сериализации списка вин через DRF и быстрым путём "
+        "на синтетических данных и проверяет, что ответы совпадают побайтово"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help="Количество вин в списке (по умолчанию 1000 10000 100000)",
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help="Число замеров для каждого пути, берётся лучший (по умолчанию 3)",
+        )
+
+    def handle(self, *args, **options):
+        # Синтетические вина создаются в транзакции, которая откатывается
+        try:
+            with transaction.atomic():
+                self.run(options['sizes'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        producer = Producer.objects.create(name="Benchmark", description="Синтетический производитель")
+        dictionaries = {
+            'category': WineCategory.objects.create(name="Benchmark"),
+            'sugar': WineSugar.objects.create(name="Benchmark"),
+            'color': WineColor.objects.create(name="Benchmark"),
+            'country': Country.objects.create(name="Benchmark"),
+            'region': Region.objects.create(name="Benchmark"),
+        }
+        grapes = [GrapeVariety.objects.create(name=f"Benchmark {i}") for i in range(2)]
+
+        factory = APIRequestFactory()
+        path = f'/api/wines/?paginate=false&producer_id={producer.pk}'
+        views = {
+            'drf': BenchmarkWineViewSet.as_view({'get': 'list'}, fast_serialization=False),
+            'fast': BenchmarkWineViewSet.as_view({'get': 'list'}, fast_serialization=True),
+        }
+
+        created = 0
+        self.stdout.write(f"Кодировщик JSON быстрого пути: {JSON_ENCODER}")
+        self.stdout.write(f"{'вин':>8} {'DRF, мс':>10} {'быстрый, мс':>12} {'ускорение':>10}")
+        for size in sorted(sizes):
+            if size > created:
+                self.create_wines(producer, dictionaries, grapes, created, size)
+                created = size
+
+            timings = {}
+            contents = {}
+            for name, view in views.items():
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    response = view(factory.get(path))
+                    if hasattr(response, 'render'):
+                        response.render()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[name] = best
+                contents[name] = response.content
+
+            if contents['drf'] != contents['fast']:
+                raise CommandError(f"Ответы для {size} вин различаются")
+            self.stdout.write(
+                f"{size:>8} {timings['drf'] * 1000:>10.1f} {timings['fast'] * 1000:>12.1f} "
+                f"{timings['drf'] / timings['fast']:>9.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Готово, ответы совпадают побайтово"))
+
+    @staticmethod
+    def create_wines(producer, dictionaries, grapes, start, stop):
+        wines = Wine.objects.bulk_create(
+            [
+                Wine(
+                    name=f"Вино {i:06d}",
+                    producer=producer,
+                    volume=0.75,
+                    price=500 + i % 5000,
+                    aging=2000 + i % 24,
+                    aging_caption="урожай" if i % 3 == 0 else None,
+                    description="Синтетическое описание с нотами вишни и дуба",
+                    **dictionaries,
+                )
+                for i in range(start, stop)
+            ],
+            batch_size=1000,
+        )
+        WineGrapeComposition.objects.bulk_create(
+            [
+                WineGrapeComposition(wine=wine, grape_variety=grape, percentage=percentage)
+                for wine in wines
+                for grape, percentage in zip(grapes, (60, 40))
+            ],
+            batch_size=1000,
+        )
@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from wine_api.images import compute_variants, needs_variants
+from wine_api.models import Event, Wine
+from wine_api.signals import events_bulk_changed, wines_bulk_changed
+
+MODELS = {
+    'wines': Wine,
+    'events': Event,
+}
+
+
+class Command(BaseCommand):
+    help = "Строит производные изображений вин и событий (уменьшенные копии в WebP/AVIF)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=list(MODELS),
+            help="Обработать только вина или только события",
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Пересобрать производные и для изображений, у которых они уже есть",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help="Количество объектов в одной пачке (по умолчанию 100)",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Количество потоков кодирования (по умолчанию — число процессоров)",
+        )
+
+    def handle(self, *args, **options):
+        names = [options['model']] if options['model'] else list(MODELS)
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for name in names:
+                self.build(name, MODELS[name], executor, options)
+
+    def build(self, name, model, executor, options):
+        batch_size = options['batch_size']
+        ids = list(
+            model.objects
+            .exclude(Q(image='') | Q(image__isnull=True), image_variants={})
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        built = 0
+        for start in range(0, len(ids), batch_size):
+            instances = list(
+                model.objects.filter(pk__in=ids[start:start + batch_size]).only('pk', 'image', 'image_variants')
+            )
+            if not options['force']:
+                instances = [instance for instance in instances if needs_variants(instance)]
+            # Одинаковые загрузки хранятся одним файлом — производные
+            # строятся один раз для каждого файла пачки
+            groups = {}
+            for instance in instances:
+                groups.setdefault(instance.image.name or None, []).append(instance)
+            results = executor.map(self.compute, [group[0] for group in groups.values()])
+
+            changed = []
+            for group, variants in zip(groups.values(), results):
+                if variants is None:
+                    continue
+                for instance in group:
+                    if self.save(model, instance, variants):
+                        changed.append(instance.pk)
+            built += len(changed)
+            self.invalidate(model, changed)
+            self.stdout.write(f"{name}: обработано {min(start + batch_size, len(ids))}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"{name}: построены производные для {built} объектов"))
+
+    def save(self, model, instance, variants):
+        # Изображение могло измениться во время кодирования — тогда
+        # его производные построит обработчик сигнала
+        if instance.image:
+            same_image = Q(image=instance.image.name)
+        else:
+            same_image = Q(image='') | Q(image__isnull=True)
+        return model.objects.filter(same_image, pk=instance.pk).update(image_variants=variants)
+
+    def compute(self, instance):
+        try:
+            return compute_variants(instance)
+        except Exception as error:
+            self.stderr.write(f"{instance._meta.model_name} {instance.pk}: {error}")
+            return None
+        finally:
+            # Соединение с базой открывается в потоке пула
+            connection.close()
+
+    def invalidate(self, model, ids):
+        if ids:
+            wines_bulk_changed(ids) if model is Wine else events_bulk_changed(ids)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wine_api.similarity import build_index, index_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит индекс похожих вин по всему каталогу, сохраняет снимок в "
+        "SIMILARITY_INDEX_PATH (процессы перечитывают его сами) и чистит "
+        "старые записи журнала изменений"
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        wines = build_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Индекс похожих вин: {wines} вин, {index_path()} ({time.monotonic() - started:.1f} с)"
+        ))
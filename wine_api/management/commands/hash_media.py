@@ -0,0 +1,130 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wine_api.images import IMAGE_VARIANT_FORMATS, variant_names
+from wine_api.models import Event, Wine
+from wine_api.signals import events_bulk_changed, wines_bulk_changed
+from wine_api.storage import HASHED_MEDIA_DIR, HashedFileSystemStorage, is_hashed_name
+
+MODELS = {
+    'wines': Wine,
+    'events': Event,
+}
+
+# Уведомление об изменении объектов модели после update() в обход сигналов
+BULK_CHANGED = {
+    Wine: wines_bulk_changed,
+    Event: events_bulk_changed,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит изображения вин и событий из MEDIA_ROOT в хранилище с именами "
+        "по содержимому и переписывает пути в базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Количество объектов в одной пачке (по умолчанию 500)",
+        )
+        parser.add_argument(
+            '--delete-old',
+            action='store_true',
+            help="Удалить перенесённые файлы, на которые больше не ссылается ни один объект",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, HashedFileSystemStorage):
+            raise CommandError("Хранилище по умолчанию не HashedFileSystemStorage (см. STORAGES)")
+
+        # Прежнее имя -> имя по содержимому; один файл переносится один раз
+        self.renamed = {}
+        self.missing = set()
+        for name, model in MODELS.items():
+            self.migrate(name, model, options['batch_size'])
+
+        if self.missing:
+            missing = ', '.join(sorted(self.missing)[:20])
+            self.stdout.write(self.style.WARNING(f"Файлы не найдены ({len(self.missing)}): {missing}"))
+        if options['delete_old']:
+            self.delete_old()
+        self.stdout.write(self.style.SUCCESS(f"Готово, перенесено файлов: {len(self.renamed)}"))
+
+    def migrate(self, name, model, batch_size):
+        ids = list(
+            model.objects
+            .exclude(image='')
+            .exclude(image__isnull=True)
+            .exclude(image__startswith=f'{HASHED_MEDIA_DIR}/')
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        moved = 0
+        for start in range(0, len(ids), batch_size):
+            rows = model.objects.filter(pk__in=ids[start:start + batch_size]).values_list('pk', 'image', 'image_variants')
+            changed = []
+            with transaction.atomic():
+                for pk, image, variants in rows:
+                    new_image = self.rename(image)
+                    if new_image is None:
+                        continue
+                    if variants and variants.get('source') == image:
+                        variants = self.rename_variants(variants, new_image)
+                    else:
+                        variants = {}
+                    # Изображение могло смениться после выборки — такую строку не трогаем
+                    if model.objects.filter(pk=pk, image=image).update(image=new_image, image_variants=variants):
+                        changed.append(pk)
+            if changed:
+                BULK_CHANGED[model](changed)
+            moved += len(changed)
+            self.stdout.write(f"{name}: обработано {min(start + batch_size, len(ids))}/{len(ids)}")
+        self.stdout.write(f"{name}: пути изменены у {moved} объектов")
+
+    def rename(self, name):
+        """Имя файла по содержимому или None, если файла нет"""
+        if is_hashed_name(name):
+            return name
+        if name not in self.renamed:
+            if name in self.missing or not default_storage.exists(name):
+                self.missing.add(name)
+                return None
+            with default_storage.open(name, 'rb') as file:
+                self.renamed[name] = default_storage.save(name, file)
+        return self.renamed[name]
+
+    def rename_variants(self, variants, source):
+        """
+        Производные тоже переносятся по содержимому; если какого-то файла
+        нет, описание сбрасывается (производные построит build_image_variants).
+        """
+        result = {**variants, 'source': source}
+        for image_format in IMAGE_VARIANT_FORMATS:
+            sizes = variants.get(image_format)
+            if sizes is None:
+                continue
+            result[image_format] = {}
+            for width, name in sizes.items():
+                new_name = self.rename(name)
+                if new_name is None:
+                    return {}
+                result[image_format][width] = new_name
+        return result
+
+    def delete_old(self):
+        referenced = set()
+        for model in MODELS.values():
+            for image, variants in model.objects.values_list('image', 'image_variants'):
+                referenced.add(image)
+                referenced |= variant_names(variants or {})
+        deleted = 0
+        for old_name, new_name in self.renamed.items():
+            if old_name != new_name and old_name not in referenced:
+                default_storage.delete(old_name)
+                deleted += 1
+        self.stdout.write(f"Удалено прежних файлов: {deleted}")
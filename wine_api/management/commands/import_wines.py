@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wine_api.catalog_import import CatalogImportError, WineImporter, read_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает вина из CSV или XLSX: справочники ищутся по названию и "
+        "создаются при отсутствии, вина создаются или обновляются пачками. "
+        "Столбцы: name, producer, country, region, category, color, sugar, "
+        "volume и необязательные price, aging, aging_caption, description, "
+        "sur_lie_years, sur_lie_months, is_prime, grapes (Мерло:60; Шардоне:40)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу .csv или .xlsx")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Только показать изменения, ничего не записывая",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help="Количество вин в одной транзакции (по умолчанию 2000)",
+        )
+        parser.add_argument(
+            '--delimiter',
+            help="Разделитель CSV (по умолчанию определяется по заголовку)",
+        )
+        parser.add_argument(
+            '--sheet',
+            help="Лист XLSX (по умолчанию первый)",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # Построчный отчёт выводится в пробном режиме и с -v 2
+        log = self.stdout.write if dry_run or options['verbosity'] > 1 else None
+        importer = WineImporter(batch_size=options['batch_size'], dry_run=dry_run, log=log)
+
+        started = time.monotonic()
+        try:
+            header, rows = read_table(options['path'], options['delimiter'], options['sheet'])
+            report = importer.run(header, rows)
+        except (OSError, CatalogImportError) as error:
+            raise CommandError(str(error))
+
+        for line, message in report.errors:
+            self.stderr.write(f"Строка {line}: {message}")
+
+        counts = report.counts
+        created_dictionaries = ', '.join(
+            f"{model._meta.verbose_name_plural}: {len(names)}"
+            for model, names in report.created_dictionaries.items()
+        )
+        self.stdout.write(
+            f"Строк: {counts['rows']}, ошибок: {len(report.errors)}, повторов: {counts['duplicates']}\n"
+            f"Вин создано: {counts['created']}, обновлено: {counts['updated']}, "
+            f"без изменений: {counts['unchanged']}\n"
+            f"Состав: записано {counts['compositions_upserted']}, удалено {counts['compositions_deleted']}\n"
+            f"Новые справочники: {created_dictionaries or 'нет'}"
+        )
+        elapsed = time.monotonic() - started
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Пробный запуск, изменения не записаны ({elapsed:.1f} с)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Готово за {elapsed:.1f} с"))
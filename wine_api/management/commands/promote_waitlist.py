@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from wine_api.models import WaitlistEntry
+from wine_api.waitlist import WAITLIST_PROMOTION_BATCH, notify_promoted, promote
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит пользователей из листов ожидания в участники событий, на "
+        "которых есть свободные места, и сообщает им об этом в Telegram"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help="ID события (по умолчанию все события с очередью)")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=WAITLIST_PROMOTION_BATCH,
+            help=f"Пользователей за один шаг (по умолчанию {WAITLIST_PROMOTION_BATCH})",
+        )
+
+    def handle(self, *args, **options):
+        events = WaitlistEntry.objects.exclude(event__available=0)
+        if options['event'] is not None:
+            events = events.filter(event_id=options['event'])
+        event_ids = events.order_by('event_id').values_list('event_id', flat=True).distinct()
+
+        total = 0
+        for event_id in event_ids:
+            more = True
+            while more:
+                promoted, more = promote(event_id, options['batch_size'])
+                if promoted:
+                    notify_promoted(event_id, promoted)
+                total += len(promoted)
+                self.stdout.write(f"Событие {event_id}: переведено {len(promoted)}")
+        self.stdout.write(self.style.SUCCESS(f"Готово, переведено в участники: {total}"))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wine_api.recommendations import rebuild_neighbours, update_neighbours
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает соседей вин и событий по интересам пользователей для рекомендаций"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help="Пересчитать только объекты из очереди изменений интересов",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['incremental']:
+            items, pairs = update_neighbours()
+            message = f"Пересчитано объектов: {items}, пар соседей: {pairs}"
+        else:
+            pairs = rebuild_neighbours()
+            message = f"Сохранено пар соседей: {pairs}"
+        self.stdout.write(self.style.SUCCESS(f"{message} ({time.monotonic() - started:.1f} с)"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from wine_api.cards import CARD_VERSION, rebuild_cards
+from wine_api.models import Wine
+from wine_api.response_cache import cache_tag, invalidate_tags
+
+
+class Command(BaseCommand):
+    help = "Пересобирает предварительно отрендеренные карточки вин"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Количество вин в одной пачке (по умолчанию 500)",
+        )
+        parser.add_argument(
+            '--stale-only',
+            action='store_true',
+            help="Пересобрать только отсутствующие и устаревшие карточки",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Wine.objects.order_by('pk')
+        if options['stale_only']:
+            queryset = queryset.exclude(card__version=CARD_VERSION)
+
+        ids = list(queryset.values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            rebuild_cards(Wine.objects.filter(pk__in=batch))
+            invalidate_tags(cache_tag(Wine, pk) for pk in batch)
+            self.stdout.write(f"Пересобрано карточек: {min(start + batch_size, len(ids))}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово, карточек: {len(ids)}"))
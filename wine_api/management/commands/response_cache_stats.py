@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from wine_api.response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Показывает счётчики попаданий и промахов кеша ответов API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Обнулить счётчики после вывода",
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total * 100 if total else 0.0
+        self.stdout.write(f"Попаданий: {stats['hits']}")
+        self.stdout.write(f"Промахов: {stats['misses']}")
+        self.stdout.write(f"Доля попаданий: {ratio:.1f}%")
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Счётчики обнулены"))
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from wine_api.booking import BOOKED, CANCELLED, SoldOut, book, cancel
+from wine_api.models import Event, Person, Producer
+
+SOLD_OUT = 'sold_out'
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочная проверка бронирования: сотни параллельных броней и отмен "
+        "синтетических пользователей на одно событие. Проверяет, что мест не "
+        "продано больше, чем было, и что available сходится с участниками. "
+        "Синтетические данные сохраняются в базе и удаляются в конце. "
+        "Запускать на PostgreSQL: SQLite не допускает параллельной записи"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=50, help="Мест на событии (по умолчанию 50)")
+        parser.add_argument('--persons', type=int, default=300, help="Пользователей (по умолчанию 300)")
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=50,
+            help="Параллельных потоков, у каждого своё соединение с базой (по умолчанию 50)",
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help="Всего запросов; пользователи выбираются случайно с повторами (по умолчанию 1000)",
+        )
+        parser.add_argument(
+            '--cancel-share',
+            type=float,
+            default=0.2,
+            help="Доля отмен среди запросов (по умолчанию 0.2)",
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['persons'] < 1 or options['seats'] < 0:
+            raise CommandError("--threads и --persons должны быть больше 0, --seats — не меньше 0")
+
+        marker = uuid.uuid4().hex[:12]
+        producer = Producer.objects.create(name=f"Stress {marker}", description="Синтетический производитель")
+        event = Event.objects.create(
+            name=f"Stress {marker}",
+            date=date.today(),
+            place="Stress",
+            producer=producer,
+            available=options['seats'],
+        )
+        persons = Person.objects.bulk_create(
+            Person(nickname=f"stress-{marker}-{i}", phone=f"stress-{marker}-{i}", firstname="Stress", lastname=marker)
+            for i in range(options['persons'])
+        )
+        try:
+            results, errors, elapsed = self.run(event.pk, [person.pk for person in persons], options)
+            self.report(event, options['seats'], results, errors, elapsed)
+        finally:
+            Person.objects.filter(pk__in=[person.pk for person in persons]).delete()
+            producer.delete()
+
+    def run(self, event_id, person_ids, options):
+        rng = random.Random(0)
+        jobs = [
+            (cancel if rng.random() < options['cancel_share'] else book, rng.choice(person_ids))
+            for _ in range(options['requests'])
+        ]
+        results = Counter()
+        errors = []
+        lock = threading.Lock()
+        # Все потоки начинают одновременно
+        barrier = threading.Barrier(options['threads'])
+
+        def worker(chunk):
+            try:
+                barrier.wait()
+                for func, person_id in chunk:
+                    try:
+                        result, _ = func(event_id, person_id)
+                    except SoldOut:
+                        result = SOLD_OUT
+                    except Exception as error:
+                        with lock:
+                            errors.append(repr(error))
+                        continue
+                    with lock:
+                        results[result] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(jobs[index::options['threads']],))
+            for index in range(options['threads'])
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors, time.monotonic() - start
+
+    def report(self, event, seats, results, errors, elapsed):
+        event.refresh_from_db(fields=['available'])
+        participants = event.participants.count()
+        total = sum(results.values()) + len(errors)
+        self.stdout.write(
+            f"Запросов: {total} за {elapsed:.2f} с; "
+            + ", ".join(f"{name}: {count}" for name, count in sorted(results.items()))
+        )
+        self.stdout.write(f"Мест: {seats}, участников: {participants}, available: {event.available}")
+        if errors:
+            self.stdout.write(self.style.WARNING(f"Ошибки ({len(errors)}): {', '.join(errors[:5])}"))
+
+        problems = []
+        if participants > seats:
+            problems.append(f"продано больше мест, чем было: {participants} > {seats}")
+        if event.available != seats - participants:
+            problems.append(f"available {event.available} не равно {seats} - {participants}")
+        if results[BOOKED] - results[CANCELLED] != participants:
+            problems.append(
+                f"успешных броней {results[BOOKED]} - отмен {results[CANCELLED]} "
+                f"не равно числу участников {participants}"
+            )
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Перепродажи нет, счётчики сходятся"))
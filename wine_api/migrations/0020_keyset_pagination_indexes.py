@@ -0,0 +1,33 @@
+# Generated by Django 4.2.29 on 2026-10-17 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0019_alter_subscription_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date', 'time', 'id'], name='event_date_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['lastname', 'firstname', 'id'], name='person_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wine',
+            index=models.Index(fields=['name', 'id'], name='wine_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wine',
+            index=models.Index(fields=['price', 'id'], name='wine_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wine',
+            index=models.Index(fields=['aging', 'id'], name='wine_aging_id_idx'),
+        ),
+    ]
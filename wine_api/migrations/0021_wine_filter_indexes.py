@@ -0,0 +1,17 @@
+# Generated by Django 4.2.29 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0020_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='winegrapecomposition',
+            index=models.Index(fields=['grape_variety', 'wine'], name='grape_wine_idx'),
+        ),
+    ]
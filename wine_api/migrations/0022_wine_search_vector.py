@@ -0,0 +1,52 @@
+# Generated by Django 4.2.29 on 2026-10-17 10:05
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# GIN-индекс и начальное заполнение tsvector доступны только в PostgreSQL;
+# на других базах поиск работает через индекс в памяти (wine_api.search).
+CREATE_SEARCH_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS wine_search_vector_gin ON wine_api_wine USING gin (search_vector);
+UPDATE wine_api_wine AS w SET search_vector =
+    setweight(to_tsvector('russian', coalesce(w.name, '')), 'A')
+    || setweight(to_tsvector('russian',
+        coalesce((SELECT p.name FROM wine_api_producer p WHERE p.id = w.producer_id), '') || ' ' ||
+        coalesce((
+            SELECT string_agg(g.name, ' ')
+            FROM wine_api_winegrapecomposition c
+            JOIN wine_api_grapevariety g ON g.id = c.grape_variety_id
+            WHERE c.wine_id = w.id
+        ), '')
+    ), 'B')
+    || setweight(to_tsvector('russian', coalesce(w.aging_caption, '')), 'C')
+    || setweight(to_tsvector('russian', coalesce(w.description, '')), 'D');
+"""
+
+DROP_SEARCH_INDEX_SQL = "DROP INDEX IF EXISTS wine_search_vector_gin;"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0021_wine_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wine',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый индекс'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Триграммные GIN-индексы для подсказок при вводе. Django строит
+# icontains/istartswith как UPPER(name::text) LIKE UPPER(...), поэтому
+# индексируется именно UPPER(name). Если расширение pg_trgm недоступно,
+# миграция ничего не делает, а подсказки работают без индекса.
+TRIGRAM_INDEXES = (
+    ('wine_name_trgm', 'wine_api_wine'),
+    ('producer_name_trgm', 'wine_api_producer'),
+    ('grapevariety_name_trgm', 'wine_api_grapevariety'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0022_wine_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.29 on 2026-10-17 10:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0023_trigram_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WineCard',
+            fields=[
+                ('wine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='wine_api.wine', verbose_name='Вино')),
+                ('data', models.TextField(verbose_name='JSON карточки')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия формата')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Карточка вина',
+                'verbose_name_plural': 'Карточки вин',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='winegrapecomposition',
+            options={'ordering': ['id'], 'verbose_name': 'Содержание сорта винограда в вине', 'verbose_name_plural': 'Содержание сорта винограда в вине'},
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.29 on 2026-10-17 10:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+CATALOG_RESOURCES = ('wines', 'events', 'producers', 'grades', 'subscriptions', 'persons')
+
+
+def create_catalog_versions(apps, schema_editor):
+    CatalogVersion = apps.get_model('wine_api', 'CatalogVersion')
+    CatalogVersion.objects.bulk_create(
+        [CatalogVersion(resource=resource, version=1) for resource in CATALOG_RESOURCES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0024_wine_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50, unique=True, verbose_name='Ресурс')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия каталога',
+                'verbose_name_plural': 'Версии каталога',
+                'ordering': ['resource'],
+            },
+        ),
+        migrations.RunPython(create_catalog_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.29 on 2026-10-17 11:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0025_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wine_id', models.BigIntegerField(verbose_name='ID вина')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение для похожих вин',
+                'verbose_name_plural': 'Изменения для похожих вин',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.29 on 2026-10-17 11:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0026_similarity_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('wine', 'Вино'), ('event', 'Событие')], max_length=10, verbose_name='Тип объекта')),
+                ('item_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение интересов',
+                'verbose_name_plural': 'Изменения интересов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('wine', 'Вино'), ('event', 'Событие')], max_length=10, verbose_name='Тип объекта')),
+                ('item_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('neighbour_type', models.CharField(choices=[('wine', 'Вино'), ('event', 'Событие')], max_length=10, verbose_name='Тип соседа')),
+                ('neighbour_id', models.BigIntegerField(verbose_name='ID соседа')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+            ],
+            options={
+                'verbose_name': 'Сосед по интересам',
+                'verbose_name_plural': 'Соседи по интересам',
+                'indexes': [models.Index(fields=['item_type', 'item_id'], name='neighbour_item_idx')],
+            },
+        ),
+    ]
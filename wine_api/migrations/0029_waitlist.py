@@ -0,0 +1,31 @@
+# Generated by Django 4.2.29 on 2026-10-17 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0028_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='wine_api.event', verbose_name='Событие')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='wine_api.person', verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Место в листе ожидания',
+                'verbose_name_plural': 'Лист ожидания',
+                'indexes': [models.Index(fields=['event', 'id'], name='waitlist_event_id_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(fields=('event', 'person'), name='waitlist_event_person_uniq'),
+        ),
+    ]
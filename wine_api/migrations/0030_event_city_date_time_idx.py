@@ -0,0 +1,17 @@
+# Generated by Django 4.2.29 on 2026-10-17 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wine_api', '0029_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['city', 'date', 'time', 'id'], name='event_city_date_time_idx'),
+        ),
+    ]
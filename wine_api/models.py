@@ -1,7 +1,9 @@
 from email.policy import default
 from datetime import time
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 class Producer(models.Model):
@@ -99,6 +101,12 @@ class Wine(models.Model):
     """Модель вина"""
     name = models.CharField(max_length=255, verbose_name="Название")
     image = models.ImageField(upload_to='wines/', verbose_name="Изображение", blank=True, null=True)
+    image_variants = models.JSONField(
+        verbose_name="Производные изображения",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     category = models.ForeignKey(WineCategory, on_delete=models.CASCADE, related_name='wines', verbose_name="Категория")
     sugar = models.ForeignKey(WineSugar, on_delete=models.CASCADE, related_name='wines', verbose_name="Содержание сахара")
     color = models.ForeignKey(WineColor, on_delete=models.CASCADE, related_name='wines', verbose_name="Цвет")
@@ -122,11 +130,21 @@ class Wine(models.Model):
         verbose_name="Только по платной подписке",
         default=False,
     )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый индекс",
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Вино"
         verbose_name_plural = "Вина"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='wine_name_id_idx'),
+            models.Index(fields=['price', 'id'], name='wine_price_id_idx'),
+            models.Index(fields=['aging', 'id'], name='wine_aging_id_idx'),
+        ]
 
     def __str__(self):
         return self.full_name
@@ -134,23 +152,70 @@ class Wine(models.Model):
     @property
     def full_name(self):
         """Составное имя: название вина - производитель - год производства"""
-        parts = [self.name]
-        
-        if self.producer:
-            parts.append(self.producer.name)
+        producer_name = self.producer.name if self.producer else None
+        return self.compose_full_name(self.name, producer_name, self.aging_caption, self.aging)
+
+    @staticmethod
+    def compose_full_name(name, producer_name, aging_caption, aging):
+        """Составное имя из значений полей (без загрузки объекта вина)"""
+        parts = [name]
         
-        aging = []
-        if self.aging_caption:
-            aging.append(self.aging_caption)
-        if self.aging:
-            aging.append(str(self.aging))
+        if producer_name is not None:
+            parts.append(producer_name)
         
+        aging_parts = []
+        if aging_caption:
+            aging_parts.append(aging_caption)
         if aging:
-            parts.extend(aging)
+            aging_parts.append(str(aging))
+        
+        if aging_parts:
+            parts.extend(aging_parts)
         
         return " - ".join(parts)
 
 
+class WineCard(models.Model):
+    """
+    Предварительно отрендеренная JSON-карточка вина (вывод WineSerializer).
+    Пересобирается сигналами при изменении вина и связанных справочников.
+    """
+    wine = models.OneToOneField(
+        Wine,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name="Вино",
+    )
+    data = models.TextField(verbose_name="JSON карточки")
+    version = models.PositiveIntegerField(verbose_name="Версия формата")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Карточка вина"
+        verbose_name_plural = "Карточки вин"
+
+    def __str__(self):
+        return f"Карточка {self.wine_id} (v{self.version})"
+
+
+class SimilarityChange(models.Model):
+    """
+    Журнал изменений вин для индекса похожих вин: каждый процесс догоняет
+    журнал и пересчитывает только изменённые вина (см. similarity).
+    Ссылка на вино не внешний ключ — записи об удалённых винах сохраняются.
+    """
+    wine_id = models.BigIntegerField(verbose_name="ID вина")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение для похожих вин"
+        verbose_name_plural = "Изменения для похожих вин"
+
+    def __str__(self):
+        return f"Вино {self.wine_id} ({self.created_at})"
+
+
 class WineGrapeComposition(models.Model):
     wine = models.ForeignKey(Wine, on_delete=models.CASCADE)
     grape_variety = models.ForeignKey(GrapeVariety, on_delete=models.CASCADE, verbose_name="Сорт винограда")
@@ -164,6 +229,7 @@ class WineGrapeComposition(models.Model):
     class Meta:
         verbose_name = "Содержание сорта винограда в вине"
         verbose_name_plural = "Содержание сорта винограда в вине"
+        ordering = ['id']
         constraints = [
             models.CheckConstraint(
                 check=models.Q(percentage__lte=100),
@@ -174,6 +240,9 @@ class WineGrapeComposition(models.Model):
                 name='unique_wine_grape'
             )
         ]
+        indexes = [
+            models.Index(fields=['grape_variety', 'wine'], name='grape_wine_idx'),
+        ]
 
 
 class City(models.Model):
@@ -270,6 +339,9 @@ class Person(models.Model):
         verbose_name = "Пользователь приложения"
         verbose_name_plural = "Пользователи приложения"
         ordering = ['lastname', 'firstname']
+        indexes = [
+            models.Index(fields=['lastname', 'firstname', 'id'], name='person_name_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.lastname} {self.firstname} ({self.nickname})"
@@ -365,6 +437,12 @@ class Event(models.Model):
     available = models.IntegerField(verbose_name="Доступно билетов", blank=True, null=True)
     producer = models.ForeignKey(Producer, on_delete=models.CASCADE, related_name='events', verbose_name="Производитель")
     image = models.ImageField(upload_to='events/', verbose_name="Изображение")
+    image_variants = models.JSONField(
+        verbose_name="Производные изображения",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     wine_list = models.ManyToManyField(Wine, related_name='events', verbose_name="Список вин", blank=True)
     participants = models.ManyToManyField(Person, related_name='events', verbose_name="Список участников", blank=True)
     is_prime = models.BooleanField(
@@ -376,10 +454,108 @@ class Event(models.Model):
         verbose_name = "Событие"
         verbose_name_plural = "События"
         ordering = ['date', 'name']
+        indexes = [
+            models.Index(fields=['date', 'time', 'id'], name='event_date_time_id_idx'),
+            # Предстоящие события города: равенство по city, затем диапазон
+            # и сортировка по (date, time, id)
+            models.Index(fields=['city', 'date', 'time', 'id'], name='event_city_date_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class WaitlistEntry(models.Model):
+    """
+    Место в листе ожидания события. Очередь — в порядке id (FIFO):
+    позиция считается по индексу (event, id), освободившиеся места
+    получают первые в очереди (см. waitlist).
+    """
+    # Отдельный индекс по event не нужен: оба индекса ниже начинаются с него
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name='waitlist',
+        verbose_name="Событие",
+        db_index=False,
+    )
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name='waitlist', verbose_name="Пользователь")
 
+    class Meta:
+        verbose_name = "Место в листе ожидания"
+        verbose_name_plural = "Лист ожидания"
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'person'], name='waitlist_event_person_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'id'], name='waitlist_event_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id}: {self.person_id}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Счётчик версии ресурса каталога (wines, events, ...). Увеличивается
+    сигналами при любом изменении данных, из которых строятся ответы API,
+    и используется для ETag / Last-Modified.
+    """
+    resource = models.CharField(max_length=50, unique=True, verbose_name="Ресурс")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Версия каталога"
+        verbose_name_plural = "Версии каталога"
+        ordering = ['resource']
 
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
+
+
+class ItemNeighbour(models.Model):
+    """
+    Сосед объекта по интересам пользователей (item-to-item): вина и события,
+    которые чаще всего отмечают вместе с данным. Пересчитывается командой
+    rebuild_recommendations.
+    """
+    WINE = 'wine'
+    EVENT = 'event'
+    ITEM_TYPES = [
+        (WINE, 'Вино'),
+        (EVENT, 'Событие'),
+    ]
+
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPES, verbose_name="Тип объекта")
+    item_id = models.BigIntegerField(verbose_name="ID объекта")
+    neighbour_type = models.CharField(max_length=10, choices=ITEM_TYPES, verbose_name="Тип соседа")
+    neighbour_id = models.BigIntegerField(verbose_name="ID соседа")
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Сосед по интересам"
+        verbose_name_plural = "Соседи по интересам"
+        indexes = [
+            models.Index(fields=['item_type', 'item_id'], name='neighbour_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_type} {self.item_id} -> {self.neighbour_type} {self.neighbour_id} ({self.score:.3f})"
+
+
+class RecommendationChange(models.Model):
+    """
+    Объекты, соседей которых нужно пересчитать после изменения интересов
+    пользователей (обрабатываются командой rebuild_recommendations --incremental).
+    """
+    item_type = models.CharField(max_length=10, choices=ItemNeighbour.ITEM_TYPES, verbose_name="Тип объекта")
+    item_id = models.BigIntegerField(verbose_name="ID объекта")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение интересов"
+        verbose_name_plural = "Изменения интересов"
+
+    def __str__(self):
+        return f"{self.item_type} {self.item_id} ({self.created_at})"
@@ -0,0 +1,218 @@
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .dictionaries import DICTIONARIES
+from .fast_serialization import RowContext, get_row_plan, render_json
+from .models import Event, Person, Producer, Wine
+from .optimization import get_plan, optimize_queryset
+from .response_cache import cache_tag
+from .serializers import _is_relation, select_fields
+
+# Модель -> ключ раздела included
+INCLUDED_KEYS = {
+    **{model: key for key, (model, _) in DICTIONARIES.items()},
+    Producer: 'producers',
+    Wine: 'wines',
+    Event: 'events',
+    Person: 'persons',
+}
+
+
+class NormalizedJSONRenderer(JSONRenderer):
+    """
+    JSON в нормализованном виде (?format=normalized): сам рендеринг не
+    отличается от JSONRenderer, ViewSet по формату строит плоские записи
+    и раздел included (см. NormalizedResponseMixin).
+    """
+    format = 'normalized'
+
+
+def is_normalized(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) == NormalizedJSONRenderer.format
+
+
+def included_key(model):
+    return INCLUDED_KEYS.get(model, model._meta.model_name)
+
+
+def normalize_serializer(serializer):
+    """
+    Сворачивает вложенные объекты с id до первичных ключей, сами объекты
+    выводятся в разделе included. Вложенные значения без id (состав
+    винограда) остаются в записи.
+
+    Возвращает {поле: (вложенный сериализатор, many)}.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if hasattr(serializer, 'sideloads'):
+        return serializer.sideloads
+
+    sideloads = {}
+    expand = {}
+    for name, field in serializer.fields.items():
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if (
+            isinstance(nested, serializers.ModelSerializer)
+            and 'id' in nested.fields
+            and _is_relation(serializer, field)
+        ):
+            sideloads[name] = (nested, nested is not field)
+        else:
+            expand[name] = {}
+    serializer.selection_key = ('normalized', select_fields(serializer, None, expand))
+    serializer.sideloads = sideloads
+    return sideloads
+
+
+def _referenced_ids(records, name, many):
+    ids = set()
+    for record in records:
+        value = record.get(name)
+        if many:
+            ids.update(value or ())
+        elif value is not None:
+            ids.add(value)
+    return ids
+
+
+def build_included(sideloads, records, context, depends_on=None):
+    """
+    Раздел included: {ключ модели: [объекты]} — каждый объект, на который
+    ссылаются записи, ровно один раз. Связи самих объектов тоже
+    сворачиваются, а связанные объекты добавляются в included (вина
+    событий -> их производители и справочники).
+
+    Объекты строятся быстрым путём (см. fast_serialization), если он
+    доступен для сериализатора, иначе через DRF; depends_on — функция
+    cache_depends_on для объектов, выведенных через DRF.
+    """
+    included = {}
+    pending = [(sideloads, records)]
+    while pending:
+        sideloads, records = pending.pop(0)
+        for name, (nested, many) in sideloads.items():
+            model = nested.Meta.model
+            key = included_key(model)
+            objects = included.setdefault(key, {})
+            ids = _referenced_ids(records, name, many) - objects.keys()
+            if not ids:
+                continue
+
+            serializer = type(nested)(context={'request': context.request, 'included': True})
+            nested_sideloads = normalize_serializer(serializer)
+            queryset = model._default_manager.filter(pk__in=ids)
+            plan = get_row_plan(serializer)
+            if plan is not None:
+                items = plan.build(list(plan.values(queryset)), context)
+            else:
+                # Для Python-представлений DRF используется стандартный json
+                context.unsafe_floats = True
+                instances = list(optimize_queryset(queryset, serializer))
+                items = [serializer.to_representation(instance) for instance in instances]
+                if depends_on is not None:
+                    depends_on(instances=instances, plan=get_plan(serializer))
+
+            for item in items:
+                objects[item['id']] = item
+            if nested_sideloads:
+                pending.append((nested_sideloads, items))
+
+    return {
+        key: [objects[pk] for pk in sorted(objects)]
+        for key, objects in included.items()
+        if objects
+    }
+
+
+class NormalizedResponseMixin:
+    """
+    Миксин для ViewSet: нормализованный ответ ?format=normalized. Записи
+    содержат первичные ключи связанных объектов вместо вложенных объектов,
+    а каждый связанный объект выводится один раз в разделе included:
+
+        {"results": [{"id": 1, "producer": 7, ...}],
+         "included": {"producers": [{"id": 7, ...}], ...}}
+
+    Детальный ответ — {"result": {...}, "included": {...}}. Параметр fields
+    применяется к записям, объекты included выводятся со всеми полями.
+
+    normalized_query_budget — бюджет SQL-запросов вместо query_budget:
+    объекты каждого типа из included загружаются отдельным запросом.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NormalizedJSONRenderer]
+    normalized_query_budget = {}
+
+    def use_normalized(self):
+        return is_normalized(self.request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.use_normalized():
+            normalize_serializer(serializer)
+        return serializer
+
+    def _depends_on(self):
+        return getattr(self, 'cache_depends_on', None)
+
+    def normalized_response(self, data, context):
+        if context.tags is not None:
+            self.cache_depends_on(*(cache_tag(model, pk, relation) for model, pk, relation in context.tags))
+        if 'indent' in (self.request.accepted_media_type or ''):
+            return Response(data)
+        return HttpResponse(render_json(data, context), content_type='application/json')
+
+    def normalized_list_response(self, queryset, extra=None):
+        """
+        Нормализованный список; extra — функция, возвращающая дополнительные
+        ключи постраничного ответа (например, фасеты).
+        """
+        serializer = self.get_serializer()
+        context = RowContext(self.request, collect_tags=self._depends_on() is not None)
+        plan = get_row_plan(serializer)
+        if plan is not None:
+            ordering_columns = [
+                field.lstrip('-')
+                for fields in getattr(self, 'cursor_orderings', {}).values()
+                for field in fields
+            ]
+            rows = plan.values(queryset, extra=ordering_columns)
+            page = self.paginate_queryset(rows)
+            records = plan.build(list(rows if page is None else page), context)
+        else:
+            context.unsafe_floats = True
+            optimized = self.filter_queryset(queryset)
+            page = self.paginate_queryset(optimized)
+            records = self.get_serializer(optimized if page is None else page, many=True).data
+
+        included = build_included(normalize_serializer(serializer), records, context, self._depends_on())
+        if page is None:
+            data = {'results': records, 'included': included}
+        else:
+            data = dict(self.get_paginated_response(records).data)
+            data['included'] = included
+            if extra is not None:
+                data.update(extra())
+        return self.normalized_response(data, context)
+
+    def list(self, request, *args, **kwargs):
+        if self.use_normalized():
+            return self.normalized_list_response(self.get_queryset())
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_normalized():
+            return super().retrieve(request, *args, **kwargs)
+        serializer = self.get_serializer(self.get_object())
+        context = RowContext(request, collect_tags=self._depends_on() is not None)
+        context.unsafe_floats = True
+        record = serializer.data
+        data = {
+            'result': record,
+            'included': build_included(normalize_serializer(serializer), [record], context, self._depends_on()),
+        }
+        return self.normalized_response(data, context)
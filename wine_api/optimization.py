@@ -0,0 +1,264 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+_plan_cache = {}
+
+# Наборы полей задаются клиентом, поэтому число кешируемых планов ограничено
+PLAN_CACHE_SIZE = 256
+
+
+class FieldSource:
+    """
+    Описание поля сериализатора, которое берёт значение из свойства модели.
+
+    columns — пути полей (через __) или имена аннотаций из annotations,
+    которые читает свойство; func(*значения) вычисляет значение поля по
+    строке values(). Если для вычисления нужны данные запроса, вместо func
+    задаётся setup(context), возвращающая такую функцию.
+    """
+
+    def __init__(self, *columns, func=None, setup=None, annotations=None):
+        self.columns = columns
+        self.func = func
+        self.setup = setup
+        self.annotations = annotations or {}
+
+    @property
+    def model_columns(self):
+        """Пути полей модели (без аннотаций)"""
+        return [column for column in self.columns if column not in self.annotations]
+
+
+def related_count(model, field):
+    """
+    Коррелированный подзапрос с количеством объектов model, ссылающихся
+    на строку внешнего запроса через field. В отличие от Count по JOIN,
+    строки не размножаются при нескольких счётчиках.
+    """
+    counts = (
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _get_field(model, attr):
+    """Поле модели по имени атрибута, включая обратные связи вида *_set"""
+    try:
+        return model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        for field in model._meta.related_objects:
+            if field.get_accessor_name() == attr:
+                return field
+    return None
+
+
+def _resolve_relation(model, source_attrs):
+    """
+    Проходит по цепочке source_attrs по связям модели.
+    Возвращает (путь из прямых FK, lookup to-many связи или None, конечная модель).
+    """
+    path = []
+    for attr in source_attrs:
+        field = _get_field(model, attr)
+        if field is None or not field.is_relation:
+            break
+        if field.many_to_many or field.one_to_many:
+            return path, attr, field.related_model
+        path.append(attr)
+        model = field.related_model
+    return path, None, model
+
+
+def _deferred_fields(model, used, keep=()):
+    """Поля модели, которые не нужны сериализатору и могут быть отложены"""
+    return [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key
+        and field.name not in used
+        and field.attname not in used
+        and field.name not in keep
+    ]
+
+
+def build_plan(serializer, model=None, keep=()):
+    """
+    Строит план загрузки для дерева сериализаторов.
+
+    План — тройка (select_related, prefetch, defer), где prefetch — кортеж
+    (lookup, модель, вложенный план), а defer — поля, которые сериализатор
+    не читает. keep — поля, которые нельзя откладывать (например, внешний
+    ключ для сопоставления при prefetch).
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = model or serializer.Meta.model
+    field_sources = getattr(serializer, 'field_sources', {})
+    select = []
+    prefetch = []
+    defer = []
+    used = set()
+    # Пути, которые нужны полям с источником через точку или field_sources
+    required = set()
+    # Если источник какого-то поля неизвестен, поля модели не откладываются
+    complete = True
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        if field.field_name in field_sources:
+            for source in field_sources[field.field_name].model_columns:
+                source_attrs = source.split('__')
+                used.add(source_attrs[0])
+                path, to_many, _ = _resolve_relation(model, source_attrs)
+                if path and to_many is None:
+                    select.append('__'.join(path))
+                    required.add(source)
+            continue
+
+        if field.source == '*':
+            complete = False
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            nested = field.child
+        else:
+            nested = field
+        source_attrs = field.source_attrs
+
+        if _get_field(model, source_attrs[0]) is None:
+            complete = False  # свойство или метод модели
+        used.add(source_attrs[0])
+
+        path, to_many, related_model = _resolve_relation(model, source_attrs)
+
+        if to_many is not None:
+            lookup = '__'.join(path + [to_many])
+            if path:
+                select.append('__'.join(path))
+            owner = model
+            for attr in path:
+                owner = _get_field(owner, attr).related_model
+            relation = _get_field(owner, to_many)
+            # Для обратного FK связанная модель должна загружать свой внешний ключ
+            nested_keep = (relation.field.name,) if relation.one_to_many else ()
+            if isinstance(nested, serializers.ModelSerializer):
+                nested_plan = build_plan(nested, related_model, keep=nested_keep)
+            elif isinstance(getattr(field, 'child_relation', None), serializers.PrimaryKeyRelatedField):
+                nested_plan = ((), (), tuple(_deferred_fields(related_model, (), nested_keep)))
+            else:
+                nested_plan = ((), (), ())
+            prefetch.append((lookup, related_model, nested_plan))
+            continue
+
+        if not path:
+            continue
+
+        lookup = '__'.join(path)
+        if isinstance(nested, serializers.PrimaryKeyRelatedField) and len(source_attrs) == 1:
+            continue  # значение берётся из столбца *_id без JOIN
+        if isinstance(nested, serializers.ModelSerializer) and len(path) == len(source_attrs):
+            nested_select, nested_prefetch, nested_defer = build_plan(nested, related_model)
+            select.append(lookup)
+            select.extend(f'{lookup}__{item}' for item in nested_select)
+            prefetch.extend(
+                (f'{lookup}__{item_lookup}', item_model, item_plan)
+                for item_lookup, item_model, item_plan in nested_prefetch
+            )
+            defer.extend(f'{lookup}__{item}' for item in nested_defer)
+        else:
+            select.append(lookup)
+            required.add('__'.join(source_attrs))
+
+    if complete:
+        defer = _deferred_fields(model, used, keep) + defer
+    else:
+        defer = [item for item in defer if '__' in item]
+
+    # Убираем дубли, сохраняя порядок
+    return (
+        tuple(dict.fromkeys(select)),
+        tuple(prefetch),
+        tuple(item for item in dict.fromkeys(defer) if item not in required),
+    )
+
+
+def _plan_key(serializer):
+    """Ключ кеша плана: класс сериализатора и выбранный клиентом набор полей"""
+    if isinstance(serializer, type):
+        return serializer, None
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    return type(serializer), getattr(serializer, 'selection_key', None)
+
+
+def get_plan(serializer):
+    """
+    План для класса или экземпляра сериализатора. Кешируется по классу и
+    набору полей, выбранному параметрами fields/expand.
+    """
+    key = _plan_key(serializer)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = build_plan(serializer() if isinstance(serializer, type) else serializer)
+        if len(_plan_cache) < PLAN_CACHE_SIZE:
+            _plan_cache[key] = plan
+    return plan
+
+
+def apply_plan(queryset, plan, keep=()):
+    """
+    Применяет план к queryset, собирая новые объекты Prefetch.
+    Поля из keep не откладываются (например, ключи сортировки).
+    """
+    select, prefetch, defer = plan
+    if select:
+        queryset = queryset.select_related(*select)
+    defer = [item for item in defer if item not in keep]
+    if defer:
+        queryset = queryset.defer(*defer)
+    lookups = []
+    for lookup, model, nested_plan in prefetch:
+        related_qs = apply_plan(model._default_manager.all(), nested_plan)
+        lookups.append(Prefetch(lookup, queryset=related_qs))
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+    return queryset
+
+
+def optimize_queryset(queryset, serializer, keep=()):
+    """
+    Добавляет к queryset select_related/Prefetch и откладывает неиспользуемые
+    поля по объявлениям сериализатора (класса или экземпляра).
+    """
+    return apply_plan(queryset, get_plan(serializer), keep)
+
+
+class OptimizedQuerysetMixin:
+    """
+    Миксин для ViewSet: автоматически подгружает связи, которые использует
+    сериализатор.
+
+    query_budget — словарь {action: число SQL-запросов одного обращения}:
+    все запросы, включая версии каталога, при промахе кеша ответов и
+    готовых карточках вин. Число не зависит от размера каталога; это
+    проверяют тесты wine_api/tests/test_query_budgets.py.
+    """
+    query_budget = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Поля сортировки нужны пагинации для курсора
+        keep = {
+            field.lstrip('-')
+            for fields in getattr(self, 'cursor_orderings', {}).values()
+            for field in fields
+        }
+        return optimize_queryset(queryset, self.get_serializer(), keep)
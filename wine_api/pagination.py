@@ -0,0 +1,161 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация по стабильному составному ключу.
+
+    Варианты сортировки передаются в orderings или берутся из атрибута
+    view.cursor_orderings — словаря {имя: (поле, ..., 'id')}, первый вариант
+    используется по умолчанию.
+    Поля с префиксом '-' сортируются по убыванию. NULL считается больше любого
+    значения (как в индексах PostgreSQL), поэтому каждая сортировка
+    обслуживается прямым или обратным проходом по составному индексу.
+
+    Параметры запроса:
+    - cursor: непрозрачный курсор следующей страницы
+    - ordering: имя варианта сортировки
+    - page_size: размер страницы (не больше max_page_size)
+    - paginate=false: вернуть весь список без пагинации
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    paginate_query_param = 'paginate'
+    invalid_cursor_message = 'Некорректный курсор'
+    invalid_ordering_message = 'Недопустимый вариант сортировки'
+
+    def __init__(self, orderings=None):
+        self.orderings = orderings
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.paginate_query_param, '').lower() in ('false', '0', 'no'):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_name, self.ordering = self.get_ordering(request, view)
+
+        queryset = queryset.order_by(*self.get_order_by(self.ordering))
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(self.ordering, cursor))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('ordering', self.ordering_name),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'ordering': {'type': 'string'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, view):
+        orderings = self.orderings or getattr(view, 'cursor_orderings', None) or {'id': ('id',)}
+        name = request.query_params.get(self.ordering_query_param)
+        if not name:
+            name = next(iter(orderings))
+        if name not in orderings:
+            raise NotFound(self.invalid_ordering_message)
+        return name, orderings[name]
+
+    @staticmethod
+    def get_order_by(ordering):
+        order_by = []
+        for field in ordering:
+            if field.startswith('-'):
+                order_by.append(F(field[1:]).desc(nulls_first=True))
+            else:
+                order_by.append(F(field).asc(nulls_last=True))
+        return order_by
+
+    @staticmethod
+    def get_keyset_filter(ordering, values):
+        """
+        Условие «строго после ключа values»:
+        (a > va) OR (a = va AND b > vb) OR ...
+        """
+        condition = None
+        equal = Q()
+        for field, value in zip(ordering, values):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            if value is None:
+                after = Q(**{f'{name}__isnull': False}) if descending else None
+                same = Q(**{f'{name}__isnull': True})
+            elif descending:
+                after = Q(**{f'{name}__lt': value})
+                same = Q(**{name: value})
+            else:
+                after = Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            if after is not None:
+                condition = equal & after if condition is None else condition | (equal & after)
+            equal &= same
+        return condition if condition is not None else Q(pk__in=[])
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            ordering_name, values = payload['o'], list(payload['k'])
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if ordering_name != self.ordering_name or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, instance):
+        if isinstance(instance, dict):
+            values = [instance[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps({'o': self.ordering_name, 'k': values}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
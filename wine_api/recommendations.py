@@ -0,0 +1,198 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from scipy import sparse
+
+from .models import ItemNeighbour, Person, RecommendationChange
+
+# Тип объекта -> (промежуточная таблица интересов, столбец объекта)
+INTEREST_SOURCES = {
+    ItemNeighbour.WINE: (Person.interested_wines.through, 'wine_id'),
+    ItemNeighbour.EVENT: (Person.interested_events.through, 'event_id'),
+}
+
+# Количество соседей, которое хранится для каждого объекта
+NEIGHBOURS_PER_ITEM = 20
+
+# Количество объектов, соседи которых считаются одним умножением матриц
+NEIGHBOURS_CHUNK_SIZE = 2000
+
+BULK_BATCH_SIZE = 5000
+
+
+def interest_items(person_ids):
+    """Множество (тип, id) объектов, которыми интересуются персоны"""
+    items = set()
+    for item_type, (through, column) in INTEREST_SOURCES.items():
+        rows = through.objects.filter(person_id__in=person_ids).values_list(column, flat=True)
+        items.update((item_type, item_id) for item_id in rows)
+    return items
+
+
+def record_interest_changes(items):
+    """Добавляет объекты в очередь пересчёта соседей"""
+    RecommendationChange.objects.bulk_create(
+        RecommendationChange(item_type=item_type, item_id=item_id) for item_type, item_id in set(items)
+    )
+
+
+class InterestMatrix:
+    """
+    Бинарная матрица «пользователи x объекты» по таблицам интересов;
+    столбцы — вина, затем события. Загружается двумя запросами values_list.
+    """
+
+    def __init__(self):
+        persons = []
+        columns = []
+        self.item_types = []
+        self.item_ids = []
+        for item_type, (through, column) in INTEREST_SOURCES.items():
+            rows = np.array(
+                list(through.objects.order_by().values_list('person_id', column)),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            item_ids, item_columns = np.unique(rows[:, 1], return_inverse=True)
+            persons.append(rows[:, 0])
+            columns.append(item_columns.ravel() + len(self.item_ids))
+            self.item_types += [item_type] * len(item_ids)
+            self.item_ids += item_ids.tolist()
+
+        person_ids, person_rows = np.unique(np.concatenate(persons), return_inverse=True)
+        columns = np.concatenate(columns)
+        self.columns = {key: column for column, key in enumerate(zip(self.item_types, self.item_ids))}
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float32), (person_rows.ravel(), columns)),
+            shape=(len(person_ids), len(self.item_ids)),
+        )
+        # Количество пользователей, интересующихся каждым объектом
+        self.counts = np.asarray(self.matrix.sum(axis=0)).ravel()
+
+    def neighbours(self, columns=None, limit=NEIGHBOURS_PER_ITEM):
+        """
+        Генератор троек массивов (столбец объекта, столбец соседа, сходство)
+        — не больше limit соседей на объект. Сходство — косинус столбцов
+        матрицы: совместные интересы / sqrt(интересы объекта * интересы соседа).
+        columns — столбцы объектов, для которых считаются соседи (None — все).
+        """
+        if columns is None:
+            columns = np.arange(len(self.item_ids))
+        columns = np.asarray(columns, dtype=np.int64)
+        matrix_csc = self.matrix.tocsc()
+        for start in range(0, len(columns), NEIGHBOURS_CHUNK_SIZE):
+            chunk = columns[start:start + NEIGHBOURS_CHUNK_SIZE]
+            cooccurrence = (matrix_csc[:, chunk].T @ self.matrix).tocoo()
+            items = chunk[cooccurrence.row]
+            neighbours = cooccurrence.col
+            mask = items != neighbours
+            items, neighbours = items[mask], neighbours[mask]
+            scores = cooccurrence.data[mask] / np.sqrt(self.counts[items] * self.counts[neighbours])
+
+            # Сортировка по объекту и убыванию сходства, затем первые limit в каждой группе
+            order = np.lexsort((neighbours, -scores, items))
+            items, neighbours, scores = items[order], neighbours[order], scores[order]
+            rank = np.arange(len(items)) - np.searchsorted(items, items, side='left')
+            keep = rank < limit
+            yield items[keep], neighbours[keep], scores[keep]
+
+    def neighbour_objects(self, columns=None):
+        """Объекты ItemNeighbour для соседей столбцов columns"""
+        for items, neighbours, scores in self.neighbours(columns):
+            for item, neighbour, score in zip(items.tolist(), neighbours.tolist(), scores.tolist()):
+                yield ItemNeighbour(
+                    item_type=self.item_types[item],
+                    item_id=self.item_ids[item],
+                    neighbour_type=self.item_types[neighbour],
+                    neighbour_id=self.item_ids[neighbour],
+                    score=score,
+                )
+
+
+def _save_neighbours(neighbours):
+    batch = []
+    count = 0
+    for neighbour in neighbours:
+        batch.append(neighbour)
+        if len(batch) >= BULK_BATCH_SIZE:
+            ItemNeighbour.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    ItemNeighbour.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def rebuild_neighbours():
+    """
+    Полный пересчёт соседей всех объектов. Очередь изменений, накопленная
+    до начала пересчёта, очищается. Возвращает количество сохранённых пар.
+    """
+    last_change = RecommendationChange.objects.order_by('-pk').values_list('pk', flat=True).first()
+    matrix = InterestMatrix()
+    with transaction.atomic():
+        ItemNeighbour.objects.all().delete()
+        count = _save_neighbours(matrix.neighbour_objects())
+        if last_change is not None:
+            RecommendationChange.objects.filter(pk__lte=last_change).delete()
+    return count
+
+
+def update_neighbours():
+    """
+    Пересчёт соседей только для объектов из очереди RecommendationChange.
+    Сходство остальных объектов с ними обновится при полном пересчёте.
+    Возвращает (количество объектов, количество сохранённых пар).
+    """
+    last_change = RecommendationChange.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if last_change is None:
+        return 0, 0
+    changed = set(
+        RecommendationChange.objects.filter(pk__lte=last_change).values_list('item_type', 'item_id')
+    )
+    matrix = InterestMatrix()
+    columns = sorted(matrix.columns[item] for item in changed if item in matrix.columns)
+
+    by_type = defaultdict(list)
+    for item_type, item_id in changed:
+        by_type[item_type].append(item_id)
+    with transaction.atomic():
+        for item_type, item_ids in by_type.items():
+            for start in range(0, len(item_ids), BULK_BATCH_SIZE):
+                ItemNeighbour.objects.filter(
+                    item_type=item_type,
+                    item_id__in=item_ids[start:start + BULK_BATCH_SIZE],
+                ).delete()
+        count = _save_neighbours(matrix.neighbour_objects(columns)) if columns else 0
+        RecommendationChange.objects.filter(pk__lte=last_change).delete()
+    return len(changed), count
+
+
+def recommend(person_id):
+    """
+    Рекомендации для персоны: соседи объектов, которыми она интересуется,
+    кроме самих этих объектов; сходства с несколькими объектами суммируются.
+    Возвращает {тип: [(id, оценка)]} по убыванию оценки.
+    """
+    items = interest_items([person_id])
+    result = {item_type: [] for item_type in INTEREST_SOURCES}
+    if not items:
+        return result
+
+    condition = Q()
+    by_type = defaultdict(list)
+    for item_type, item_id in items:
+        by_type[item_type].append(item_id)
+    for item_type, item_ids in by_type.items():
+        condition |= Q(item_type=item_type, item_id__in=item_ids)
+
+    scores = defaultdict(float)
+    rows = ItemNeighbour.objects.filter(condition).values_list('neighbour_type', 'neighbour_id', 'score')
+    for neighbour_type, neighbour_id, score in rows:
+        key = (neighbour_type, neighbour_id)
+        if key not in items:
+            scores[key] += score
+
+    for (item_type, item_id), score in sorted(scores.items(), key=lambda entry: (-entry[1], entry[0][1])):
+        result[item_type].append((item_id, round(score, 4)))
+    return result
@@ -0,0 +1,219 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+from django.http import HttpResponse
+
+from .optimization import get_plan
+from .versioning import PERSON_DEPENDENT_PARAMS
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+_GENERATION_KEY = 'generation'
+_STATS_KEYS = {'hits': 'stats:hits', 'misses': 'stats:misses'}
+
+# Заголовки, которые не сохраняются вместе с ответом
+_SKIP_HEADERS = {'content-length', 'etag', 'last-modified', 'x-cache'}
+
+
+def get_response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def cache_tag(model, pk=None, relation=None):
+    """
+    Тег зависимости: "модель:pk" для конкретного объекта, "модель:*" для
+    состава списков модели (списки, фасеты) и "модель:pk.связь" для состава
+    вложенной коллекции объекта.
+    """
+    tag = f'{model._meta.label_lower}:{"*" if pk is None else pk}'
+    return f'{tag}.{relation}' if relation else tag
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _ensure_counters(cache, keys):
+    """
+    Текущие значения счётчиков {ключ: значение}. Отсутствующие (вытесненные)
+    счётчики заводятся заново от текущего времени, чтобы не совпасть с
+    версиями, сохранёнными в старых записях.
+    """
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        start = time.time_ns()
+        for key in missing:
+            cache.add(key, start, timeout=None)
+        values.update(cache.get_many(missing))
+    return values
+
+
+def _incr(cache, key, delta=1):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass  # счётчика нет — записей, которые от него зависят, тоже нет
+
+
+def invalidate_tags(tags):
+    """
+    Инвалидирует ответы, зависящие от любого из тегов: увеличивает версии
+    тегов и общее поколение кеша.
+    """
+    cache = get_response_cache()
+    for tag in tags:
+        _incr(cache, _tag_key(tag))
+    _incr(cache, _GENERATION_KEY)
+
+
+def collect_tags(instances, plan):
+    """
+    Теги объектов, из которых сериализатор строит ответ: сами объекты и все
+    связанные объекты по плану загрузки (select_related и prefetch).
+    """
+    tags = set()
+    select, prefetch, _ = plan or ((), (), ())
+    for instance in instances:
+        tags.add(cache_tag(type(instance), instance.pk))
+        for path in select:
+            related = instance
+            for attr in path.split('__'):
+                related = getattr(related, attr, None)
+                if not isinstance(related, Model):
+                    break
+                tags.add(cache_tag(type(related), related.pk))
+        for lookup, model, nested_plan in prefetch:
+            *path, attr = lookup.split('__')
+            owner = instance
+            for name in path:
+                owner = getattr(owner, name, None)
+            if owner is None:
+                continue
+            tags.add(cache_tag(type(owner), owner.pk, attr))
+            tags |= collect_tags(getattr(owner, attr).all(), nested_plan)
+    return tags
+
+
+def get_stats():
+    """Счётчики попаданий и промахов кеша ответов"""
+    cache = get_response_cache()
+    values = cache.get_many(list(_STATS_KEYS.values()))
+    return {name: values.get(key, 0) for name, key in _STATS_KEYS.items()}
+
+
+def reset_stats():
+    get_response_cache().delete_many(list(_STATS_KEYS.values()))
+
+
+def _count(cache, name):
+    key = _STATS_KEYS[name]
+    if not cache.add(key, 1, timeout=None):
+        _incr(cache, key)
+
+
+class ResponseCacheMixin:
+    """
+    Миксин для ViewSet только для чтения: кеширует отрендеренные ответы на
+    GET-запросы по пути и нормализованным query-параметрам.
+
+    Каждая запись хранит версии тегов объектов, из которых построен ответ
+    (см. collect_tags); сигналы увеличивают версии тегов изменённых объектов,
+    поэтому правка одного региона вытесняет только ответы, которые его
+    содержат. Ответы, зависящие от данных пользователей, не кешируются.
+    """
+    response_cache_timeout = None
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (name, value)
+            for name, values in request.GET.lists()
+            for value in values
+            if value
+        )
+        parts = [
+            request.scheme,
+            request.get_host(),
+            request.path,
+            repr(params),
+            request.META.get('HTTP_ACCEPT', ''),
+        ]
+        return 'response:' + hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def use_response_cache(self, request):
+        return request.method == 'GET' and not any(
+            request.GET.get(param) for param in PERSON_DEPENDENT_PARAMS
+        )
+
+    def cache_depends_on(self, *tags, instances=(), plan=None):
+        """Добавляет зависимости текущего ответа: теги и объекты с планом связей"""
+        dependencies = getattr(self, '_response_cache_dependencies', None)
+        if dependencies is not None:
+            dependencies.update(tags)
+            dependencies.update(collect_tags(instances, plan))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if args and getattr(self, '_response_cache_sources', None) is not None:
+            instances = args[0] if kwargs.get('many') else [args[0]]
+            self._response_cache_sources.append((instances, serializer))
+        return serializer
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.use_response_cache(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = self.get_response_cache_key(request)
+        response = self._cached_response(cache, key)
+        if response is not None:
+            _count(cache, 'hits')
+            return response
+        _count(cache, 'misses')
+
+        generation = _ensure_counters(cache, [_GENERATION_KEY]).get(_GENERATION_KEY)
+        self._response_cache_dependencies = set()
+        self._response_cache_sources = []
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            self._store_response(cache, key, response, generation)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def _cached_response(self, cache, key):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        versions = cache.get_many([_tag_key(tag) for tag in entry['tags']])
+        for tag, version in entry['tags'].items():
+            if versions.get(_tag_key(tag)) != version:
+                return None
+        response = HttpResponse(entry['content'])
+        for header, value in entry['headers']:
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def _store_response(self, cache, key, response, generation):
+        tags = self._response_cache_dependencies
+        if not self.detail:
+            tags.add(cache_tag(self.get_serializer_class().Meta.model))
+        for instances, serializer in self._response_cache_sources:
+            tags |= collect_tags(instances, get_plan(serializer))
+
+        if hasattr(response, 'render'):
+            response.render()
+        versions = _ensure_counters(cache, [_tag_key(tag) for tag in tags])
+        entry = {
+            'content': response.content,
+            'headers': [(k, v) for k, v in response.items() if k.lower() not in _SKIP_HEADERS],
+            'tags': {tag: versions.get(_tag_key(tag)) for tag in tags},
+        }
+        # Ответ, посчитанный во время инвалидации, мог устареть — не сохраняем
+        if cache.get(_GENERATION_KEY) != generation:
+            return
+        timeout = self.response_cache_timeout or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60)
+        cache.set(key, entry, timeout)
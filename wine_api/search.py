@@ -0,0 +1,204 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast
+
+from .models import Producer, Wine, WineGrapeComposition
+
+SEARCH_CONFIG = 'russian'
+
+# Веса по умолчанию для ts_rank: D, C, B, A
+SEARCH_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector_expression():
+    """
+    Выражение tsvector для вина: название (A), производитель и сорта
+    винограда (B), описание года (C), описание (D).
+    """
+    producer_name = Subquery(
+        Producer.objects.filter(pk=OuterRef('producer_id')).values('name')[:1]
+    )
+    grape_names = Subquery(
+        WineGrapeComposition.objects
+        .filter(wine_id=OuterRef('pk'))
+        .values('wine_id')
+        .annotate(names=StringAgg('grape_variety__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(producer_name, grape_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('aging_caption', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_index(queryset):
+    """Пересчитывает поисковый индекс для вин из queryset"""
+    if is_postgresql():
+        queryset.order_by().update(search_vector=search_vector_expression())
+    else:
+        fallback_index.invalidate(queryset.values_list('pk', flat=True))
+
+
+def remove_from_search_index(wine_ids):
+    """Удаляет вина из поискового индекса (для PostgreSQL не требуется)"""
+    if not is_postgresql():
+        fallback_index.remove(wine_ids)
+
+
+def search_wines(queryset, query):
+    """
+    Полнотекстовый поиск вин. Возвращает queryset, отфильтрованный по запросу
+    и аннотированный релевантностью rank.
+    """
+    if is_postgresql():
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank возвращает real; приводим к double precision, чтобы значение
+        # из курсора пагинации сравнивалось с рангом без потери точности
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+        )
+
+    ranks = fallback_index.search(query)
+    if not ranks:
+        return queryset.none().annotate(rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(pk__in=ranks).annotate(rank=Case(
+        *[When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()],
+        output_field=FloatField(),
+    ))
+
+
+_word_re = re.compile(r'\w+', re.UNICODE)
+
+# Окончания, отбрасываемые упрощённым стеммером (от длинных к коротким)
+_endings = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'иям', 'иях',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ов', 'ев',
+    'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'ия',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+
+def tokenize(text):
+    """
+    Разбивает текст на нормализованные термы: нижний регистр, ё -> е и
+    упрощённое отсечение русских окончаний (приближение стеммера PostgreSQL).
+    """
+    terms = []
+    for word in _word_re.findall((text or '').lower().replace('ё', 'е')):
+        for ending in _endings:
+            if len(word) - len(ending) >= 3 and word.endswith(ending):
+                word = word[:-len(ending)]
+                break
+        terms.append(word)
+    return terms
+
+
+class PythonSearchIndex:
+    """
+    Инвертированный индекс в памяти процесса — замена tsvector для баз
+    без полнотекстового поиска (SQLite в тестах).
+
+    Индекс строится при первом поиске; изменённые вина помечаются через
+    invalidate() и переиндексируются перед следующим поиском.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)  # терм -> {wine_id: вес}
+        self._documents = {}  # wine_id -> множество термов
+        self._built = False
+        self._dirty = set()
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._built = False
+            self._dirty.clear()
+
+    def invalidate(self, wine_ids):
+        with self._lock:
+            if self._built:
+                self._dirty.update(wine_ids)
+
+    def remove(self, wine_ids):
+        with self._lock:
+            for wine_id in wine_ids:
+                self._remove(wine_id)
+                self._dirty.discard(wine_id)
+
+    def search(self, query):
+        """Возвращает {wine_id: rank} для вин, содержащих все термы запроса"""
+        terms = set(tokenize(query))
+        if not terms:
+            return {}
+        with self._lock:
+            self._sync()
+            ranks = None
+            for term in terms:
+                postings = self._postings.get(term, {})
+                if ranks is None:
+                    ranks = dict(postings)
+                else:
+                    ranks = {pk: rank + postings[pk] for pk, rank in ranks.items() if pk in postings}
+                if not ranks:
+                    return {}
+            return ranks
+
+    def _sync(self):
+        dirty = self._dirty
+        if not self._built:
+            wines = Wine.objects.all()
+            self._built = True
+        elif dirty:
+            wines = Wine.objects.filter(pk__in=dirty)
+        else:
+            return
+        self._dirty = set()
+        wines = wines.select_related('producer').prefetch_related('winegrapecomposition_set__grape_variety')
+        for wine in wines:
+            self._remove(wine.pk)
+            self._add(wine)
+            dirty.discard(wine.pk)
+        # Оставшиеся помеченные вина были удалены
+        for wine_id in dirty:
+            self._remove(wine_id)
+
+    def _add(self, wine):
+        fields = (
+            ('A', wine.name),
+            ('B', wine.producer.name),
+            ('B', ' '.join(c.grape_variety.name for c in wine.winegrapecomposition_set.all())),
+            ('C', wine.aging_caption),
+            ('D', wine.description),
+        )
+        terms = set()
+        for weight, text in fields:
+            for term in tokenize(text):
+                postings = self._postings[term]
+                postings[wine.pk] = postings.get(wine.pk, 0.0) + SEARCH_WEIGHTS[weight]
+                terms.add(term)
+        self._documents[wine.pk] = terms
+
+    def _remove(self, wine_id):
+        for term in self._documents.pop(wine_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(wine_id, None)
+                if not postings:
+                    del self._postings[term]
+
+
+fallback_index = PythonSearchIndex()
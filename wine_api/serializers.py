@@ -1,4 +1,9 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count
 from rest_framework import serializers
+
+from .images import placeholder_data, variant_urls
+from .optimization import FieldSource, related_count
 from .models import (
     Producer,
     Subscription,
@@ -19,6 +24,146 @@ from .models import (
 )
 
 
+def parse_field_paths(value):
+    """Разбирает список полей вида "a,b.c,b.d" в дерево {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for item in value.split(','):
+        node = tree
+        for name in item.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def _is_relation(serializer, field):
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None or len(field.source_attrs) != 1:
+        return False
+    try:
+        return model._meta.get_field(field.source_attrs[0]).is_relation
+    except FieldDoesNotExist:
+        return any(
+            rel.get_accessor_name() == field.source_attrs[0]
+            for rel in model._meta.related_objects
+        )
+
+
+def select_fields(serializer, fields=None, expand=None):
+    """
+    Оставляет в сериализаторе только поля из дерева fields (None — все) и
+    разворачивает вложенные объекты из дерева expand (None — все); остальные
+    вложенные объекты сворачиваются до первичных ключей. Поле с выбранными
+    вложенными полями (wine_list.name) разворачивается всегда.
+
+    Возвращает описание получившегося набора полей (ключ кеша планов).
+    """
+    if fields:
+        for name in list(serializer.fields):
+            if name not in fields:
+                serializer.fields.pop(name)
+
+    key = []
+    for name, field in list(serializer.fields.items()):
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.ModelSerializer):
+            key.append(name)
+            continue
+        sub_fields = fields.get(name) if fields else None
+        if expand is not None and name not in expand and not sub_fields and _is_relation(serializer, field):
+            kwargs = {'source': field.source} if field.source != name else {}
+            serializer.fields[name] = serializers.PrimaryKeyRelatedField(
+                many=nested is not field,
+                read_only=True,
+                **kwargs,
+            )
+            key.append((name, None))
+        else:
+            sub_expand = expand.get(name, {}) if expand is not None else None
+            key.append((name, select_fields(nested, sub_fields, sub_expand)))
+    return tuple(key)
+
+
+class FieldSelectionMixin:
+    """
+    Выбор полей ответа query-параметрами GET-запроса:
+    - fields: поля через запятую, вложенные через точку (wine_list.name)
+    - expand: вложенные объекты, которые нужно развернуть; остальные
+      сворачиваются до первичных ключей (expand=none сворачивает все).
+      Без параметра разворачиваются все, как раньше.
+    Выбор учитывается при построении плана загрузки (см. optimization),
+    поэтому невыбранные столбцы и связи не читаются из базы.
+    Объекты раздела included (см. normalized) выводятся со всеми полями,
+    а для вложенных списков, которые view выводит сам (context['nested']),
+    выбор задаёт view.
+
+    optional_fields — поля, которые выводятся, только если названы в
+    fields или expand.
+    """
+    selection_key = None
+    optional_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields = expand = None
+        if (
+            getattr(request, 'method', None) in ('GET', 'HEAD')
+            and not self.context.get('included')
+            and not self.context.get('nested')
+        ):
+            fields = request.query_params.get('fields')
+            fields = parse_field_paths(fields) if fields else None
+            expand = request.query_params.get('expand')
+            expand = parse_field_paths(expand) if expand else None
+        for name in self.optional_fields:
+            if name not in (fields or {}) and name not in (expand or {}):
+                self.fields.pop(name, None)
+        if fields or expand:
+            self.selection_key = select_fields(self, fields, expand)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Производные изображения: {формат: {ширина: URL}} (см. images). Пустой
+    объект, пока производные текущего изображения ещё не построены.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = instance.image
+        return variant_urls(image.storage, image.name, instance.image_variants, self.context.get('request'))
+
+
+class ImagePlaceholderField(serializers.Field):
+    """
+    Заглушка изображения для отрисовки до его загрузки: размеры оригинала,
+    BlurHash и основной цвет (см. images) или null, пока они не посчитаны.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return placeholder_data(instance.image.name, instance.image_variants)
+
+
+def image_variants_source(model):
+    """FieldSource поля ImageVariantsField для быстрого пути"""
+    storage = model._meta.get_field('image').storage
+
+    def setup(context):
+        request = context.get('request')
+        return lambda source, variants: variant_urls(storage, source, variants, request)
+
+    return FieldSource('image', 'image_variants', setup=setup)
+
+
 class ProducerSerializer(serializers.ModelSerializer):
     """Сериализатор для Producer (используется во вложенных объектах)"""
     class Meta:
@@ -27,10 +172,13 @@ class ProducerSerializer(serializers.ModelSerializer):
 
 
 class ProducerListSerializer(serializers.ModelSerializer):
-    """Сериализатор для списка Producer (только name и description)"""
+    """Сериализатор для списка Producer (name, description и счётчики из аннотаций view)"""
+    wine_count = serializers.IntegerField(read_only=True)
+    event_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Producer
-        fields = ['id', 'name', 'description']
+        fields = ['id', 'name', 'description', 'wine_count', 'event_count']
 
 
 class WineCategorySerializer(serializers.ModelSerializer):
@@ -92,7 +240,7 @@ class WineGrapeCompositionSerializer(serializers.ModelSerializer):
         # OR fields = ['grape_variety', 'percentage']  # For Option A
 
     
-class WineSerializer(serializers.ModelSerializer):
+class WineSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     """Сериализатор для Wine с вложенными объектами"""
     producer = ProducerSerializer(read_only=True)
     category = WineCategorySerializer(read_only=True)
@@ -105,36 +253,85 @@ class WineSerializer(serializers.ModelSerializer):
         many=True,
         read_only=True
     )
+    image_variants = ImageVariantsField()
+    image_placeholder = ImagePlaceholderField()
+
+    # Столбцы, которые читают свойство модели и производные изображения
+    field_sources = {
+        'full_name': FieldSource(
+            'name', 'producer__name', 'aging_caption', 'aging',
+            func=Wine.compose_full_name,
+        ),
+        'image_variants': image_variants_source(Wine),
+        'image_placeholder': FieldSource('image', 'image_variants', func=placeholder_data),
+    }
 
     class Meta:
         model = Wine
         fields = [
-            'id', 'name', 'full_name', 'image', 'category', 'sugar', 'color',
-            'country', 'region', 'volume', 'is_prime', 'producer', 'price',
+            'id', 'name', 'full_name', 'image', 'image_variants', 'image_placeholder',
+            'category', 'sugar', 'color', 'country', 'region', 'volume', 'is_prime', 'producer', 'price',
             'aging', 'aging_caption', 'description', 'grape_variety', 'sur_lie_years', 'sur_lie_months',   
         ]
 
 
-class ProducerDetailSerializer(serializers.ModelSerializer):
-    """Сериализатор для детальной информации Producer (включая вина)"""
-    wines = WineSerializer(many=True, read_only=True)
+class ProducerDetailSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для детальной информации Producer. Вина производителя
+    выводятся view постранично (см. ProducerViewSet.retrieve).
+    """
+    wine_count = serializers.IntegerField(read_only=True)
+    event_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Producer
-        fields = ['id', 'name', 'description', 'wines']
+        fields = ['id', 'name', 'description', 'wine_count', 'event_count']
+
 
+# Счётчики участников и интересующихся событием — подзапросами по
+# промежуточным таблицам; ими же view аннотирует queryset для DRF
+EVENT_COUNTS = {
+    'participant_count': related_count(Event.participants.through, 'event'),
+    'interested_count': related_count(Person.interested_events.through, 'event'),
+}
 
-class EventSerializer(serializers.ModelSerializer):
-    """Сериализатор для Event с вложенными объектами"""
+
+class EventSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для Event с вложенными объектами. Вместо списка
+    участников выводятся счётчики; сам список — по fields или
+    expand=participants.
+    """
     city = CitySerializer(read_only=True)
     producer = ProducerSerializer(read_only=True)
     wine_list = WineSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField()
+    image_placeholder = ImagePlaceholderField()
+    participant_count = serializers.IntegerField(read_only=True)
+    interested_count = serializers.IntegerField(read_only=True)
+
+    optional_fields = ('participants',)
+    field_sources = {
+        'image_variants': image_variants_source(Event),
+        'image_placeholder': FieldSource('image', 'image_variants', func=placeholder_data),
+        'participant_count': FieldSource(
+            'participant_count',
+            annotations={'participant_count': EVENT_COUNTS['participant_count']},
+            func=int,
+        ),
+        'interested_count': FieldSource(
+            'interested_count',
+            annotations={'interested_count': EVENT_COUNTS['interested_count']},
+            func=int,
+        ),
+    }
 
     class Meta:
         model = Event
         fields = [
             'id', 'name', 'date', 'time', 'city', 'place', 'address',
-            'price', 'available', 'is_prime', 'producer', 'image', 'wine_list', 'participants',
+            'price', 'available', 'is_prime', 'producer', 'image', 'image_variants', 'image_placeholder',
+            'wine_list', 'participant_count', 'interested_count', 'participants',
         ]
 
 
@@ -169,6 +366,25 @@ class GradeSerializer(serializers.ModelSerializer):
             "next_grade_required_tastings",
         ]
 
+def grade_lookup(context):
+    """
+    Функция «число посещённых дегустаций -> грейд» для быстрого пути;
+    повторяет Person.grade, но загружает грейды одним запросом.
+    """
+    grades = [
+        (grade.required_tastings, dict(GradeSerializer(grade, context=context).data))
+        for grade in PersonGrade.objects.select_related('next_grade').order_by('-required_tastings')
+    ]
+
+    def lookup(visited):
+        for required_tastings, data in grades:
+            if required_tastings <= visited:
+                return data
+        return None
+
+    return lookup
+
+
 class FeatureSerializer(serializers.ModelSerializer):
     """Сериализатор для Feature"""
     class Meta:
@@ -184,12 +400,27 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         model = Subscription
         fields = ['id', 'name', 'description', 'price', 'duration', 'features']
 
-class PersonSerializer(serializers.ModelSerializer):
+class PersonSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     """Сериализатор для Person"""
     grade = GradeSerializer(read_only=True)
     visited_tastings = serializers.IntegerField(read_only=True)
     subscription = SubscriptionSerializer(read_only=True)
 
+    # Свойства считаются отдельными запросами и не читают столбцы персоны;
+    # быстрый путь считает посещения аннотацией
+    field_sources = {
+        'grade': FieldSource(
+            'visited_tastings_count',
+            annotations={'visited_tastings_count': Count('events')},
+            setup=grade_lookup,
+        ),
+        'visited_tastings': FieldSource(
+            'visited_tastings_count',
+            annotations={'visited_tastings_count': Count('events')},
+            func=int,
+        ),
+    }
+
     class Meta:
         model = Person
         fields = [
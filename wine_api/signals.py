@@ -0,0 +1,373 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cards import rebuild_cards
+from .models import (
+    City,
+    Country,
+    Event,
+    Feature,
+    GrapeVariety,
+    Person,
+    PersonGrade,
+    Producer,
+    Region,
+    Subscription,
+    Wine,
+    WineCard,
+    WineCategory,
+    WineColor,
+    WineGrapeComposition,
+    WineSugar,
+)
+from .images import needs_variants, schedule_variants
+from .response_cache import cache_tag, invalidate_tags
+from .recommendations import INTEREST_SOURCES, interest_items, record_interest_changes
+from .search import refresh_search_index, remove_from_search_index
+from .similarity import record_changes
+from .versioning import bump_versions
+from .waitlist import schedule_promotion
+
+
+@receiver(post_save, sender=Wine)
+def wine_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: refresh_search_index(Wine.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_delete, sender=Wine)
+def wine_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: remove_from_search_index([pk]))
+
+
+@receiver(post_save, sender=Producer)
+def producer_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: refresh_search_index(Wine.objects.filter(producer_id=instance.pk)))
+
+
+@receiver(post_save, sender=GrapeVariety)
+def grape_variety_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: refresh_search_index(
+        Wine.objects.filter(winegrapecomposition__grape_variety_id=instance.pk)
+    ))
+
+
+@receiver(post_save, sender=WineGrapeComposition)
+@receiver(post_delete, sender=WineGrapeComposition)
+def composition_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    wine_id = instance.wine_id
+    transaction.on_commit(lambda: refresh_search_index(Wine.objects.filter(pk=wine_id)))
+
+
+@receiver(post_save, sender=Wine)
+@receiver(post_delete, sender=Wine)
+def similarity_wine_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: record_changes([pk]))
+
+
+@receiver(post_save, sender=WineGrapeComposition)
+@receiver(post_delete, sender=WineGrapeComposition)
+def similarity_composition_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    wine_id = instance.wine_id
+    transaction.on_commit(lambda: record_changes([wine_id]))
+
+
+@receiver(post_save, sender=Wine)
+@receiver(post_save, sender=Event)
+def image_saved(sender, instance, raw=False, **kwargs):
+    if raw or not needs_variants(instance):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: schedule_variants(sender, pk))
+
+
+@receiver(post_save, sender=Event)
+def waitlist_event_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Места могли добавиться: очередь продвигается, если на событии есть места
+    if raw or instance.available == 0 or (update_fields is not None and 'available' not in update_fields):
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: schedule_promotion(pk))
+
+
+@receiver(m2m_changed, sender=Event.participants.through)
+def waitlist_participants_removed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Отмена брони или удаление участника освобождает место
+    if action != 'post_remove':
+        return
+    event_ids = pk_set if reverse else {instance.pk}
+    for pk in event_ids:
+        transaction.on_commit(lambda pk=pk: schedule_promotion(pk))
+
+
+# Справочник -> lookup для вин, карточки которых его включают
+CARD_DEPENDENCIES = {
+    Producer: 'producer_id',
+    WineCategory: 'category_id',
+    WineColor: 'color_id',
+    WineSugar: 'sugar_id',
+    Country: 'country_id',
+    Region: 'region_id',
+    GrapeVariety: 'winegrapecomposition__grape_variety_id',
+}
+
+
+@receiver(post_save, sender=Wine)
+def wine_card_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: rebuild_cards(Wine.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_save, sender=WineGrapeComposition)
+@receiver(post_delete, sender=WineGrapeComposition)
+def wine_card_composition_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    wine_id = instance.wine_id
+    transaction.on_commit(lambda: rebuild_cards(Wine.objects.filter(pk=wine_id)))
+
+
+def dictionary_card_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    lookup = CARD_DEPENDENCIES[sender]
+    transaction.on_commit(lambda: rebuild_cards(Wine.objects.filter(**{lookup: instance.pk})))
+
+
+for model in CARD_DEPENDENCIES:
+    post_save.connect(dictionary_card_changed, sender=model, dispatch_uid=f'wine_card_{model.__name__}')
+
+
+# Модель -> ресурсы каталога, ответы которых строятся из её данных
+VERSIONED_MODELS = {
+    Wine: ('wines',),
+    WineGrapeComposition: ('wines',),
+    WineCategory: ('wines',),
+    WineColor: ('wines',),
+    WineSugar: ('wines',),
+    Country: ('wines',),
+    Region: ('wines',),
+    GrapeVariety: ('wines',),
+    Producer: ('wines', 'producers', 'events'),
+    Event: ('events',),
+    City: ('events',),
+    PersonGrade: ('grades',),
+    Subscription: ('subscriptions',),
+    Feature: ('subscriptions',),
+    Person: ('persons',),
+}
+
+# Промежуточная таблица M2M -> ресурсы каталога
+VERSIONED_M2M = {
+    Event.wine_list.through: ('events',),
+    Event.participants.through: ('events', 'persons'),
+    Person.interested_wines.through: ('persons',),
+    Person.interested_events.through: ('persons', 'events'),
+    Subscription.features.through: ('subscriptions',),
+}
+
+
+def catalog_model_changed(sender, **kwargs):
+    bump_versions(*VERSIONED_MODELS[sender])
+
+
+@receiver(post_delete, sender=Person)
+def catalog_person_deleted(sender, **kwargs):
+    # Строки участников событий удаляются каскадом без m2m_changed
+    bump_versions('events')
+
+
+def catalog_m2m_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions(*VERSIONED_M2M[sender])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(catalog_model_changed, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+    post_delete.connect(catalog_model_changed, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+
+for through in VERSIONED_M2M:
+    m2m_changed.connect(catalog_m2m_changed, sender=through, dispatch_uid=f'catalog_m2m_{through.__name__}')
+
+
+def response_cache_tags(model, instance):
+    """
+    Теги кеша ответов, которые затрагивает изменение объекта: сам объект,
+    состав списков его модели и объекты, в ответах которых он выводится
+    как элемент коллекции.
+    """
+    tags = {cache_tag(model, instance.pk), cache_tag(model)}
+    if model is Wine:
+        tags.add(cache_tag(Producer, instance.producer_id, 'wines'))
+    elif model is WineGrapeComposition:
+        # Состав влияет и на фильтр по сорту, и на поиск
+        tags |= {cache_tag(Wine, instance.wine_id), cache_tag(Wine)}
+    return tags
+
+
+def response_cache_model_changed(sender, instance, **kwargs):
+    tags = response_cache_tags(sender, instance)
+    lookup = CARD_DEPENDENCIES.get(sender)
+
+    def invalidate():
+        dependent = set(tags)
+        if lookup is not None:
+            # Готовые карточки вин содержат справочник, но не хранят его тег
+            wine_ids = Wine.objects.filter(**{lookup: instance.pk}).values_list('pk', flat=True)
+            dependent |= {cache_tag(Wine, pk) for pk in wine_ids}
+        invalidate_tags(dependent)
+
+    transaction.on_commit(invalidate)
+
+
+def response_cache_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Ответы владельца связи содержат и сам объект, и его связанные объекты,
+    # поэтому тега изменённого объекта достаточно для удалений; при изменении
+    # с обратной стороны вытесняются и затронутые владельцы
+    tags = {cache_tag(type(instance), instance.pk)}
+    if reverse and pk_set:
+        tags |= {cache_tag(model, pk) for pk in pk_set}
+    transaction.on_commit(lambda: invalidate_tags(tags))
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(response_cache_model_changed, sender=model, dispatch_uid=f'response_cache_save_{model.__name__}')
+    post_delete.connect(response_cache_model_changed, sender=model, dispatch_uid=f'response_cache_delete_{model.__name__}')
+
+for through in VERSIONED_M2M:
+    m2m_changed.connect(response_cache_m2m_changed, sender=through, dispatch_uid=f'response_cache_m2m_{through.__name__}')
+
+
+# Промежуточная таблица -> связь персоны с событиями, по которой в ответах
+# событий выводится счётчик (participant_count, interested_count)
+EVENT_COUNT_RELATIONS = {
+    Event.participants.through: 'events',
+    Person.interested_events.through: 'interested_events',
+}
+
+
+def _invalidate_events(event_ids):
+    tags = {cache_tag(Event, pk) for pk in event_ids}
+    if tags:
+        transaction.on_commit(lambda: invalidate_tags(tags))
+
+
+def event_counts_changed(sender, instance, action, pk_set, **kwargs):
+    """
+    Изменение связи со стороны персоны меняет счётчики событий, поэтому
+    вытесняются и ответы с этими событиями (со стороны события тег
+    события добавляет response_cache_m2m_changed).
+    """
+    if not isinstance(instance, Person):
+        return
+    if action == 'pre_clear':
+        _invalidate_events(getattr(instance, EVENT_COUNT_RELATIONS[sender]).values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        _invalidate_events(pk_set or ())
+
+
+for through in EVENT_COUNT_RELATIONS:
+    m2m_changed.connect(event_counts_changed, sender=through, dispatch_uid=f'event_counts_{through.__name__}')
+
+
+@receiver(pre_delete, sender=Person)
+def event_counts_person_deleted(sender, instance, **kwargs):
+    # Строки участников и интересов удаляются каскадом без m2m_changed
+    event_ids = set()
+    for relation in EVENT_COUNT_RELATIONS.values():
+        event_ids.update(getattr(instance, relation).values_list('pk', flat=True))
+    _invalidate_events(event_ids)
+
+
+# Промежуточная таблица интересов -> тип объекта рекомендаций
+INTEREST_ITEM_TYPES = {through: item_type for item_type, (through, _) in INTEREST_SOURCES.items()}
+
+
+def interests_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Ставит в очередь пересчёта соседей все объекты затронутых персон:
+    совместные интересы меняются для каждой пары их объектов.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    item_type = INTEREST_ITEM_TYPES[sender]
+    if reverse:
+        # Изменение со стороны вина или события: pk_set — персоны
+        items = {(item_type, instance.pk)}
+        if action == 'pre_clear':
+            person_ids = set(instance.interested_persons.values_list('pk', flat=True))
+        else:
+            person_ids = pk_set
+    else:
+        items = {(item_type, pk) for pk in pk_set or ()}
+        person_ids = {instance.pk}
+    items |= interest_items(person_ids)
+    transaction.on_commit(lambda: record_interest_changes(items))
+
+
+for through in INTEREST_ITEM_TYPES:
+    m2m_changed.connect(interests_changed, sender=through, dispatch_uid=f'interests_{through.__name__}')
+
+
+@receiver(pre_delete, sender=Person)
+def interests_person_deleted(sender, instance, **kwargs):
+    # Строки интересов удаляются каскадом без m2m_changed
+    items = interest_items([instance.pk])
+    transaction.on_commit(lambda: record_interest_changes(items))
+
+
+def wines_bulk_changed(wine_ids, models=()):
+    """
+    Обновляет производные данные после массовых изменений вин через
+    bulk_create/update, которые не отправляют сигналы: поисковый индекс,
+    карточки (пересобираются при чтении), журнал похожих вин, версии
+    каталога, кеш ответов и подсказок. models — справочники, в которые
+    добавлены записи.
+    """
+    wine_ids = list(wine_ids)
+    resources = set()
+    tags = set()
+    if wine_ids:
+        wines = Wine.objects.filter(pk__in=wine_ids)
+        refresh_search_index(wines)
+        WineCard.objects.filter(wine_id__in=wine_ids).delete()
+        record_changes(wine_ids)
+        producer_ids = set(wines.values_list('producer_id', flat=True))
+        resources.update(VERSIONED_MODELS[Wine])
+        tags.add(cache_tag(Wine))
+        tags.update(cache_tag(Wine, pk) for pk in wine_ids)
+        tags.update(cache_tag(Producer, pk, 'wines') for pk in producer_ids)
+    for model in models:
+        resources.update(VERSIONED_MODELS[model])
+        tags.add(cache_tag(model))
+    if resources:
+        bump_versions(*resources)
+        invalidate_tags(tags)
+
+
+def events_bulk_changed(event_ids):
+    """
+    Обновляет версии каталога и кеш ответов после изменения событий через
+    update, который не отправляет сигналы.
+    """
+    event_ids = list(event_ids)
+    if event_ids:
+        bump_versions(*VERSIONED_MODELS[Event])
+        invalidate_tags({cache_tag(Event)} | {cache_tag(Event, pk) for pk in event_ids})
@@ -0,0 +1,288 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from scipy import sparse
+
+from .models import SimilarityChange, Wine, WineGrapeComposition
+
+# Вклад признаков в итоговую оценку сходства (сумма — 1)
+SIMILARITY_WEIGHTS = {
+    'blend': 0.55,
+    'color': 0.15,
+    'sugar': 0.1,
+    'region': 0.1,
+    'price': 0.1,
+}
+
+# Журнал изменений перечитывается с перекрытием: запись, которая получила
+# меньший id или более раннее время, но зафиксирована позже соседних
+# (параллельные транзакции, расхождение часов серверов), всё равно попадёт
+# в окно. Изменения из транзакций длиннее окна учтёт следующая сборка
+# индекса командой build_similarity_index
+SIMILARITY_SYNC_OVERLAP = timedelta(minutes=10)
+
+# Сколько хранится журнал; чистит его команда build_similarity_index
+SIMILARITY_CHANGES_RETENTION = timedelta(days=1)
+
+
+class SimilarityIndexNotBuilt(Exception):
+    """Снимок индекса ещё не собран командой build_similarity_index"""
+
+
+def index_path():
+    return settings.SIMILARITY_INDEX_PATH
+
+
+def record_changes(wine_ids):
+    """Добавляет изменённые вина в журнал для индексов похожих вин"""
+    SimilarityChange.objects.bulk_create(SimilarityChange(wine_id=pk) for pk in set(wine_ids))
+
+
+def _blend_rows(wine_ids=None):
+    """
+    Строки состава (wine_id, grape_variety_id, доля). Сорт без процента
+    получает долю 1 — как и остальные сорта без процента в том же вине.
+    """
+    compositions = WineGrapeComposition.objects.order_by()
+    if wine_ids is not None:
+        compositions = compositions.filter(wine_id__in=wine_ids)
+    return [
+        (wine_id, grape_id, 1.0 if percentage is None else float(percentage))
+        for wine_id, grape_id, percentage in compositions.values_list('wine_id', 'grape_variety_id', 'percentage')
+    ]
+
+
+class SimilarityIndex:
+    """
+    Индекс похожих вин в памяти процесса: нормированные векторы состава
+    винограда (разреженная матрица вина x сорта) и массивы цвета, сахара,
+    региона и логарифма цены.
+
+    Индекс целиком строит команда build_similarity_index и сохраняет
+    снимком в SIMILARITY_INDEX_PATH; процессы только загружают снимок
+    (и перечитывают его, когда команда записала новый). Изменения вин после
+    сборки (сигналы пишут журнал SimilarityChange) применяются перед каждым
+    запросом только для изменённых вин, поэтому индекс согласован во всех
+    процессах.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._since = None
+        self._seen = set()
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+    def similar(self, wine_id, limit):
+        """
+        [(wine_id, оценка)] для limit самых похожих вин по убыванию оценки
+        или None, если вина нет в индексе. Если снимок не собран —
+        SimilarityIndexNotBuilt.
+        """
+        with self._lock:
+            self._sync()
+            position = self._positions.get(wine_id)
+            if position is None or not self._active[position]:
+                return None
+            scores = self._scores(position)
+
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if not len(candidates):
+            return []
+        limit = min(limit, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        # Равные оценки — по id, чтобы порядок был стабильным
+        top = top[np.lexsort((self._ids[top], -scores[top]))]
+        return [(int(self._ids[i]), round(float(scores[i]), 4)) for i in top]
+
+    def _scores(self, position):
+        weights = SIMILARITY_WEIGHTS
+        blend = self._blends[position].toarray().ravel()
+        scores = weights['blend'] * (self._blends @ blend)
+        for name in ('color', 'sugar', 'region'):
+            values = self._attributes[name]
+            scores += weights[name] * (values == values[position])
+        price = self._log_prices[position]
+        if not np.isnan(price):
+            # exp(-|ln p1 - ln p2|) = min(p1, p2) / max(p1, p2)
+            proximity = np.exp(-np.abs(self._log_prices - price))
+            scores += weights['price'] * np.nan_to_num(proximity)
+        scores[~self._active] = -np.inf
+        scores[position] = -np.inf
+        return scores
+
+    def _sync(self):
+        """
+        Загружает новый снимок, если команда его пересобрала, и применяет
+        журнал: перечитывается окно SIMILARITY_SYNC_OVERLAP до последней
+        синхронизации, уже применённые записи пропускаются по id.
+        """
+        path = index_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise SimilarityIndexNotBuilt
+        snapshot = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if snapshot != self._snapshot:
+            self.load(path)
+            self._snapshot = snapshot
+
+        now = timezone.now()
+        changes = list(
+            SimilarityChange.objects
+            .filter(created_at__gte=self._since)
+            .values_list('pk', 'wine_id', 'created_at')
+        )
+        new = {wine_id for pk, wine_id, _ in changes if pk not in self._seen}
+        if new:
+            self._update(new)
+        self._since = max(self._since, now - SIMILARITY_SYNC_OVERLAP)
+        self._seen = {pk for pk, _, created_at in changes if created_at >= self._since}
+
+    def _load(self, wines):
+        """Строки признаков вин: [(id, color_id, sugar_id, region_id, price)]"""
+        return list(wines.order_by().values_list('pk', 'color_id', 'sugar_id', 'region_id', 'price'))
+
+    def build(self):
+        """Строит индекс по всем винам (команда build_similarity_index)"""
+        self._built_at = timezone.now()
+        rows = self._load(Wine.objects.all())
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._positions = {wine_id: position for position, wine_id in enumerate(self._ids.tolist())}
+        self._active = np.ones(len(rows), dtype=bool)
+        self._attributes = {
+            name: np.array([-1 if row[index] is None else row[index] for row in rows], dtype=np.int64)
+            for index, name in enumerate(('color', 'sugar', 'region'), start=1)
+        }
+        self._log_prices = np.array([_log_price(row[4]) for row in rows], dtype=np.float64)
+        self._columns = {}
+        self._entries = self._blend_entries(_blend_rows())
+        self._blends = self._matrix()
+        self._since = self._built_at - SIMILARITY_SYNC_OVERLAP
+        self._seen = set()
+
+    def save(self, path):
+        """
+        Сохраняет снимок индекса; файл заменяется атомарно, поэтому
+        процессы не прочитают его наполовину записанным.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez(
+                file,
+                built_at=np.array(self._built_at.timestamp()),
+                ids=self._ids,
+                active=self._active,
+                color=self._attributes['color'],
+                sugar=self._attributes['sugar'],
+                region=self._attributes['region'],
+                log_prices=self._log_prices,
+                entry_rows=self._entries[0],
+                entry_columns=self._entries[1],
+                entry_shares=self._entries[2],
+                grape_ids=np.array(list(self._columns), dtype=np.int64),
+            )
+        os.replace(temporary, path)
+
+    def load(self, path):
+        """
+        Загружает снимок; журнал затем применяется с момента сборки минус
+        окно перекрытия (повторное применение изменения безвредно).
+        """
+        with np.load(path) as data:
+            self._built_at = datetime.fromtimestamp(float(data['built_at']), tz=dt_timezone.utc)
+            self._ids = data['ids']
+            self._positions = {wine_id: position for position, wine_id in enumerate(self._ids.tolist())}
+            self._active = data['active']
+            self._attributes = {name: data[name] for name in ('color', 'sugar', 'region')}
+            self._log_prices = data['log_prices']
+            self._entries = (data['entry_rows'], data['entry_columns'], data['entry_shares'])
+            self._columns = {grape_id: column for column, grape_id in enumerate(data['grape_ids'].tolist())}
+        self._blends = self._matrix()
+        self._since = self._built_at - SIMILARITY_SYNC_OVERLAP
+        self._seen = set()
+
+    def _update(self, wine_ids):
+        """Пересчитывает признаки изменённых вин; удалённые вина исключаются"""
+        rows = self._load(Wine.objects.filter(pk__in=wine_ids))
+        found = {row[0] for row in rows}
+        for wine_id in wine_ids - found:
+            position = self._positions.get(wine_id)
+            if position is not None:
+                self._active[position] = False
+
+        new = [row[0] for row in rows if row[0] not in self._positions]
+        if new:
+            start = len(self._ids)
+            self._ids = np.concatenate([self._ids, np.array(new, dtype=np.int64)])
+            self._positions.update((wine_id, start + offset) for offset, wine_id in enumerate(new))
+            self._active = np.concatenate([self._active, np.ones(len(new), dtype=bool)])
+            for name in self._attributes:
+                self._attributes[name] = np.concatenate([self._attributes[name], np.full(len(new), -1, dtype=np.int64)])
+            self._log_prices = np.concatenate([self._log_prices, np.full(len(new), np.nan)])
+
+        changed = set()
+        for wine_id, color_id, sugar_id, region_id, price in rows:
+            position = self._positions[wine_id]
+            changed.add(position)
+            self._active[position] = True
+            self._attributes['color'][position] = color_id
+            self._attributes['sugar'][position] = sugar_id
+            self._attributes['region'][position] = region_id
+            self._log_prices[position] = _log_price(price)
+
+        entry_rows, columns, shares = self._entries
+        keep = ~np.isin(entry_rows, np.fromiter(changed, dtype=np.int64, count=len(changed)))
+        new_rows, new_columns, new_shares = self._blend_entries(_blend_rows(found))
+        self._entries = (
+            np.concatenate([entry_rows[keep], new_rows]),
+            np.concatenate([columns[keep], new_columns]),
+            np.concatenate([shares[keep], new_shares]),
+        )
+        self._blends = self._matrix()
+
+    def _blend_entries(self, blend_rows):
+        """Массивы (строка матрицы, столбец сорта, доля) для строк состава"""
+        blend_rows = [row for row in blend_rows if row[0] in self._positions]
+        columns = self._columns
+        return (
+            np.array([self._positions[row[0]] for row in blend_rows], dtype=np.int64),
+            np.array([columns.setdefault(row[1], len(columns)) for row in blend_rows], dtype=np.int64),
+            np.array([row[2] for row in blend_rows], dtype=np.float64),
+        )
+
+    def _matrix(self):
+        """Матрица составов с нормированными строками (косинус = скалярное произведение)"""
+        rows, columns, shares = self._entries
+        shape = (len(self._ids), max(len(self._columns), 1))
+        matrix = sparse.csr_matrix((shares, (rows, columns)), shape=shape)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def build_index(path=None):
+    """
+    Строит индекс по всем винам, сохраняет снимок и удаляет из журнала
+    записи старше SIMILARITY_CHANGES_RETENTION. Возвращает число вин.
+    """
+    index = SimilarityIndex()
+    index.build()
+    index.save(path or index_path())
+    SimilarityChange.objects.filter(created_at__lt=index._built_at - SIMILARITY_CHANGES_RETENTION).delete()
+    return len(index._ids)
+
+
+def _log_price(price):
+    return np.log(price) if price and price > 0 else np.nan
+
+
+similarity_index = SimilarityIndex()
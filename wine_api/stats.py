@@ -0,0 +1,152 @@
+import hashlib
+import math
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, F, FloatField, Func, IntegerField, Max, Min, Value
+
+from .filters import wine_facets
+from .response_cache import get_response_cache
+from .versioning import CatalogState
+
+# Перцентили цены в ответе
+PRICE_PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Количество столбцов гистограммы цен по умолчанию и максимум (?buckets=)
+DEFAULT_PRICE_BUCKETS = 10
+MAX_PRICE_BUCKETS = 50
+
+
+class PercentileCont(Aggregate):
+    """percentile_cont(ARRAY[...]) WITHIN GROUP (ORDER BY ...) — массив перцентилей"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(ARRAY[%(fractions)s]::double precision[]) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fractions, **extra):
+        super().__init__(expression, output_field=ArrayField(FloatField()), **extra)
+        self.fractions = fractions
+
+    def as_sql(self, compiler, connection, **extra_context):
+        extra_context['fractions'] = ', '.join(repr(float(fraction)) for fraction in self.fractions)
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+class WidthBucket(Func):
+    """width_bucket(значение, нижняя граница, верхняя граница, число столбцов)"""
+    function = 'WIDTH_BUCKET'
+    output_field = IntegerField()
+
+
+def _percentiles(values, fractions):
+    """Перцентили с линейной интерполяцией, как percentile_cont"""
+    values = sorted(values)
+    result = []
+    for fraction in fractions:
+        position = fraction * (len(values) - 1)
+        lower = math.floor(position)
+        upper = min(lower + 1, len(values) - 1)
+        result.append(values[lower] + (values[upper] - values[lower]) * (position - lower))
+    return result
+
+
+def _price_bucket_counts(queryset, low, high, buckets):
+    """{номер столбца: количество вин} для цен в [low, high)"""
+    prices = queryset.filter(price__isnull=False)
+    if connection.vendor == 'postgresql':
+        rows = (
+            prices
+            .annotate(bucket=WidthBucket(F('price'), Value(low), Value(high), Value(buckets)))
+            .values('bucket')
+            .annotate(count=Count('id'))
+        )
+        return {row['bucket']: row['count'] for row in rows}
+
+    counts = {}
+    for price in prices.values_list('price', flat=True):
+        bucket = math.floor((price - low) * buckets / (high - low)) + 1
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return counts
+
+
+def price_stats(queryset, buckets=DEFAULT_PRICE_BUCKETS):
+    """
+    Статистика цен: количество, минимум, максимум, среднее, перцентили
+    (одним агрегирующим запросом) и гистограмма из buckets столбцов
+    равной ширины (width_bucket с GROUP BY).
+    """
+    aggregates = {
+        'count': Count('price'),
+        'min': Min('price'),
+        'max': Max('price'),
+        'avg': Avg('price'),
+    }
+    if connection.vendor == 'postgresql':
+        aggregates['percentiles'] = PercentileCont('price', PRICE_PERCENTILES)
+    stats = queryset.aggregate(**aggregates)
+
+    percentiles = stats.pop('percentiles', None)
+    if percentiles is None and stats['count']:
+        percentiles = _percentiles(
+            queryset.filter(price__isnull=False).values_list('price', flat=True),
+            PRICE_PERCENTILES,
+        )
+    stats['percentiles'] = {
+        str(round(fraction * 100)): value
+        for fraction, value in zip(PRICE_PERCENTILES, percentiles or ())
+    }
+
+    histogram = []
+    if stats['count']:
+        # Цены целые: верхняя граница исключается, поэтому берём max + 1
+        low, high = stats['min'], stats['max'] + 1
+        counts = _price_bucket_counts(queryset, low, high, buckets)
+        width = (high - low) / buckets
+        histogram = [
+            {
+                'min': low + width * index,
+                'max': low + width * (index + 1),
+                'count': counts.get(index + 1, 0),
+            }
+            for index in range(buckets)
+        ]
+    stats['histogram'] = histogram
+    return stats
+
+
+def aging_distribution(queryset):
+    """Количество вин по году производства (вина без года — aging: null)"""
+    rows = queryset.values('aging').annotate(count=Count('id')).order_by(F('aging').asc(nulls_last=True))
+    return [{'aging': row['aging'], 'count': row['count']} for row in rows]
+
+
+def wine_stats(queryset, buckets=DEFAULT_PRICE_BUCKETS):
+    """
+    Статистика по отфильтрованному queryset вин: цены, распределение по
+    годам и количество вин по значениям справочников (как фасеты списка).
+    """
+    queryset = queryset.order_by()
+    return {
+        'count': queryset.count(),
+        'price': price_stats(queryset, buckets),
+        'aging': aging_distribution(queryset),
+        'dimensions': wine_facets(queryset),
+    }
+
+
+def cached_wine_stats(queryset, resources, params, buckets=DEFAULT_PRICE_BUCKETS):
+    """
+    wine_stats с кешем по версиям ресурсов каталога resources: запись
+    пересчитывается только после изменения каталога. params — параметры
+    запроса, от которых зависит queryset.
+    """
+    state = CatalogState(resources)
+    versions = ','.join(f'{resource}:{version}' for resource, version in sorted(state.versions.items()))
+    filters = repr(sorted((name, value) for name, values in params.lists() for value in values if value))
+    key = 'wine-stats:' + hashlib.sha1(f'{versions}|{buckets}|{filters}'.encode('utf-8')).hexdigest()
+    cache = get_response_cache()
+    stats = cache.get(key)
+    if stats is None:
+        stats = wine_stats(queryset, buckets)
+        cache.set(key, stats, settings.RESPONSE_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,101 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+# Каталог файлов с именами по содержимому: blobs/ab/ab12...ef.jpg
+HASHED_MEDIA_DIR = 'blobs'
+
+# Файл по такому адресу никогда не меняется — его можно кешировать навсегда
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_HASHED_NAME_RE = re.compile(rf'^{HASHED_MEDIA_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[0-9a-z]+)?$')
+
+
+def hashed_name(name, content):
+    """Имя файла по SHA-256 содержимого с расширением по типу исходного имени"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    digest = digest.hexdigest()
+    extension = posixpath.splitext(str(name))[1].lower()
+    # Одно расширение для типа (.jpeg -> .jpg), чтобы одинаковые файлы совпадали по имени
+    content_type, _ = mimetypes.guess_type(f'file{extension}')
+    if content_type is not None:
+        extension = mimetypes.guess_extension(content_type) or extension
+    return posixpath.join(HASHED_MEDIA_DIR, digest[:2], digest + extension)
+
+
+def is_hashed_name(name):
+    return bool(name) and _HASHED_NAME_RE.match(str(name)) is not None
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Файловое хранилище с адресацией по содержимому: файл сохраняется под
+    именем из хеша SHA-256 (upload_to поля не используется), поэтому
+    одинаковые загрузки хранятся один раз, а адрес файла никогда не
+    указывает на другое содержимое.
+
+    Файл записывается во временный и переименовывается атомарно —
+    по адресу файла не может быть отдан недописанный файл. Один файл может
+    принадлежать нескольким объектам: удалять его можно только после
+    проверки, что на него больше никто не ссылается.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return super().save(hashed_name(name, content), content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Существующий файл с тем же именем имеет то же содержимое
+        name = str(name).replace('\\', '/')
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f'Storage can not find an available filename for "{name}". '
+                'Please make sure that the corresponding file field '
+                'allows sufficient "max_length".'
+            )
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+            os.chmod(temporary_path, self.file_permissions_mode or 0o644)
+            # Параллельная загрузка того же содержимого перезапишет файл тем же
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return name
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    django.views.static.serve, который отдаёт файлы с именами по
+    содержимому с заголовком Cache-Control: immutable на год.
+    """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_hashed_name(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
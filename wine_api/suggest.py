@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import GrapeVariety, Producer, Wine
+from .versioning import CatalogState
+
+# Тип подсказки -> модель
+SUGGEST_MODELS = {
+    'wines': Wine,
+    'producers': Producer,
+    'grape_varieties': GrapeVariety,
+}
+
+# Версии каталога, от которых зависят подсказки: изменения производителей
+# и сортов винограда тоже увеличивают версию wines
+SUGGEST_RESOURCES = ('wines',)
+
+_trigram_available = {}
+
+
+def has_trigram():
+    """Установлено ли расширение pg_trgm в текущей базе"""
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available[connection.alias] = cursor.fetchone() is not None
+    return _trigram_available[connection.alias]
+
+
+def suggest_queryset(model, query, limit):
+    """
+    Подсказки для одной модели: сначала названия, начинающиеся с запроса,
+    затем остальные совпадения по подстроке (по убыванию триграммного
+    сходства, если доступен pg_trgm), затем по алфавиту.
+
+    icontains/istartswith обслуживаются GIN-индексом gin_trgm_ops по UPPER(name).
+    """
+    qs = model.objects.filter(name__icontains=query).annotate(
+        prefix_rank=Case(
+            When(name__istartswith=query, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ),
+    )
+    order_by = ['prefix_rank']
+    if has_trigram():
+        qs = qs.annotate(similarity=TrigramSimilarity('name', query))
+        order_by.append('-similarity')
+    order_by += ['name', 'id']
+    return qs.order_by(*order_by).values_list('id', 'name')[:limit]
+
+
+class SuggestCache:
+    """
+    Ограниченный LRU-кеш подсказок в памяти процесса.
+    Каждая запись помечена версией каталога, при которой она посчитана;
+    версия общая для всех процессов (CatalogVersion), поэтому после
+    изменения вин, производителей или сортов в любом воркере записи
+    остальных воркеров тоже считаются устаревшими.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._data[key] = (version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+suggest_cache = SuggestCache(getattr(settings, 'SUGGEST_CACHE_SIZE', 1024))
+
+
+def suggest(query, types=None, limit=10):
+    """
+    Возвращает подсказки вида {тип: [{'id': ..., 'label': ...}, ...]}.
+    Результаты для нормализованного запроса кешируются в suggest_cache
+    до изменения версии каталога SUGGEST_RESOURCES.
+    """
+    query = ' '.join(query.split())
+    types = tuple(t for t in (types or SUGGEST_MODELS) if t in SUGGEST_MODELS)
+    # Поиск регистронезависимый, поэтому ключ кеша в нижнем регистре
+    key = (query.lower(), types, limit)
+
+    # Версия читается до подсчёта: результат, посчитанный по более новым
+    # данным, просто не будет найден при следующей версии
+    version = tuple(sorted(CatalogState(SUGGEST_RESOURCES).versions.items()))
+    result = suggest_cache.get(key, version)
+    if result is None:
+        result = {
+            name: [
+                {'id': pk, 'label': label}
+                for pk, label in suggest_queryset(SUGGEST_MODELS[name], query, limit)
+            ]
+            for name in types
+        }
+        suggest_cache.set(key, result, version)
+    return result
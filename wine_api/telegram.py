@@ -11,7 +11,11 @@ logger = logging.getLogger(__name__)
 class BotTokenIsNotSetError(Exception):
     pass
 
-def send_message(message):
+def send_message(message, chat_id=None):
+    """
+    Отправляет сообщение в чат chat_id; по умолчанию — администратору
+    (TELEGRAM_ADMIN_CHAT_ID). Пользователю пишут по его telegram_id.
+    """
     # Получаем токен бота из настроек
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     if not bot_token:
@@ -22,7 +26,7 @@ def send_message(message):
         # Отправляем сообщение через бота
         bot = Bot(token=bot_token)
         asyncio.run(bot.send_message(
-            chat_id=os.getenv('TELEGRAM_ADMIN_CHAT_ID'),
+            chat_id=chat_id or os.getenv('TELEGRAM_ADMIN_CHAT_ID'),
             text=message
         ))
     
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from wine_api.models import (
+    City,
+    Country,
+    Event,
+    Feature,
+    GrapeVariety,
+    Person,
+    PersonGrade,
+    Producer,
+    Region,
+    Subscription,
+    Wine,
+    WineCategory,
+    WineColor,
+    WineGrapeComposition,
+    WineSugar,
+)
+
+# Настройки тестов: кеш ответов в памяти теста, без фоновых потоков
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+        'responses': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tests-responses',
+            'KEY_PREFIX': 'wine_api',
+        },
+    },
+    'IMAGE_VARIANTS_WORKERS': 0,
+    'WAITLIST_WORKERS': 0,
+}
+
+
+def create_catalog(size):
+    """
+    Каталог из size вин, событий и персон, в котором заполнены все связи:
+    справочники, состав винограда, списки вин, участники и интересы.
+    Вызывать внутри captureOnCommitCallbacks(execute=True), чтобы
+    построились карточки, поисковый индекс и журнал похожих вин.
+    """
+    producers = [Producer.objects.create(name=f'Производитель {i}', description='Хозяйство') for i in range(2)]
+    categories = [WineCategory.objects.create(name=f'Категория {i}') for i in range(2)]
+    colors = [WineColor.objects.create(name=name) for name in ('Красное', 'Белое')]
+    sugars = [WineSugar.objects.create(name=name) for name in ('Сухое', 'Полусладкое')]
+    countries = [Country.objects.create(name=name) for name in ('Франция', 'Италия')]
+    regions = [Region.objects.create(name=name) for name in ('Бордо', 'Тоскана')]
+    grapes = [GrapeVariety.objects.create(name=name) for name in ('Мерло', 'Каберне Совиньон', 'Санджовезе')]
+    cities = [City.objects.create(name=name) for name in ('Москва', 'Санкт-Петербург')]
+
+    feature = Feature.objects.create(name='Дегустации')
+    subscription = Subscription.objects.create(name='Premium', price=1000)
+    subscription.features.add(feature)
+    PersonGrade.objects.create(name='Новичок', required_tastings=0)
+    PersonGrade.objects.create(name='Знаток', required_tastings=10)
+
+    wines = []
+    for i in range(size):
+        wine = Wine.objects.create(
+            name=f'Вино {i}',
+            producer=producers[i % 2],
+            category=categories[i % 2],
+            color=colors[i % 2],
+            sugar=sugars[i % 2],
+            country=countries[i % 2],
+            region=regions[i % 2],
+            volume=0.75,
+            price=1000 + 100 * i,
+            aging=2015 + i % 5,
+            description='Ноты вишни и табака',
+        )
+        WineGrapeComposition.objects.create(wine=wine, grape_variety=grapes[i % 3], percentage=60)
+        WineGrapeComposition.objects.create(wine=wine, grape_variety=grapes[(i + 1) % 3], percentage=40)
+        wines.append(wine)
+
+    persons = [
+        Person.objects.create(
+            nickname=f'person{i}',
+            phone=f'+7900000{i:04d}',
+            firstname='Имя',
+            lastname='Фамилия',
+            telegram_id=1000 + i,
+            subscription=subscription,
+        )
+        for i in range(size)
+    ]
+
+    today = timezone.localdate()
+    events = []
+    for i in range(size):
+        event = Event.objects.create(
+            name=f'Дегустация {i}',
+            date=today + timedelta(days=i + 1),
+            city=cities[i % 2],
+            place='Винный бар',
+            price=1500,
+            available=20,
+            producer=producers[i % 2],
+            image='',
+        )
+        event.wine_list.set([wines[i], wines[(i + 1) % size]])
+        event.participants.set([persons[i], persons[(i + 1) % size]])
+        events.append(event)
+
+    for i, person in enumerate(persons):
+        person.interested_wines.set([wines[i]])
+        person.interested_events.set([events[i]])
+
+    return {'wines': wines, 'events': events, 'persons': persons, 'producers': producers}
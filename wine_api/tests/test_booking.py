@@ -0,0 +1,64 @@
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from wine_api.booking import ALREADY_BOOKED, BOOKED, SoldOut, book
+from wine_api.models import Event, Person, Producer
+
+from .catalog import TEST_SETTINGS
+
+SEATS = 50
+PERSONS = 200
+# Каждая персона бронирует дважды: проверяются и места, и дубли
+CALLS = PERSONS * 2
+# Потоков меньше max_connections PostgreSQL (100 по умолчанию)
+WORKERS = 32
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Блокировки строк при бронировании проверяются на PostgreSQL')
+@override_settings(**TEST_SETTINGS)
+class ConcurrentBookingTests(TransactionTestCase):
+    """Параллельные брони не продают больше мест, чем было на событии"""
+
+    def setUp(self):
+        producer = Producer.objects.create(name='Производитель')
+        self.event = Event.objects.create(
+            name='Дегустация',
+            date=timezone.localdate(),
+            place='Винный бар',
+            available=SEATS,
+            producer=producer,
+            image='',
+        )
+        self.persons = [
+            Person.objects.create(nickname=f'person{i}', phone=f'+7900000{i:04d}', firstname='Имя', lastname='Фамилия')
+            for i in range(PERSONS)
+        ]
+
+    def book_in_thread(self, person):
+        try:
+            result, _ = book(self.event.pk, person.pk)
+            return result
+        except SoldOut:
+            return 'sold_out'
+        finally:
+            connection.close()
+
+    def test_concurrent_bookings_do_not_oversell(self):
+        persons = [self.persons[i % PERSONS] for i in range(CALLS)]
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            results = Counter(executor.map(self.book_in_thread, persons))
+
+        self.event.refresh_from_db()
+        participants = self.event.participants.count()
+        self.assertEqual(results[BOOKED], SEATS)
+        self.assertEqual(participants, SEATS)
+        self.assertGreaterEqual(self.event.available, 0)
+        self.assertEqual(self.event.available, SEATS - participants)
+        # Персона, успевшая забронировать, при повторе получает ALREADY_BOOKED
+        self.assertLessEqual(results[ALREADY_BOOKED], SEATS)
+        self.assertEqual(sum(results.values()), CALLS)
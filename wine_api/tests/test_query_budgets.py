@@ -0,0 +1,119 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from wine_api.cards import CARD_REBUILD_QUERIES
+from wine_api.models import Event, PersonGrade, Subscription, Wine, WineCard
+from wine_api.response_cache import get_response_cache
+from wine_api.search import fallback_index
+from wine_api.similarity import similarity_index
+from wine_api.views import EventViewSet, GradeViewSet, ProducerViewSet, SubscriptionViewSet, WineViewSet
+
+from .catalog import TEST_SETTINGS, create_catalog
+
+
+class QueryBudgetTests:
+    """
+    Число SQL-запросов каждого ответа равно бюджету query_budget (или
+    normalized_query_budget) его action и не зависит от размера каталога:
+    тесты запускаются на каталогах из catalog_size вин, событий и персон.
+    """
+    catalog_size = None
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.catalog = create_catalog(cls.catalog_size)
+        cls.wine = cls.catalog['wines'][0]
+        cls.event = cls.catalog['events'][0]
+        cls.producer = cls.catalog['producers'][0]
+
+    def setUp(self):
+        # Индексы процесса могли остаться от каталога другого теста
+        fallback_index.clear()
+        similarity_index.clear()
+
+    def assertBudget(self, url, budget):
+        get_response_cache().clear()
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_wine_list(self):
+        self.assertBudget('/api/wines/', WineViewSet.query_budget['list'])
+        self.assertBudget('/api/wines/?format=normalized', WineViewSet.normalized_query_budget['list'])
+
+    def test_wine_retrieve(self):
+        url = f'/api/wines/{self.wine.pk}/'
+        self.assertBudget(url, WineViewSet.query_budget['retrieve'])
+        self.assertBudget(f'{url}?format=normalized', WineViewSet.normalized_query_budget['retrieve'])
+
+    def test_wine_cards_rebuilt_on_read(self):
+        WineCard.objects.all().delete()
+        self.assertBudget('/api/wines/', WineViewSet.query_budget['list'] + CARD_REBUILD_QUERIES)
+        WineCard.objects.filter(wine=self.wine).delete()
+        self.assertBudget(f'/api/wines/{self.wine.pk}/', WineViewSet.query_budget['retrieve'] + CARD_REBUILD_QUERIES)
+
+    def test_wine_search(self):
+        # Первый поиск на SQLite строит индекс в памяти процесса
+        self.client.get('/api/wines/search/?q=вино')
+        self.assertBudget('/api/wines/search/?q=вино', WineViewSet.query_budget['search'])
+        self.assertBudget('/api/wines/search/?q=вино&format=normalized', WineViewSet.normalized_query_budget['search'])
+
+    def test_wine_stats(self):
+        budget = WineViewSet.query_budget['stats']
+        if connection.vendor != 'postgresql':
+            # Без percentile_cont перцентили считаются по ценам отдельным запросом
+            budget += 1
+        self.assertBudget('/api/wines/stats/', budget)
+
+    def test_wine_similar(self):
+        url = f'/api/wines/{self.wine.pk}/similar/'
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(SIMILARITY_INDEX_PATH=os.path.join(directory, 'similarity.npz')):
+                call_command('build_similarity_index', stdout=StringIO())
+                # Первый запрос применяет журнал изменений, записанных при создании каталога
+                self.client.get(url)
+                self.assertBudget(url, WineViewSet.query_budget['similar'])
+
+    def test_event_list(self):
+        self.assertBudget('/api/events/', EventViewSet.query_budget['list'])
+        self.assertBudget('/api/events/?format=normalized', EventViewSet.normalized_query_budget['list'])
+
+    def test_event_retrieve(self):
+        url = f'/api/events/{self.event.pk}/'
+        self.assertBudget(url, EventViewSet.query_budget['retrieve'])
+        self.assertBudget(f'{url}?format=normalized', EventViewSet.normalized_query_budget['retrieve'])
+
+    def test_event_upcoming(self):
+        self.assertBudget('/api/events/upcoming/', EventViewSet.query_budget['upcoming'])
+        self.assertBudget('/api/events/upcoming/?format=normalized', EventViewSet.normalized_query_budget['upcoming'])
+
+    def test_producers(self):
+        self.assertBudget('/api/producers/', ProducerViewSet.query_budget['list'])
+        self.assertBudget(f'/api/producers/{self.producer.pk}/', ProducerViewSet.query_budget['retrieve'])
+
+    def test_grades(self):
+        grade = PersonGrade.objects.first()
+        self.assertBudget('/api/grades/', GradeViewSet.query_budget['list'])
+        self.assertBudget(f'/api/grades/{grade.pk}/', GradeViewSet.query_budget['retrieve'])
+
+    def test_subscriptions(self):
+        subscription = Subscription.objects.first()
+        self.assertBudget('/api/subscriptions/', SubscriptionViewSet.query_budget['list'])
+        self.assertBudget(f'/api/subscriptions/{subscription.pk}/', SubscriptionViewSet.query_budget['retrieve'])
+
+
+@override_settings(**TEST_SETTINGS)
+class SmallCatalogQueryBudgetTests(QueryBudgetTests, TestCase):
+    catalog_size = 3
+
+
+@override_settings(**TEST_SETTINGS)
+class LargeCatalogQueryBudgetTests(QueryBudgetTests, TestCase):
+    # Больше размера страницы списков (50)
+    catalog_size = 60
@@ -0,0 +1,154 @@
+import unittest
+
+from django.test import TestCase, override_settings
+
+from wine_api.models import (
+    Country,
+    GrapeVariety,
+    Producer,
+    Region,
+    Wine,
+    WineCategory,
+    WineColor,
+    WineGrapeComposition,
+    WineSugar,
+)
+from wine_api.response_cache import get_response_cache
+from wine_api.search import SEARCH_WEIGHTS, fallback_index, is_postgresql
+
+from .catalog import TEST_SETTINGS
+
+
+class SearchCatalogMixin:
+    """
+    Вина, в которых слово «мерло» встречается в названии (вес A), в
+    сортах винограда (B) и в описании (D), вина с «риоха» для
+    пагинации и производитель и сорт для проверки переиндексации.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Поисковый индекс PostgreSQL обновляется после коммита
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.producer = Producer.objects.create(name='Антинори')
+            other_producer = Producer.objects.create(name='Торрес')
+            cls.dictionaries = {
+                'category': WineCategory.objects.create(name='Тихое'),
+                'color': WineColor.objects.create(name='Красное'),
+                'sugar': WineSugar.objects.create(name='Сухое'),
+                'country': Country.objects.create(name='Франция'),
+                'region': Region.objects.create(name='Бордо'),
+            }
+            merlot = GrapeVariety.objects.create(name='Мерло')
+            cls.grape = GrapeVariety.objects.create(name='Мальбек')
+
+            cls.name_match = cls.create_wine('Мерло Резерв', other_producer, description='Плотное')
+            cls.grape_match = cls.create_wine('Шато Лафит', other_producer)
+            WineGrapeComposition.objects.create(wine=cls.grape_match, grape_variety=merlot, percentage=100)
+            cls.description_match = cls.create_wine('Кло Ружар', other_producer, description='Ассамбляж с мерло')
+
+            cls.rioja = [cls.create_wine(f'Риоха {i}', other_producer) for i in range(3)]
+            cls.rioja += [cls.create_wine(f'Тинто {i}', other_producer, description='Риоха') for i in range(4)]
+
+            cls.producer_wine = cls.create_wine('Тиньянелло', cls.producer)
+            cls.grape_wine = cls.create_wine('Катена', other_producer)
+            WineGrapeComposition.objects.create(wine=cls.grape_wine, grape_variety=cls.grape, percentage=100)
+
+    @classmethod
+    def create_wine(cls, name, producer, description=''):
+        return Wine.objects.create(
+            name=name,
+            producer=producer,
+            volume=0.75,
+            price=1000,
+            description=description,
+            **cls.dictionaries,
+        )
+
+    def setUp(self):
+        fallback_index.clear()
+        get_response_cache().clear()
+
+
+@unittest.skipIf(is_postgresql(), 'На PostgreSQL поиск идёт по tsvector, а не по индексу в памяти')
+@override_settings(**TEST_SETTINGS)
+class PythonSearchIndexTests(SearchCatalogMixin, TestCase):
+
+    def test_rank_is_sum_of_field_weights(self):
+        ranks = fallback_index.search('мерло')
+        self.assertEqual(ranks, {
+            self.name_match.pk: SEARCH_WEIGHTS['A'],
+            self.grape_match.pk: SEARCH_WEIGHTS['B'],
+            self.description_match.pk: SEARCH_WEIGHTS['D'],
+        })
+
+    def test_all_terms_required(self):
+        self.assertEqual(set(fallback_index.search('мерло резерв')), {self.name_match.pk})
+        self.assertEqual(fallback_index.search('мерло бароло'), {})
+
+    def test_reindex_after_producer_rename(self):
+        self.assertEqual(set(fallback_index.search('антинори')), {self.producer_wine.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producer.name = 'Фрескобальди'
+            self.producer.save()
+        self.assertEqual(fallback_index.search('антинори'), {})
+        self.assertEqual(set(fallback_index.search('фрескобальди')), {self.producer_wine.pk})
+
+    def test_reindex_after_grape_variety_rename(self):
+        self.assertEqual(set(fallback_index.search('мальбек')), {self.grape_wine.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grape.name = 'Карменер'
+            self.grape.save()
+        self.assertEqual(fallback_index.search('мальбек'), {})
+        self.assertEqual(set(fallback_index.search('карменер')), {self.grape_wine.pk})
+
+
+@override_settings(**TEST_SETTINGS)
+class WineSearchEndpointTests(SearchCatalogMixin, TestCase):
+    """Поиск через API: на PostgreSQL — tsvector, на остальных базах — индекс в памяти"""
+
+    def search(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def search_ids(self, query):
+        return [wine['id'] for wine in self.search('/api/wines/search/', {'q': query})['results']]
+
+    def test_results_ordered_by_rank(self):
+        self.assertEqual(
+            self.search_ids('мерло'),
+            [self.name_match.pk, self.grape_match.pk, self.description_match.pk],
+        )
+
+    def test_pagination_over_results(self):
+        expected = [wine.pk for wine in self.rioja]
+        self.assertEqual(self.search_ids('риоха'), expected)
+
+        ids, pages = [], 0
+        data = self.search('/api/wines/search/', {'q': 'риоха', 'page_size': 3})
+        while True:
+            self.assertLessEqual(len(data['results']), 3)
+            ids += [wine['id'] for wine in data['results']]
+            pages += 1
+            if data['next'] is None:
+                break
+            data = self.search(data['next'])
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, expected)
+
+    def test_reindex_after_producer_rename(self):
+        self.assertEqual(self.search_ids('антинори'), [self.producer_wine.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producer.name = 'Фрескобальди'
+            self.producer.save()
+        self.assertEqual(self.search_ids('антинори'), [])
+        self.assertEqual(self.search_ids('фрескобальди'), [self.producer_wine.pk])
+
+    def test_reindex_after_grape_variety_rename(self):
+        self.assertEqual(self.search_ids('мальбек'), [self.grape_wine.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grape.name = 'Карменер'
+            self.grape.save()
+        self.assertEqual(self.search_ids('мальбек'), [])
+        self.assertEqual(self.search_ids('карменер'), [self.grape_wine.pk])
@@ -0,0 +1,63 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from wine_api.models import Event, Person, Producer, WaitlistEntry
+
+from .catalog import TEST_SETTINGS
+
+
+@override_settings(**TEST_SETTINGS)
+class BookingWithWaitlistTests(TestCase):
+    """
+    Прямая бронь при непустой очереди: фоновых потоков нет
+    (WAITLIST_WORKERS = 0), очередь продвигает сам запрос брони.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name='Дегустация',
+            date=timezone.localdate(),
+            place='Винный бар',
+            available=0,
+            producer=Producer.objects.create(name='Производитель'),
+            image='',
+        )
+        # Без telegram_id: переведённым из очереди сообщения не отправляются
+        cls.waiting = Person.objects.create(nickname='waiting', phone='+79000000001', firstname='Имя', lastname='Фамилия')
+        cls.person = Person.objects.create(
+            nickname='person', phone='+79000000002', firstname='Имя', lastname='Фамилия', telegram_id=1001,
+        )
+        WaitlistEntry.objects.create(event=cls.event, person=cls.waiting)
+
+    def book(self):
+        return self.client.post(
+            '/api/bookings/book/',
+            {'telegram_id': self.person.telegram_id, 'event_id': self.event.pk},
+            content_type='application/json',
+        )
+
+    def set_available(self, available):
+        # update() в обход сигналов: фоновый шаг очереди не запускается
+        Event.objects.filter(pk=self.event.pk).update(available=available)
+
+    def test_no_seats(self):
+        response = self.book()
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['waitlist'])
+
+    def test_free_seat_goes_to_waitlist(self):
+        self.set_available(1)
+        response = self.book()
+        # Место ушло первому в очереди, очередь пуста — мест нет
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['available'], 0)
+        self.assertFalse(WaitlistEntry.objects.filter(event=self.event).exists())
+        self.assertEqual(list(self.event.participants.all()), [self.waiting])
+
+    def test_seats_left_after_waitlist(self):
+        self.set_available(2)
+        response = self.book()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['available'], 0)
+        self.assertEqual(set(self.event.participants.all()), {self.waiting, self.person})
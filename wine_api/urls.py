@@ -13,6 +13,13 @@ from .views import (
     is_valid_user,
     send_subscription_interest_notification,
     send_subscribe_notification,
+    suggest_view,
+    dictionaries_view,
+    events_calendar_view,
+    book_event,
+    cancel_event_booking,
+    join_event_waitlist,
+    leave_event_waitlist,
 )
 
 router = DefaultRouter()
@@ -24,6 +31,8 @@ router.register(r'grades', GradeViewSet, basename='grade')
 router.register(r'subscriptions', SubscriptionViewSet, basename='subscription')
 
 urlpatterns = [
+    # До маршрутов роутера: иначе calendar.ics разбирается как events/<pk>.<format>
+    path('events/calendar.ics', events_calendar_view, name='events-calendar'),
     path('', include(router.urls)),
     path('notifications/wine-interest/', send_wine_interest_notification, name='wine-interest-notification'),
     path('notifications/event-interest/', send_event_interest_notification, name='event-interest-notification'),
@@ -31,5 +40,11 @@ urlpatterns = [
     path('notifications/subscribe-interest/', send_subscribe_notification, name='subscribe-interest-notification'),
     path('auth/bind-telegram/', bind_telegram_id, name='bind-telegram-id'),
     path('auth/is_valid_user/', is_valid_user, name='is-valid-user'),
+    path('suggest/', suggest_view, name='suggest'),
+    path('dictionaries/', dictionaries_view, name='dictionaries'),
+    path('bookings/book/', book_event, name='book-event'),
+    path('bookings/cancel/', cancel_event_booking, name='cancel-event-booking'),
+    path('bookings/waitlist/', join_event_waitlist, name='join-event-waitlist'),
+    path('bookings/waitlist/leave/', leave_event_waitlist, name='leave-event-waitlist'),
 ]
 
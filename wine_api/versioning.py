@@ -0,0 +1,93 @@
+import hashlib
+
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion
+
+# Ресурсы каталога, для которых ведутся счётчики версий
+CATALOG_RESOURCES = ('wines', 'events', 'producers', 'grades', 'subscriptions', 'persons')
+
+# Параметры запроса, результат которых зависит от данных пользователей
+PERSON_DEPENDENT_PARAMS = ('interested_telegram_id', 'participant_telegram_id')
+
+
+def bump_versions(*resources):
+    """Увеличивает версии ресурсов каталога"""
+    now = timezone.now()
+    updated = CatalogVersion.objects.filter(resource__in=resources).update(
+        version=F('version') + 1,
+        updated_at=now,
+    )
+    if updated < len(resources):
+        for resource in resources:
+            CatalogVersion.objects.get_or_create(
+                resource=resource,
+                defaults={'version': 1, 'updated_at': now},
+            )
+
+
+class CatalogState:
+    """Версии набора ресурсов на момент запроса"""
+
+    def __init__(self, resources):
+        rows = CatalogVersion.objects.filter(resource__in=resources).values_list(
+            'resource', 'version', 'updated_at',
+        )
+        self.versions = {resource: 0 for resource in resources}
+        self.last_modified = None
+        for resource, version, updated_at in rows:
+            self.versions[resource] = version
+            if self.last_modified is None or updated_at > self.last_modified:
+                self.last_modified = updated_at
+
+    def etag(self, request):
+        """
+        Сильный ETag: версии ресурсов плюс всё, от чего зависят байты ответа
+        (адрес с параметрами, хост и запрошенный формат).
+        """
+        parts = [f'{resource}:{version}' for resource, version in sorted(self.versions.items())]
+        parts += [
+            request.scheme,
+            request.get_host(),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ConditionalCatalogMixin:
+    """
+    Миксин для ViewSet только для чтения: отдаёт ETag и Last-Modified по
+    версиям ресурсов каталога и отвечает 304 на условные GET-запросы до
+    выполнения каких-либо запросов к данным. Ответы с ошибками этих
+    заголовков не получают.
+
+    catalog_resources — ресурсы, из которых строится ответ.
+    """
+    catalog_resources = ()
+
+    def get_catalog_resources(self, request):
+        resources = set(self.catalog_resources)
+        if any(request.GET.get(param) for param in PERSON_DEPENDENT_PARAMS):
+            resources.add('persons')
+        return tuple(sorted(resources))
+
+    def dispatch(self, request, *args, **kwargs):
+        resources = self.get_catalog_resources(request)
+        if request.method not in ('GET', 'HEAD') or not resources:
+            return super().dispatch(request, *args, **kwargs)
+
+        state = CatalogState(resources)
+        conditional_dispatch = condition(
+            etag_func=lambda request, *args, **kwargs: state.etag(request),
+            last_modified_func=lambda request, *args, **kwargs: state.last_modified,
+        )(super().dispatch)
+        response = conditional_dispatch(request, *args, **kwargs)
+        if not 200 <= response.status_code < 300 and response.status_code != 304:
+            # По ETag ошибки (например, 404) клиент получил бы 304 и
+            # продолжил бы считать объект отсутствующим
+            response.headers.pop('ETag', None)
+            response.headers.pop('Last-Modified', None)
+        return response
@@ -4,13 +4,17 @@ import logging
 import asyncio
 
 from rest_framework import viewsets, status as rest_status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
 from telegram import Bot
 from telegram.error import TelegramError
 
-from .models import Wine, Event, Person, PersonGrade, Producer, Subscription
+from .models import GrapeVariety, ItemNeighbour, Wine, Event, Person, PersonGrade, Producer, Subscription
 from .serializers import (
     WineSerializer,
     EventSerializer,
@@ -19,11 +23,49 @@ from .serializers import (
     ProducerListSerializer,
     ProducerDetailSerializer,
     SubscriptionSerializer,
+    EVENT_COUNTS,
+    parse_field_paths,
+    select_fields,
 )
 from .telegram import handle_message, BotTokenIsNotSetError
+from .optimization import OptimizedQuerysetMixin, optimize_queryset, related_count
+from .pagination import KeysetPagination
+from .filters import WINE_FACETS, filter_upcoming_events, filter_wines, parse_bool, parse_id_list, wine_facets
+from .search import search_wines
+from .suggest import SUGGEST_MODELS, suggest
+from .versioning import ConditionalCatalogMixin
+from .response_cache import ResponseCacheMixin, cache_tag
+from .cards import RESULTS_PLACEHOLDER, can_serve_cards, card_response, load_cards, with_cards
+from .fast_serialization import FastSerializationMixin, RowContext, get_row_plan
+from .export import ExportMixin
+from .normalized import NormalizedResponseMixin
+from .stats import DEFAULT_PRICE_BUCKETS, MAX_PRICE_BUCKETS, cached_wine_stats
+from .similarity import SimilarityIndexNotBuilt, similarity_index
+from .recommendations import recommend
+from .dictionaries import IMMUTABLE_MAX_AGE, dictionaries_content
+from .ical import calendar_content
+from .booking import ALREADY_BOOKED, BOOKED, SoldOut, book, cancel
+from .waitlist import WAITLISTED, has_waitlist, join, leave, promote_pending
 
 logger = logging.getLogger(__name__)
 
+# Фасеты зависят от названий и состава всех справочников, по которым считаются
+WINE_FACET_CACHE_TAGS = tuple(
+    cache_tag(Wine._meta.get_field(field).related_model) for field in WINE_FACETS.values()
+) + (cache_tag(GrapeVariety),)
+
+# Состав результатов поиска зависит от названий производителей и сортов
+WINE_SEARCH_CACHE_TAGS = (cache_tag(Producer), cache_tag(GrapeVariety))
+
+# Варианты сортировки списков вин (/api/wines/ и вина производителя)
+WINE_CURSOR_ORDERINGS = {
+    'name': ('name', 'id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'aging': ('aging', 'id'),
+    '-aging': ('-aging', '-id'),
+}
+
 
 @api_view(['GET'])
 def is_valid_user(request):
@@ -45,63 +87,378 @@ def is_valid_user(request):
     return Response('OK' if exists else 'NOT OK')
 
 
-class ProducerViewSet(viewsets.ReadOnlyModelViewSet):
+@api_view(['GET'])
+def suggest_view(request):
+    """
+    Подсказки при вводе по названиям вин, производителей и сортов винограда.
+    Query параметры:
+    - q: начало или часть названия (не короче 2 символов)
+    - types: через запятую из wines, producers, grape_varieties (по умолчанию все)
+    - limit: количество подсказок каждого типа (по умолчанию 10, максимум 20)
+    Возвращает {тип: [{"id": ..., "label": ...}]}.
+    """
+    query = request.query_params.get('q', '').strip()
+    if len(query) < 2:
+        return Response({name: [] for name in SUGGEST_MODELS})
+
+    types = request.query_params.get('types')
+    types = [t.strip() for t in types.split(',')] if types else None
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+    except (TypeError, ValueError):
+        limit = 10
+
+    return Response(suggest(query, types, limit))
+
+
+@api_view(['GET'])
+def dictionaries_view(request):
+    """
+    Все справочники (категории, цвета, сахар, страны, регионы, сорта
+    винограда, города) одним ответом для построения фильтров.
+
+    ETag — хеш содержимого; запрос с If-None-Match получает 304. Ответ
+    кешируется на DICTIONARIES_MAX_AGE, а с параметром v, равным текущему
+    хешу, — на год как неизменяемый.
+    """
+    content, digest = dictionaries_content()
+    etag = f'"{digest}"'
+    response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    if request.query_params.get('v') == digest:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.DICTIONARIES_MAX_AGE)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@require_safe
+def events_calendar_view(request):
+    """
+    Календарь предстоящих событий в формате iCalendar для подписки из
+    календарей. Query параметр: city — ID города (можно несколько через
+    запятую), без него — все города.
+
+    Календарь строится один раз на изменение каталога событий и отдаётся
+    из кеша; ETag — хеш содержимого, запрос с If-None-Match получает 304.
+    Обычное представление Django, а не DRF: календари присылают
+    Accept: text/calendar, который рендереры DRF не принимают.
+    """
+    content, digest = calendar_content(parse_id_list(request.GET.get('city', '')))
+    etag = f'"{digest}"'
+    response = HttpResponse(content, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Content-Disposition'] = 'inline; filename="events.ics"'
+    patch_cache_control(response, public=True, max_age=settings.ICAL_MAX_AGE)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+class ProducerViewSet(ConditionalCatalogMixin, ResponseCacheMixin, OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для чтения данных о производителях.
-    List: только name и description.
-    Detail: полная информация включая список вин.
+    List: name, description и количество вин и событий.
+    Detail: то же и вина производителя постранично.
     """
-    queryset = Producer.objects.all()
+    catalog_resources = ('producers', 'wines', 'events')
+    query_budget = {'list': 2, 'retrieve': 4}
+    wine_cursor_orderings = WINE_CURSOR_ORDERINGS
+
+    def get_queryset(self):
+        return Producer.objects.annotate(
+            wine_count=related_count(Wine, 'producer'),
+            event_count=related_count(Event, 'producer'),
+        )
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ProducerDetailSerializer
         return ProducerListSerializer
 
+    def list(self, request, *args, **kwargs):
+        # Счётчики меняются вместе с любым вином или событием
+        self.cache_depends_on(cache_tag(Wine), cache_tag(Event))
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Производитель и его вина: keyset-пагинация как у /api/wines/
+        (cursor, ordering, page_size, paginate=false). Поля вин выбираются
+        путями fields=wines.name и expand=wines.grape_composition.
+
+        Запросов три при любом числе вин: производитель со счётчиками,
+        страница вин одним запросом по быстрому пути и состав винограда.
+        """
+        producer = self.get_object()
+        data = self.get_serializer(producer).data
+        fields = request.query_params.get('fields')
+        fields = parse_field_paths(fields) if fields else None
+        if fields is None or 'wines' in fields:
+            data['wines'] = self.producer_wines(producer, fields)
+        self.cache_depends_on(cache_tag(Producer, producer.pk, 'wines'), cache_tag(Event))
+        return Response(data)
+
+    def producer_wines(self, producer, fields):
+        expand = self.request.query_params.get('expand')
+        expand = parse_field_paths(expand) if expand else None
+        sub_fields = fields.get('wines') if fields else None
+        queryset = Wine.objects.filter(producer_id=producer.pk)
+        paginator = KeysetPagination(orderings=self.wine_cursor_orderings)
+        ordering_columns = [
+            field.lstrip('-')
+            for ordering in self.wine_cursor_orderings.values()
+            for field in ordering
+        ]
+
+        if expand is not None and 'wines' not in expand and not sub_fields:
+            # Вина свёрнуты до первичных ключей, как связи в select_fields
+            rows = queryset.values('pk', *ordering_columns)
+            page = paginator.paginate_queryset(rows, self.request, self)
+            results = [row['pk'] for row in (rows if page is None else page)]
+        else:
+            serializer = WineSerializer(context={**self.get_serializer_context(), 'nested': True})
+            serializer.selection_key = select_fields(
+                serializer,
+                sub_fields or None,
+                expand.get('wines', {}) if expand is not None else None,
+            )
+            plan = get_row_plan(serializer)
+            if plan is not None:
+                context = RowContext(self.request, collect_tags=True)
+                rows = plan.values(queryset, extra=ordering_columns)
+                page = paginator.paginate_queryset(rows, self.request, self)
+                results = plan.build(list(rows if page is None else page), context)
+                self.cache_depends_on(*(cache_tag(model, pk, relation) for model, pk, relation in context.tags))
+            else:
+                wines = optimize_queryset(queryset, serializer, ordering_columns)
+                page = paginator.paginate_queryset(wines, self.request, self)
+                instances = list(wines if page is None else page)
+                results = [serializer.to_representation(wine) for wine in instances]
+                self.cache_depends_on(cache_tag(Wine))
 
-class WineViewSet(viewsets.ReadOnlyModelViewSet):
+        if page is None:
+            return results
+        return paginator.get_paginated_response(results).data
+
+
+class WineViewSet(
+    ConditionalCatalogMixin,
+    ResponseCacheMixin,
+    ExportMixin,
+    NormalizedResponseMixin,
+    FastSerializationMixin,
+    OptimizedQuerysetMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """
     ViewSet для чтения данных о винах.
     Предоставляет только GET endpoints.
     """
     serializer_class = WineSerializer
+    catalog_resources = ('wines',)
+    query_budget = {'list': 2, 'retrieve': 2, 'search': 2, 'stats': 8, 'similar': 5}
+    normalized_query_budget = {'list': 9, 'retrieve': 9, 'search': 9}
+    pagination_class = KeysetPagination
+    serve_cards = True
+    fast_serialization = True
+    export_filename = 'wines'
+    cursor_orderings = WINE_CURSOR_ORDERINGS
 
     def get_queryset(self):
         """
-        Опционально фильтрует вина по пользователю, который ими интересовался.
-        Параметры:
-        - interested_telegram_id: telegram_id персоны
-        - producer_id: ID производителя вина
+        Фильтрует вина по query-параметрам (см. filters.filter_wines):
+        пользователь, справочники, сорт винограда, диапазоны цены и года,
+        объём и is_prime.
         """
-        qs = Wine.objects.all()
+        return filter_wines(Wine.objects.all(), self.request.query_params)
 
-        interested_telegram_id = self.request.query_params.get("interested_telegram_id")
-        producer_id = self.request.query_params.get("producer_id")
+    def use_response_cache(self, request):
+        # Статистика кешируется сама по версиям каталога (см. stats);
+        # self.action здесь ещё не задан
+        action_name = self.action_map.get(request.method.lower())
+        return action_name != 'stats' and super().use_response_cache(request)
+
+    def use_cards(self):
+        """
+        Отдавать ли готовые карточки вместо сериализации (карточки содержат
+        все поля, поэтому не используются при выборе полей fields/expand)
+        """
+        params = self.request.query_params
+        return (
+            self.serve_cards
+            and not params.get('fields')
+            and not params.get('expand')
+            and can_serve_cards(self.request)
+        )
+
+    def list_response(self, queryset, facets=False):
+        """
+        Ответ со списком вин: нормализованный (?format=normalized), из готовых
+        карточек (WineCard), быстрым путём из строк values() или через
+        сериализатор. С facets=True в постраничный ответ добавляются фасеты.
+        """
+        extra = None
+        if facets:
+            extra = lambda: {'facets': wine_facets(queryset)}
 
+        if self.use_normalized():
+            if facets:
+                self.cache_depends_on(*WINE_FACET_CACHE_TAGS)
+            return self.normalized_list_response(queryset, extra)
+
+        if self.use_cards():
+            wines_with_cards = with_cards(queryset)
+            page = self.paginate_queryset(wines_with_cards)
+            if page is None:
+                cards = '[' + ','.join(load_cards(wines_with_cards)) + ']'
+                self.cache_depends_on(instances=wines_with_cards)
+                return card_response(self.request, RESULTS_PLACEHOLDER, cards)
+            data = self.get_paginated_response(RESULTS_PLACEHOLDER).data
+            if facets:
+                data['facets'] = wine_facets(queryset)
+                self.cache_depends_on(*WINE_FACET_CACHE_TAGS)
+            self.cache_depends_on(instances=page)
+            return card_response(self.request, data, '[' + ','.join(load_cards(page)) + ']')
+
+        if self.use_fast_serialization():
+            if facets:
+                self.cache_depends_on(*WINE_FACET_CACHE_TAGS)
+            return self.fast_list_response(queryset, extra)
+
+        optimized = self.filter_queryset(queryset)
+        page = self.paginate_queryset(optimized)
+        if page is None:
+            serializer = self.get_serializer(optimized, many=True)
+            return Response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        if facets:
+            response.data['facets'] = wine_facets(queryset)
+            self.cache_depends_on(*WINE_FACET_CACHE_TAGS)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список вин. С параметром facets=true в постраничный ответ добавляются
+        фасеты — количество вин по значениям справочников под текущим фильтром.
+        """
+        facets = parse_bool(request.query_params.get('facets', '')) or False
+        return self.list_response(self.get_queryset(), facets=facets)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_cards():
+            return super().retrieve(request, *args, **kwargs)
+        wine = get_object_or_404(with_cards(self.get_queryset()), pk=kwargs[self.lookup_field])
+        self.check_object_permissions(request, wine)
+        self.cache_depends_on(instances=[wine])
+        return card_response(request, RESULTS_PLACEHOLDER, load_cards([wine])[0])
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Полнотекстовый поиск вин по названию, производителю, сортам винограда,
+        описанию года и описанию. Результаты отсортированы по релевантности
+        и разбиты на страницы; фильтры списка вин тоже применяются.
+        Query параметр: q
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Параметр q обязателен'},
+                status=rest_status.HTTP_400_BAD_REQUEST
+            )
+
+        self.cursor_orderings = {'rank': ('-rank', 'id')}
+        self.cache_depends_on(*WINE_SEARCH_CACHE_TAGS)
+        return self.list_response(search_wines(self.get_queryset(), query))
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Статистика каталога под фильтрами списка вин: количество, перцентили
+        и гистограмма цен, распределение по годам и количество вин по
+        значениям справочников. Считается агрегирующими запросами и
+        кешируется до изменения каталога.
+        Query параметр: buckets — число столбцов гистограммы цен
+        (по умолчанию 10, максимум 50)
+        """
         try:
-            if interested_telegram_id:
-                person = Person.objects.get(telegram_id=interested_telegram_id)
-                qs = qs.filter(interested_persons=person)
-        except Person.DoesNotExist:
-            return Wine.objects.none()
+            buckets = min(max(int(request.query_params.get('buckets', DEFAULT_PRICE_BUCKETS)), 1), MAX_PRICE_BUCKETS)
+        except (TypeError, ValueError):
+            buckets = DEFAULT_PRICE_BUCKETS
 
-        if producer_id:
-            try:
-                producer_id_int = int(producer_id)
-                qs = qs.filter(producer_id=producer_id_int)
-            except (TypeError, ValueError):
-                # Некорректный ID производителя — игнорируем фильтр
-                pass
+        resources = self.get_catalog_resources(request)
+        return Response(cached_wine_stats(self.get_queryset(), resources, request.query_params, buckets))
 
-        return qs
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Похожие вина: сходство состава винограда (косинус долей сортов),
+        совпадение цвета, сахара и региона и близость цены (см. similarity).
+        Query параметр: limit — количество (по умолчанию 10, максимум 50)
+        Возвращает [{"score": ..., "wine": {...}}] по убыванию сходства.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except (TypeError, ValueError):
+            limit = 10
+
+        wine = get_object_or_404(Wine.objects.only('pk'), pk=pk)
+        try:
+            ranked = similarity_index.similar(wine.pk, limit) or []
+        except SimilarityIndexNotBuilt:
+            return Response(
+                {'error': 'Индекс похожих вин ещё не построен'},
+                status=rest_status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        queryset = self.filter_queryset(Wine.objects.filter(pk__in=[wine_id for wine_id, _ in ranked]))
+        wines = {similar_wine.pk: similar_wine for similar_wine in queryset}
+        ranked = [(wines[wine_id], score) for wine_id, score in ranked if wine_id in wines]
+        serializer = self.get_serializer([similar_wine for similar_wine, _ in ranked], many=True)
+        # Оценки зависят от всего каталога вин
+        self.cache_depends_on(cache_tag(Wine))
+        return Response([
+            {'score': score, 'wine': data}
+            for (_, score), data in zip(ranked, serializer.data)
+        ])
 
 
-class EventViewSet(viewsets.ReadOnlyModelViewSet):
+class EventViewSet(
+    ConditionalCatalogMixin,
+    ResponseCacheMixin,
+    ExportMixin,
+    NormalizedResponseMixin,
+    FastSerializationMixin,
+    OptimizedQuerysetMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """
     ViewSet для чтения данных о событиях.
     Предоставляет только GET endpoints.
     """
     serializer_class = EventSerializer
+    catalog_resources = ('events', 'wines')
+    query_budget = {'list': 4, 'retrieve': 4, 'upcoming': 3}
+    normalized_query_budget = {'list': 12, 'retrieve': 13, 'upcoming': 11}
+    pagination_class = KeysetPagination
+    fast_serialization = True
+    export_filename = 'events'
+    cursor_orderings = {
+        'date': ('date', 'time', 'id'),
+        '-date': ('-date', '-time', '-id'),
+    }
+
+    def get_catalog_resources(self, request):
+        # Список предстоящих событий меняется со временем, а не только с
+        # каталогом, поэтому ETag по версиям каталога для него не отдаётся
+        if self.action_map.get(request.method.lower()) == 'upcoming':
+            return ()
+        return super().get_catalog_resources(request)
+
+    def use_response_cache(self, request):
+        # По той же причине предстоящие события не кешируются
+        action_name = self.action_map.get(request.method.lower())
+        return action_name != 'upcoming' and super().use_response_cache(request)
 
     def get_queryset(self):
         """
@@ -111,8 +468,11 @@ class EventViewSet(viewsets.ReadOnlyModelViewSet):
         - interested_telegram_id: telegram_id персоны
         - participant_telegram_id: telegram_id персоны
         Формат даты: YYYY-MM-DD.
+        Для upcoming — ещё не начавшиеся события и фильтр city
+        (см. filter_upcoming_events).
+        Счётчики участников и интересующихся считаются подзапросами.
         """
-        qs = Event.objects.all()
+        qs = Event.objects.annotate(**EVENT_COUNTS)
         date_before = self.request.query_params.get("date_before")
         date_after = self.request.query_params.get("date_after")
         interested_telegram_id = self.request.query_params.get("interested_telegram_id")
@@ -147,15 +507,33 @@ class EventViewSet(viewsets.ReadOnlyModelViewSet):
         except Person.DoesNotExist:
             return Event.objects.none()
 
+        if self.action == 'upcoming':
+            qs = filter_upcoming_events(qs, self.request.query_params)
+
         return qs
 
+    @action(detail=False, methods=['get'])
+    def upcoming(self, request):
+        """
+        Предстоящие события по возрастанию даты и времени начала.
+        Query параметр: city — ID города (можно несколько через запятую);
+        остальные фильтры, выбор полей, формат и пагинация — как у списка.
+        Запрос обслуживается индексом (city, date, time, id).
+        """
+        return self.list(request)
 
-class PersonViewSet(viewsets.ModelViewSet):
+
+class PersonViewSet(FastSerializationMixin, OptimizedQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы с персонами.
     Предоставляет GET, POST, PUT, PATCH, DELETE endpoints.
     """
     serializer_class = PersonSerializer
+    pagination_class = KeysetPagination
+    fast_serialization = True
+    cursor_orderings = {
+        'name': ('lastname', 'firstname', 'id'),
+    }
 
     def get_queryset(self):
         """
@@ -173,7 +551,45 @@ class PersonViewSet(viewsets.ModelViewSet):
 
         return qs
 
-class GradeViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        """
+        Рекомендации для персоны: вина и предстоящие события, которые чаще
+        всего отмечают вместе с её интересами (см. recommendations).
+        Query параметр: limit — количество вин и событий (по умолчанию 10,
+        максимум 50)
+        Возвращает {"wines": [{"score": ..., "wine": {...}}],
+        "events": [{"score": ..., "event": {...}}]} по убыванию оценки.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except (TypeError, ValueError):
+            limit = 10
+
+        person = get_object_or_404(Person.objects.only('pk'), pk=pk)
+        ranked = recommend(person.pk)
+        context = self.get_serializer_context()
+        sources = (
+            ('wines', 'wine', ItemNeighbour.WINE, Wine.objects.all(), WineSerializer),
+            ('events', 'event', ItemNeighbour.EVENT, Event.objects.filter(date__gte=date.today()).annotate(**EVENT_COUNTS), EventSerializer),
+        )
+        data = {}
+        for key, name, item_type, queryset, serializer_class in sources:
+            scores = dict(ranked[item_type])
+            # Удалённые вина и прошедшие события пропускаются
+            available = set(queryset.filter(pk__in=scores).values_list('pk', flat=True))
+            top = [item_id for item_id, _ in ranked[item_type] if item_id in available][:limit]
+            serializer = serializer_class(context=context)
+            objects = {obj.pk: obj for obj in optimize_queryset(queryset.filter(pk__in=top), serializer)}
+            data[key] = [
+                {'score': scores[item_id], name: serializer.to_representation(objects[item_id])}
+                for item_id in top
+                if item_id in objects
+            ]
+        return Response(data)
+
+
+class GradeViewSet(ConditionalCatalogMixin, ResponseCacheMixin, OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для чтения данных о грейдах пользователей.
     Предоставляет только GET endpoints.
@@ -181,9 +597,11 @@ class GradeViewSet(viewsets.ReadOnlyModelViewSet):
 
     queryset = PersonGrade.objects.all().order_by("required_tastings", "name")
     serializer_class = GradeSerializer
+    catalog_resources = ('grades',)
+    query_budget = {'list': 2, 'retrieve': 2}
 
 
-class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
+class SubscriptionViewSet(ConditionalCatalogMixin, ResponseCacheMixin, OptimizedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для чтения данных о подписках.
     Предоставляет только GET endpoints.
@@ -191,6 +609,8 @@ class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
 
     queryset = Subscription.objects.all().order_by("name")
     serializer_class = SubscriptionSerializer
+    catalog_resources = ('subscriptions',)
+    query_budget = {'list': 3, 'retrieve': 3}
 
 
 @api_view(['POST'])
@@ -454,4 +874,163 @@ def send_subscribe_notification(request):
     
     payload, status = handle_message(message)
     payload.update({'email': email})
-    return Response(payload, status)
\ No newline at end of file
+    return Response(payload, status)
+
+def _booking_participants(request):
+    """
+    Персона и событие из параметров telegram_id и event_id запроса
+    бронирования; вместо них — Response с ошибкой.
+    """
+    telegram_id = request.data.get('telegram_id')
+    event_id = request.data.get('event_id')
+
+    if not telegram_id:
+        return Response(
+            {'error': 'Параметр telegram_id обязателен'},
+            status=rest_status.HTTP_400_BAD_REQUEST
+        )
+
+    if not event_id:
+        return Response(
+            {'error': 'Параметр event_id обязателен'},
+            status=rest_status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        person = Person.objects.only('pk').get(telegram_id=telegram_id)
+    except (Person.DoesNotExist, ValueError):
+        return Response(
+            {'error': f'Пользователь с telegram_id "{telegram_id}" не найден'},
+            status=rest_status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        event = Event.objects.only('pk').get(pk=event_id)
+    except (Event.DoesNotExist, ValueError):
+        return Response(
+            {'error': f'Событие с ID {event_id} не найдено'},
+            status=rest_status.HTTP_404_NOT_FOUND
+        )
+    return person, event
+
+
+@api_view(['POST'])
+def book_event(request):
+    """
+    Endpoint для бронирования места на событии (см. booking.book).
+
+    Принимает:
+    - telegram_id: telegram_id пользователя (Person)
+    - event_id: Primary Key события (Event)
+
+    Возвращает {"status": "booked", "available": ...} (201) или
+    "already_booked" (200), если пользователь уже участник;
+    409, если свободных мест нет или места распределяются по листу
+    ожидания (тогда в ответе "waitlist": true).
+
+    Если у события есть очередь, запрос сначала сам переводит первых в
+    очереди на свободные места (waitlist.promote_pending) и не ждёт
+    фонового потока. 409 с "waitlist": true возвращается, только если
+    после этого в очереди остались люди — то есть свободных мест нет;
+    если очередь разошлась и места остались, бронь проходит.
+    """
+    participants = _booking_participants(request)
+    if isinstance(participants, Response):
+        return participants
+    person, event = participants
+
+    # Освободившиеся места достаются первым в очереди
+    if (
+        has_waitlist(event.pk)
+        and not event.participants.filter(pk=person.pk).exists()
+        and promote_pending(event.pk)
+    ):
+        return Response(
+            {'error': 'Места распределяются по листу ожидания', 'waitlist': True},
+            status=rest_status.HTTP_409_CONFLICT
+        )
+
+    try:
+        result, available = book(event.pk, person.pk)
+    except SoldOut:
+        return Response(
+            {'error': 'Свободных мест нет', 'available': 0},
+            status=rest_status.HTTP_409_CONFLICT
+        )
+    except Event.DoesNotExist:
+        return Response(
+            {'error': f'Событие с ID {event.pk} не найдено'},
+            status=rest_status.HTTP_404_NOT_FOUND
+        )
+
+    status = rest_status.HTTP_201_CREATED if result == BOOKED else rest_status.HTTP_200_OK
+    return Response({'status': result, 'event_id': event.pk, 'available': available}, status=status)
+
+
+@api_view(['POST'])
+def cancel_event_booking(request):
+    """
+    Endpoint для отмены брони места на событии (см. booking.cancel).
+
+    Принимает:
+    - telegram_id: telegram_id пользователя (Person)
+    - event_id: Primary Key события (Event)
+
+    Возвращает {"status": "cancelled" или "not_booked", "available": ...}.
+    """
+    participants = _booking_participants(request)
+    if isinstance(participants, Response):
+        return participants
+    person, event = participants
+
+    try:
+        result, available = cancel(event.pk, person.pk)
+    except Event.DoesNotExist:
+        return Response(
+            {'error': f'Событие с ID {event.pk} не найдено'},
+            status=rest_status.HTTP_404_NOT_FOUND
+        )
+    return Response({'status': result, 'event_id': event.pk, 'available': available}, status=rest_status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def join_event_waitlist(request):
+    """
+    Endpoint для записи в лист ожидания события (см. waitlist).
+
+    Принимает:
+    - telegram_id: telegram_id пользователя (Person)
+    - event_id: Primary Key события (Event)
+
+    Возвращает {"status": "waitlisted", "position": ...}; повторная запись
+    сохраняет место в очереди. Когда место освобождается, пользователь
+    записывается в участники и получает сообщение в Telegram.
+    """
+    participants = _booking_participants(request)
+    if isinstance(participants, Response):
+        return participants
+    person, event = participants
+
+    if event.participants.filter(pk=person.pk).exists():
+        return Response({'status': ALREADY_BOOKED, 'event_id': event.pk}, status=rest_status.HTTP_200_OK)
+    position = join(event.pk, person.pk)
+    return Response({'status': WAITLISTED, 'event_id': event.pk, 'position': position}, status=rest_status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def leave_event_waitlist(request):
+    """
+    Endpoint для выхода из листа ожидания события.
+
+    Принимает:
+    - telegram_id: telegram_id пользователя (Person)
+    - event_id: Primary Key события (Event)
+
+    Возвращает {"status": "left" или "not_waitlisted"}.
+    """
+    participants = _booking_participants(request)
+    if isinstance(participants, Response):
+        return participants
+    person, event = participants
+
+    return Response({'status': leave(event.pk, person.pk), 'event_id': event.pk}, status=rest_status.HTTP_200_OK)
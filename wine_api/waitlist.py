@@ -0,0 +1,153 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+from .booking import BOOKED, SoldOut, book
+from .models import Event, Person, WaitlistEntry
+from .telegram import send_message
+
+logger = logging.getLogger(__name__)
+
+# Результаты записи в лист ожидания и выхода из него
+WAITLISTED = 'waitlisted'
+LEFT = 'left'
+NOT_WAITLISTED = 'not_waitlisted'
+
+# Сколько человек из очереди переводится в участники за один шаг; следующий
+# шаг ставится в очередь потоков отдельно, поэтому большое увеличение
+# количества мест не задерживает ни запрос, ни поток надолго
+WAITLIST_PROMOTION_BATCH = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def position(entry_id, event_id):
+    """Позиция в очереди, начиная с 1 (подсчёт по индексу (event, id))"""
+    return WaitlistEntry.objects.filter(event_id=event_id, pk__lte=entry_id).count()
+
+
+def join(event_id, person_id):
+    """
+    Ставит персону в конец очереди события; повторная запись сохраняет
+    прежнее место. Если места есть, очередь сразу продвигается.
+    Возвращает позицию в очереди.
+    """
+    try:
+        with transaction.atomic():
+            entry_id = WaitlistEntry.objects.create(event_id=event_id, person_id=person_id).pk
+    except IntegrityError:
+        entry_id = WaitlistEntry.objects.filter(event_id=event_id, person_id=person_id).values_list('pk', flat=True).get()
+    has_seats = Event.objects.filter(pk=event_id).exclude(available=0).exists()
+    if has_seats:
+        transaction.on_commit(lambda: schedule_promotion(event_id))
+    return position(entry_id, event_id)
+
+
+def leave(event_id, person_id):
+    deleted, _ = WaitlistEntry.objects.filter(event_id=event_id, person_id=person_id).delete()
+    return LEFT if deleted else NOT_WAITLISTED
+
+
+def has_waitlist(event_id):
+    return WaitlistEntry.objects.filter(event_id=event_id).exists()
+
+
+def promote_pending(event_id):
+    """
+    Шаг продвижения очереди в текущем потоке: бронь, заставшая очередь при
+    свободных местах (фоновый шаг ещё не выполнен или WAITLIST_WORKERS = 0),
+    сначала отдаёт места первым в очереди. Следующий шаг, если он нужен,
+    ставится в фоновый поток.
+
+    Возвращает True, если очередь после шага не пуста.
+    """
+    if Event.objects.filter(pk=event_id).exclude(available=0).exists():
+        promoted, more = promote(event_id)
+        if promoted:
+            notify_promoted(event_id, promoted)
+        if more:
+            schedule_promotion(event_id)
+    return has_waitlist(event_id)
+
+
+def promote(event_id, batch_size=WAITLIST_PROMOTION_BATCH):
+    """
+    Переводит в участники не больше batch_size первых в очереди, пока на
+    событии есть места. Каждый — в своей транзакции: запись очереди
+    удаляется и место бронируется (booking.book); если мест не осталось,
+    запись возвращается откатом. Запись, которую уже обработал другой
+    процесс, пропускается.
+
+    Возвращает (id переведённых персон, остались ли в очереди те, кого
+    ещё можно перевести).
+    """
+    entries = list(
+        WaitlistEntry.objects
+        .filter(event_id=event_id)
+        .order_by('pk')
+        .values_list('pk', 'person_id')[:batch_size]
+    )
+    promoted = []
+    for entry_id, person_id in entries:
+        try:
+            with transaction.atomic():
+                if not WaitlistEntry.objects.filter(pk=entry_id).delete()[0]:
+                    continue
+                result, _ = book(event_id, person_id)
+        except SoldOut:
+            return promoted, False
+        if result == BOOKED:
+            promoted.append(person_id)
+    return promoted, len(entries) == batch_size
+
+
+def notify_promoted(event_id, person_ids):
+    """Сообщает переведённым из очереди в участники (по telegram_id)"""
+    event = Event.objects.filter(pk=event_id).only('name', 'date', 'time').first()
+    if event is None:
+        return
+    message = (
+        f"Освободилось место на событии «{event.name}» "
+        f"{event.date:%d.%m.%Y} {event.time:%H:%M}: вы записаны в участники"
+    )
+    chat_ids = Person.objects.filter(pk__in=person_ids, telegram_id__isnull=False).values_list('telegram_id', flat=True)
+    for chat_id in chat_ids:
+        try:
+            send_message(message, chat_id=chat_id)
+        except Exception:
+            # Ошибка уже записана в журнал в send_message; остальным пишем дальше
+            continue
+
+
+def _promotion_task(event_id):
+    close_old_connections()
+    try:
+        promoted, more = promote(event_id)
+        if promoted:
+            notify_promoted(event_id, promoted)
+        if more:
+            schedule_promotion(event_id)
+    except Exception:
+        logger.exception('Не удалось продвинуть лист ожидания события %s', event_id)
+    finally:
+        connection.close()
+
+
+def schedule_promotion(event_id):
+    """
+    Ставит шаг продвижения очереди события в фоновый поток процесса.
+    При WAITLIST_WORKERS = 0 очередь продвигают команда promote_waitlist
+    и запросы брони (promote_pending).
+    """
+    global _executor
+    workers = getattr(settings, 'WAITLIST_WORKERS', 1)
+    if not workers:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='waitlist')
+    _executor.submit(_promotion_task, event_id)